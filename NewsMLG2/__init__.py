@@ -10,13 +10,15 @@ from .attributegroups import *
 from .catalog import *
 from .catalogitem import *
 from .catalogstore import *
+from .codegen import *
 from .complextypes import *
 from .conceptitem import *
 from .concepts import *
 from .conceptrelationships import *
 from .contentmeta import *
 from .core import *
-from .document import NewsMLG2Document
+from .document import NewsMLG2Document, NewsMessageReader
+from .elementclasses import *
 from .entities import *
 from .extensionproperties import *
 from .events import *
@@ -27,12 +29,15 @@ from .labeltypes import *
 from .link import *
 from .newsitem import *
 from .newsmessage import *
+from .pull import *
 from .packageitem import *
 from .partmeta import *
 from .planningitem import *
+from .remotecatalogs import *
 from .rights import *
 from .simpletypes import *
 from .utils import *
+from .view import *
 
 VERSION = 1.1
 DEBUG = True
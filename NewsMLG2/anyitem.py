@@ -10,7 +10,9 @@ from .core import BaseObject, NEWSMLG2_VERSION, QCodeURIMixin
 from .attributegroups import (
     CommonPowerAttributes, I18NAttributes, QuantifyAttributes
 )
-from .catalog import build_catalog, get_catalogs, CatalogRef, Catalog
+from .catalog import (
+    build_catalog, build_catalog_store, get_catalogs, CatalogRef, Catalog
+)
 from .complextypes import Name, TruncatedDateTimePropType
 from .concepts import Flex1PropType
 from .extensionproperties import Flex2ExtPropType
@@ -239,18 +241,53 @@ class AnyItem(I18NAttributes):
     # (NOTE we don't check for order at this time)
     xsAny = "http://www.w3.org/2000/09/xmldsig#"
 
+    # the catalogs declared by a parsed item
+    __slots__ = ('_catalog_store',)
+
     def __init__(self,  **kwargs):
         super().__init__(**kwargs)
+        self._catalog_store = None
         xmlelement = kwargs.get('xmlelement')
         if isinstance(xmlelement, etree._Element):
-            build_catalog(xmlelement)
+            self._catalog_store = build_catalog(xmlelement)
             assert self.itemmeta is not None, "itemMeta is required in any NewsML-G2 Item"
 
     def get_catalogs(self):
         """
-        Wrapper for global get_catalogs() function.
+        Return the CatalogStore holding the catalogs declared by this item,
+        to pass to qcode_to_uri() and uri_to_qcode(). For items that weren't
+        parsed from XML, this is the global CatalogStore.
+        """
+        if self._catalog_store is None:
+            return get_catalogs()
+        return self._catalog_store
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Like a parsed item, an item built from a dict loads the catalogs
+        it declares.
+        """
+        item = super().from_dict(data)
+        item._catalog_store = build_catalog_store(
+            list(item.catalog), [catalog_ref.href for catalog_ref in item.catalogref]
+        )
+        return item
+
+    def __getstate__(self):
+        """
+        Our catalogs aren't pickled: they are loaded again when unpickling.
         """
-        return get_catalogs()
+        return (super().__getstate__(), self._catalog_store is not None)
+
+    def __setstate__(self, state):
+        (base_state, has_catalogs) = state
+        super().__setstate__(base_state)
+        self._catalog_store = None
+        if has_catalogs:
+            self._catalog_store = build_catalog_store(
+                list(self.catalog), [catalog_ref.href for catalog_ref in self.catalogref]
+            )
 
 
 class AssertType(CommonPowerAttributes, I18NAttributes):
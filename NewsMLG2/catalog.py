@@ -5,10 +5,20 @@ Handle catalogs (lists of controlled vocabularies with their
 aliases and locations)
 """
 
+import marshal
 import os
+import re
+import sys
+import threading
+import zlib
 from lxml import etree
 
-from .core import NEWSMLG2NSPREFIX, BaseObject
+from .core import (
+    _ABSENT, _EMPTY_MAPPING, _PENDING, _SET_ATTRIBUTE_MASK, _SET_ATTRIBUTE_VALUES,
+    _SET_ELEMENT_VALUES, _SET_EXTENSION_ELEMENTS, _SET_LAZY, _SET_TEXT,
+    _SET_XMLELEMENT, _SET_XS_ANY_CONTENT, _WRITE_THROUGH, NEWSMLG2NSPREFIX,
+    BaseObject, GenericArray, _is_write_through, _pack_attributes
+)
 from .attributegroups import (
     AuthorityAttributes, CommonPowerAttributes, I18NAttributes
 )
@@ -18,7 +28,7 @@ from .conceptrelationships import SameAs
 from .contentmeta import ContentMetadataCatType
 from .labeltypes import Label1Type
 from .simpletypes import IRIType
-from .catalogstore import CATALOG_STORE
+from .catalogstore import CATALOG_STORE, CatalogStore, mark_catalog_changed
 
 
 # TODO: raise a warning if a qcode is used that doesn't have a matching scheme
@@ -54,46 +64,329 @@ CATALOG_CACHE = {
 }
 
 
+# Cache of remote catalogs, used for catalogRefs to catalogs that aren't
+# built in to this module: see NewsMLG2.enable_remote_catalogs()
+_REMOTE_CATALOGS = None
+
+
+def set_remote_catalogs(remote_catalogs):
+    """
+    Set the RemoteCatalogCache used to load remote catalogs, or None to
+    disable loading remote catalogs.
+    """
+    global _REMOTE_CATALOGS  # pylint: disable=global-statement
+    _REMOTE_CATALOGS = remote_catalogs
+
+
 def build_catalog(xmlelement):
     """
-    Load all CVs referenced in local and remote catalogs.
-    TODO:
-    - load and cache catalog from remote catalogRef href
+    Load all CVs referenced in local and remote catalogs, and return them
+    as a new CatalogStore. The global CATALOG_STORE is also set to these
+    catalogs.
     """
-    CATALOG_STORE.__init__([])
-    catalogs = xmlelement.findall(NEWSMLG2NSPREFIX+'catalog')
-    for catalog in catalogs:
-        add_catalog(xmlelement=catalog)
-    catalog_refs = xmlelement.findall(NEWSMLG2NSPREFIX+'catalogRef')
-    for catalog_ref in catalog_refs:
-        href = catalog_ref.get('href')
+    catalogs = [
+        Catalog(xmlelement=catalog)
+        for catalog in xmlelement.findall(NEWSMLG2NSPREFIX+'catalog')
+    ]
+    hrefs = [
+        catalog_ref.get('href')
+        for catalog_ref in xmlelement.findall(NEWSMLG2NSPREFIX+'catalogRef')
+    ]
+    catalog_store = build_catalog_store(catalogs, hrefs)
+    set_global_catalogs(catalog_store)
+    return catalog_store
 
+
+def build_catalog_store(catalogs, hrefs):
+    """
+    Return a new CatalogStore holding the given Catalog objects and the
+    catalogs referenced by the given catalogRef hrefs, as build_catalog()
+    does for an item's XML element, but without changing the global
+    CATALOG_STORE.
+    """
+    catalog_store = CatalogStore()
+    for catalog in catalogs:
+        catalog_store.append(catalog)
+    for href in hrefs:
         if href in CATALOG_CACHE:
             # IPTC standard catalogs are built in to this module
             # to avoid network traffic (and load on IPTC servers)
             file = CATALOG_CACHE[href]
-            add_catalog(uri=href, file=file)
+            add_catalog(uri=href, file=file, catalog_store=catalog_store)
+        elif _REMOTE_CATALOGS is not None:
+            catalog = _REMOTE_CATALOGS.get_catalog(href)
+            if catalog is not None:
+                catalog_store.append(catalog)
         else:
             # TODO convert to a logged warning
-            print("WARNING: Remote catalog {} declared. Remote "
-                  "loading of catalogs is not yet supported.".format(href))
+            print("WARNING: Remote catalog {} declared. Remote loading of "
+                  "catalogs is not enabled.".format(href))
+    return catalog_store
+
+
+# Serializes changes to the global CATALOG_STORE
+_CATALOG_STORE_LOCK = threading.Lock()
+
+
+def set_global_catalogs(catalog_store):
+    """
+    Make the global CATALOG_STORE hold the catalogs of `catalog_store`, as
+    done for each parsed item. The catalogs are swapped in as a whole, once
+    they are all loaded, so threads reading CATALOG_STORE never see a
+    partly loaded set of catalogs.
+    """
+    with _CATALOG_STORE_LOCK:
+        CATALOG_STORE.set_catalogs(list(catalog_store))
 
 
 def add_catalog(**kwargs):
     """
     Load an individual catalog from a local file
-    or directly from an XML element.
+    or directly from an XML element, and add it to `catalog_store`
+    (by default the global CATALOG_STORE).
     """
+    catalog_store = kwargs.get('catalog_store')
+    if catalog_store is None:
+        catalog_store = CATALOG_STORE
     if 'file' in kwargs:
-        dirname = os.path.dirname(os.path.realpath(__file__))
-        filename = os.path.join(dirname, kwargs['file'])
-        xmltree = etree.parse(filename)
-        catalog_element = xmltree.getroot()
-        catalog = Catalog(xmlelement=catalog_element)
-        CATALOG_STORE.append(catalog)
+        catalog_store.append(load_catalog_file(kwargs['file']))
     elif 'xmlelement' in kwargs:
         catalog = Catalog(xmlelement=kwargs['xmlelement'])
-        CATALOG_STORE.append(catalog)
+        catalog_store.append(catalog)
+
+
+# Directory that catalog file names are relative to
+_CATALOG_DIRNAME = os.path.dirname(os.path.realpath(__file__))
+
+# Catalog objects loaded from files, shared by all items that refer to them:
+# file name as given -> (path, modification time, size, Catalog)
+_CATALOG_FILES = {}
+_CATALOG_FILES_LOCK = threading.Lock()
+
+
+def load_catalog_file(file):
+    """
+    Return the Catalog object for a catalog file, given as a path relative to
+    this module. The file is only parsed the first time it is loaded;
+    afterwards the same Catalog object is returned, until
+    refresh_catalog_file_cache() finds that the file has changed.
+    Catalog objects returned by this function are shared, so must not be
+    modified.
+    """
+    cached = _CATALOG_FILES.get(file)
+    if cached is not None:
+        return cached[3]
+    with _CATALOG_FILES_LOCK:
+        # another thread may have loaded the file in the meantime
+        cached = _CATALOG_FILES.get(file)
+        if cached is not None:
+            return cached[3]
+        filename = os.path.join(_CATALOG_DIRNAME, file)
+        stat = os.stat(filename)
+        catalog = load_catalog_index(filename)
+        if catalog is None:
+            xmltree = etree.parse(filename)
+            catalog = Catalog(xmlelement=xmltree.getroot())
+        _CATALOG_FILES[file] = (
+            filename, stat.st_mtime_ns, stat.st_size, catalog
+        )
+        return catalog
+
+
+# Version of the format of catalog index files
+CATALOG_INDEX_VERSION = 3
+
+
+def get_catalog_index_filename(filename):
+    """
+    Return the name of the index file for a catalog file.
+    """
+    return os.path.splitext(filename)[0] + '.index'
+
+
+def build_catalog_index(filename):
+    """
+    Return the index of a catalog file, as plain Python data that can be
+    saved with marshal: the catalog element and its descendants, each saved
+    as an (attributes, text, children) tuple. The index also records the
+    size, modification time and checksum of the catalog file, so that an
+    index that is out of date can be detected.
+    """
+    with open(filename, 'rb') as catalog_file:
+        data = catalog_file.read()
+        mtime_ns = os.fstat(catalog_file.fileno()).st_mtime_ns
+    return {
+        'version': CATALOG_INDEX_VERSION,
+        'source_size': len(data),
+        'source_mtime_ns': mtime_ns,
+        'source_crc32': zlib.crc32(data),
+        'catalog': _index_element(etree.fromstring(data), Catalog)
+    }
+
+
+def _index_element(xmlelement, element_class):
+    """
+    Return the (attributes, text, children) tuple saved in a catalog index
+    for an XML element of class `element_class`. Raise ValueError if the
+    element has children that aren't declared by its class (such as
+    extension elements), which an index can't hold.
+    """
+    descriptor = element_class.get_descriptor()
+    text = None
+    if xmlelement.text:
+        text = re.sub(r"\s+", " ", xmlelement.text).strip()
+    children = []
+    for child in xmlelement.iterchildren(etree.Element):
+        element_ids = descriptor.element_ids_by_tag.get(child.tag)
+        if not element_ids:
+            raise ValueError(
+                "Element " + child.tag + " isn't declared by '" +
+                element_class.__name__ + "' and can't be indexed"
+            )
+        children.append((
+            sys.intern(child.tag),
+            _index_element(child, descriptor.element_classes[element_ids[0]])
+        ))
+    # names are interned so that the saved index holds each one only once
+    attributes = tuple(
+        (sys.intern(name), value) for (name, value) in xmlelement.items()
+    )
+    return (attributes, text, tuple(children))
+
+
+def write_catalog_index(filename):
+    """
+    Build the index of a catalog file and save it next to the catalog file.
+    Return the name of the index file.
+    """
+    index_filename = get_catalog_index_filename(filename)
+    with open(index_filename, 'wb') as index_file:
+        index_file.write(marshal.dumps(build_catalog_index(filename)))
+    return index_filename
+
+
+def load_catalog_index(filename):
+    """
+    Return a Catalog object built from the index of a catalog file, or None
+    if there is no index or it is out of date (or unreadable).
+    The index only holds plain Python data (dicts, tuples, strings and
+    integers) saved with marshal, so loading it doesn't run any code.
+    Indexes are written by the Python version that reads them: they are
+    generated when the package is built, see tools/build_catalog_index.py.
+    The catalog file is only read to compare its checksum with the index if
+    its modification time isn't the one recorded in the index (as after the
+    file has been copied); a file of a different size is out of date.
+    """
+    try:
+        with open(get_catalog_index_filename(filename), 'rb') as index_file:
+            index = marshal.loads(index_file.read())
+        stat = os.stat(filename)
+        if (not isinstance(index, dict)
+                or index.get('version') != CATALOG_INDEX_VERSION
+                or index['source_size'] != stat.st_size):
+            return None
+        if index['source_mtime_ns'] != stat.st_mtime_ns:
+            with open(filename, 'rb') as catalog_file:
+                if index['source_crc32'] != zlib.crc32(catalog_file.read()):
+                    return None
+    except (OSError, ValueError, EOFError, TypeError):
+        # unreadable, or written by another Python version
+        return None
+    # as for catalogs parsed from XML, Scheme objects are only built when
+    # they are first used
+    (attributes, text, children) = index['catalog']
+    scheme_tag = NEWSMLG2NSPREFIX + 'scheme'
+    catalog = _object_from_index(Catalog, (
+        attributes, text,
+        tuple((tag, child) for (tag, child) in children if tag != scheme_tag)
+    ))
+    catalog._init_catalog(())
+    for (tag, child) in children:
+        if tag == scheme_tag:
+            scheme_attributes = dict(child[0])
+            catalog._add_entry_to_catalog(
+                child, scheme_attributes.get('alias'), scheme_attributes.get('uri')
+            )
+    catalog._catalog_scheme_count = len(catalog._catalog)
+    catalog._element_values['scheme'] = _PENDING
+    return catalog
+
+
+def _object_from_index(element_class, index_element):
+    """
+    Build an object of class `element_class` from an (attributes, text,
+    children) tuple saved in a catalog index. The object is the same as the
+    one parsed from an XML element with those attributes, text and children.
+    """
+    (attributes, text, children) = index_element
+    descriptor = element_class.get_descriptor()
+    obj = element_class.__new__(element_class)
+
+    found_attributes = []
+    attribute_bits_by_xml_name = descriptor.attribute_bits_by_xml_name
+    for (attribute_xmlname, value) in attributes:
+        for bit in attribute_bits_by_xml_name.get(attribute_xmlname, ()):
+            found_attributes.append((bit, value))
+    (attribute_mask, attribute_values) = _pack_attributes(found_attributes)
+    _SET_ATTRIBUTE_MASK(obj, attribute_mask)
+    _SET_ATTRIBUTE_VALUES(obj, attribute_values)
+
+    found_elements = {}
+    for (tag, child) in children:
+        for element_id in descriptor.element_ids_by_tag.get(tag, ()):
+            found_elements.setdefault(element_id, []).append(
+                _object_from_index(descriptor.element_classes[element_id], child)
+            )
+    if descriptor.element_definitions:
+        element_values = {}
+        for (element_id, element_definition) in descriptor.element_definitions:
+            values = found_elements.get(element_id)
+            if element_id in descriptor.array_element_ids:
+                if values:
+                    element_values[element_id] = GenericArray(
+                        xmlarray = values,
+                        element_class = descriptor.element_classes[element_id]
+                    )
+                else:
+                    element_values[element_id] = descriptor.get_empty_array(element_id)
+            elif values:
+                element_values[element_id] = values[0]
+            else:
+                element_values[element_id] = _ABSENT
+        _SET_ELEMENT_VALUES(obj, element_values)
+    else:
+        _SET_ELEMENT_VALUES(obj, _EMPTY_MAPPING)
+    _SET_EXTENSION_ELEMENTS(obj, _EMPTY_MAPPING)
+    _SET_XS_ANY_CONTENT(obj, ())
+    _SET_TEXT(obj, text)
+    _SET_XMLELEMENT(obj, None)
+    _SET_LAZY(obj, False)
+    return obj
+
+
+def clear_catalog_file_cache():
+    """
+    Forget all Catalog objects loaded by load_catalog_file().
+    """
+    with _CATALOG_FILES_LOCK:
+        _CATALOG_FILES.clear()
+
+
+def refresh_catalog_file_cache():
+    """
+    Forget the Catalog objects loaded by load_catalog_file() from files that
+    have changed or been removed since, so that they are parsed again the
+    next time they are loaded.
+    """
+    with _CATALOG_FILES_LOCK:
+        for (file, cached) in list(_CATALOG_FILES.items()):
+            try:
+                stat = os.stat(cached[0])
+            except OSError:
+                del _CATALOG_FILES[file]
+                continue
+            if stat.st_mtime_ns != cached[1] or stat.st_size != cached[2]:
+                del _CATALOG_FILES[file]
 
 
 def get_catalogs():
@@ -184,8 +477,10 @@ class Catalog(AuthorityAttributes, CommonPowerAttributes):
     """
     A local or remote catalog.
     """
-
-    _catalog = []
+    __slots__ = (
+        '_catalog', '_catalog_titles', '_catalog_uri_lookup',
+        '_catalog_alias_lookup', '_catalog_scheme_count', '_catalog_version'
+    )
     elements = [
         ('title', {
             'type': 'array', 'xml_name': 'title', 'element_class': Title
@@ -224,36 +519,151 @@ class Catalog(AuthorityAttributes, CommonPowerAttributes):
     }
 
     def __init__(self, **kwargs):
+        xmlelement = kwargs.get('xmlelement')
+        if xmlelement is not None and kwargs.get('lazy') is not _WRITE_THROUGH:
+            # Scheme objects are only built when they are first used: until
+            # then our catalog only indexes their XML elements by alias and
+            # URI (see _get_scheme())
+            kwargs['lazy'] = True
         super().__init__(**kwargs)
+        self._init_catalog(())
+        if xmlelement is not None:
+            for scheme_element in xmlelement.iterchildren(NEWSMLG2NSPREFIX+'scheme'):
+                self._add_entry_to_catalog(
+                    scheme_element,
+                    scheme_element.get('alias'),
+                    scheme_element.get('uri')
+                )
+            self._catalog_scheme_count = len(self._catalog)
+
+    def _init_catalog(self, schemes):
+        """Initialise our catalog with the given schemes"""
+        # Scheme objects, or XML elements (or catalog index entries) for
+        # schemes not yet built
         self._catalog = []
+        # number of entries read from our "scheme" elements
+        self._catalog_scheme_count = 0
         self._catalog_titles = []
+        # positions in self._catalog, by URI and by alias
         self._catalog_uri_lookup = {}
         self._catalog_alias_lookup = {}
 
-        for scheme in self.scheme:
-            self.add_scheme_to_catalog(scheme)
+        for scheme in schemes:
+            self._add_entry_to_catalog(scheme, scheme.alias, scheme.uri)
+        mark_catalog_changed(self)
+
+    def _add_entry_to_catalog(self, entry, alias, uri):
+        """
+        Add a scheme or scheme XML element to our catalog. Catalogs that may
+        already be in use must then be marked as changed.
+        """
+        index = len(self._catalog)
+        self._catalog.append(entry)
+        self._catalog_uri_lookup[uri] = index
+        self._catalog_alias_lookup[alias] = index
+
+    def _get_scheme(self, index):
+        """
+        Return the scheme at a given position in our catalog, building it
+        from its XML element if that hasn't been done yet. (Threads sharing
+        a catalog may each build the same scheme; one of them is kept.)
+        """
+        entry = self._catalog[index]
+        if isinstance(entry, etree._Element):
+            lazy = _WRITE_THROUGH if _is_write_through(self) else True
+            entry = Scheme(xmlelement=entry, lazy=lazy)
+            self._catalog[index] = entry
+        elif isinstance(entry, tuple):
+            entry = _object_from_index(Scheme, entry)
+            self._catalog[index] = entry
+        return entry
+
+    def _get_built_element_value(self, item):
+        """
+        The "scheme" array holds the same Scheme objects as our catalog.
+        """
+        if item == 'scheme' and self._element_values.get(item) is _PENDING:
+            if self._catalog_scheme_count:
+                self._element_values[item] = GenericArray(
+                    xmlarray = [
+                        self._get_scheme(index)
+                        for index in range(self._catalog_scheme_count)
+                    ],
+                    element_class = Scheme
+                )
+            else:
+                self._element_values[item] = (
+                    self.get_descriptor().get_empty_array(item)
+                )
+        return super()._get_built_element_value(item)
 
     def add_scheme_to_catalog(self, scheme):
         """Add a given scheme to our catalog"""
-        self._catalog.append(scheme)
-        if hasattr(scheme, 'uri'):
-            self._catalog_uri_lookup[scheme.uri] = scheme
-        if hasattr(scheme, 'alias'):
-            self._catalog_alias_lookup[scheme.alias] = scheme
+        self._add_entry_to_catalog(scheme, scheme.alias, scheme.uri)
+        mark_catalog_changed(self)
 
     def get_scheme_for_alias(self, alias):
         """Return the scheme matching a given alias string"""
-        if alias in self._catalog_alias_lookup.keys():
-            return self._catalog_alias_lookup[alias]
-        return None
+        index = self._catalog_alias_lookup.get(alias)
+        if index is None:
+            return None
+        return self._get_scheme(index)
 
     def get_scheme_for_uri(self, uri):
         """Return the scheme matching a given URI"""
-        if uri in self._catalog_uri_lookup.keys():
-            return self._catalog_uri_lookup[uri]
+        index = self._catalog_uri_lookup.get(uri)
+        if index is None:
+            return None
+        return self._get_scheme(index)
+
+    def get_scheme_aliases(self):
+        """
+        Return the aliases of all schemes in our catalog.
+        """
+        return self._catalog_alias_lookup.keys()
+
+    def get_scheme_uris(self):
+        """
+        Return the URIs of all schemes in our catalog.
+        """
+        return self._catalog_uri_lookup.keys()
+
+    def __getstate__(self):
+        """
+        Our "scheme" array is pickled with our other elements; schemes added
+        to our catalog with add_scheme_to_catalog() are pickled as well.
+        """
+        return (
+            super().__getstate__(),
+            self[self._catalog_scheme_count:]
+        )
+
+    def __setstate__(self, state):
+        (base_state, added_schemes) = state
+        super().__setstate__(base_state)
+        self._init_catalog(self.scheme)
+        self._catalog_scheme_count = len(self._catalog)
+        for scheme in added_schemes:
+            self.add_scheme_to_catalog(scheme)
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Our catalog is built from our "scheme" array.
+        """
+        catalog = super().from_dict(data)
+        catalog._init_catalog(catalog.scheme)
+        catalog._catalog_scheme_count = len(catalog._catalog)
+        return catalog
 
     def __getitem__(self,index):
-        return self._catalog[index]
+        if isinstance(index, slice):
+            return [
+                self._get_scheme(i) for i in range(*index.indices(len(self._catalog)))
+            ]
+        if index < 0:
+            index += len(self._catalog)
+        return self._get_scheme(index)
 
     def __len__(self):
         return len(self._catalog)
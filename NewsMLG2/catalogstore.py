@@ -1,11 +1,14 @@
 #!/usr/bin/env python
 
 """
-Singleton for storing catalogs that will be processed in NewsMLG2 files.
+Stores for the catalogs that will be processed in NewsMLG2 files.
 
 Needs to be in a separate file to avoid import loops.
 """
 
+from collections import OrderedDict
+import threading
+
 class AliasNotFoundInCatalogs(Exception):
     """Alias prefix not found in any catalogs"""
 
@@ -14,38 +17,193 @@ class URINotFoundInCatalogs(Exception):
     """Catalog URI not found in any catalogs"""
 
 
+class CodesNotFoundInCatalogs(Exception):
+    """
+    Some of a batch of qcodes or URIs could not be resolved. `codes` lists
+    the codes that could not be resolved, `results` the results for the
+    whole batch, with None for each code that could not be resolved.
+    """
+    def __init__(self, codes, results):
+        super().__init__(
+            str(len(codes)) + " codes not found in catalogs: " +
+            ", ".join(str(code) for code in codes[:10]) +
+            (", ..." if len(codes) > 10 else "")
+        )
+        self.codes = codes
+        self.results = results
+
+
+# Number of merged catalog indexes kept by _get_catalog_index()
+CATALOG_INDEX_CACHE_SIZE = 64
+
+# Merged catalog indexes, by the versions of the catalogs they index
+_CATALOG_INDEXES = {}
+_CATALOG_INDEXES_LOCK = threading.Lock()
+
+# The most recent catalog version, changed whenever any catalog's schemes
+# change (see mark_catalog_changed())
+_catalog_generation = 0
+_CATALOG_GENERATION_LOCK = threading.Lock()
+
+
+def mark_catalog_changed(catalog):
+    """
+    Give a catalog whose schemes have changed a new version, so that merged
+    indexes built from its old schemes are no longer used.
+    """
+    global _catalog_generation
+    with _CATALOG_GENERATION_LOCK:
+        version = _catalog_generation + 1
+        catalog._catalog_version = version
+        # only changed once the catalog has its new version, so that an
+        # index checked against the new generation sees the new version
+        _catalog_generation = version
+
+
+class _CatalogIndex():
+    """
+    Merged indexes of the position of the catalog declaring each alias and
+    URI, for a sequence of catalogs. Positions are kept rather than the
+    catalogs themselves, so that cached indexes don't keep catalogs alive.
+    """
+    __slots__ = (
+        'alias_lookup', 'uri_lookup', 'uri_lengths', 'qcode_uris', 'uri_qcodes'
+    )
+
+    def __init__(self, catalogs):
+        self.alias_lookup = {}
+        self.uri_lookup = {}
+        # built when first needed, by CatalogStore._get_uri_lengths()
+        self.uri_lengths = None
+        # codes resolved by qcodes_to_uris() and uris_to_qcodes(), least
+        # recently used first
+        self.qcode_uris = OrderedDict()
+        self.uri_qcodes = OrderedDict()
+        for (position, catalog) in enumerate(catalogs):
+            for alias in catalog.get_scheme_aliases():
+                self.alias_lookup.setdefault(alias, position)
+            for uri in catalog.get_scheme_uris():
+                self.uri_lookup.setdefault(uri, position)
+
+
+def _get_catalog_index(catalogs):
+    """
+    Return the _CatalogIndex for the current schemes of a tuple of catalogs.
+    Items referring to the same (shared, built-in) catalogs share the same
+    index; the least recently created indexes are dropped when there are
+    too many.
+    """
+    # catalog versions are never reused, so they identify the catalogs and
+    # their schemes without holding references to them
+    key = tuple(catalog._catalog_version for catalog in catalogs)
+    index = _CATALOG_INDEXES.get(key)
+    if index is None:
+        index = _CatalogIndex(catalogs)
+        with _CATALOG_INDEXES_LOCK:
+            if len(_CATALOG_INDEXES) >= CATALOG_INDEX_CACHE_SIZE:
+                del _CATALOG_INDEXES[next(iter(_CATALOG_INDEXES))]
+            index = _CATALOG_INDEXES.setdefault(key, index)
+    return index
+
+
+class _StoreContents():
+    """
+    The catalogs held by a CatalogStore, and their merged _CatalogIndex once
+    it has been built. A store's contents are replaced as a whole when its
+    catalogs change, so that readers always see catalogs and an index that
+    belong together.
+    """
+    __slots__ = ('catalogs', 'checked_index')
+
+    def __init__(self, catalogs):
+        self.catalogs = catalogs
+        # (catalog generation, index) once the index has been looked up, by
+        # CatalogStore._get_index()
+        self.checked_index = (None, None)
+
+
 class CatalogStore():
     """
-    Singleton class to handle all catalogs used
-    in this NewsMLG2 processor.
+    Store for the catalogs used to resolve qcodes and URIs.
+    Each parsed item has its own CatalogStore (see AnyItem.get_catalogs());
+    CATALOG_STORE holds the catalogs of the most recently parsed item.
+
+    The store looks up merged indexes of the catalog declaring each alias and
+    URI, so lookups take the same time however many catalogs are loaded.
+    The indexes are built the first time they are needed and are shared by
+    stores holding the same catalogs; they are rebuilt when schemes are
+    added to any of the catalogs. When several catalogs declare the same
+    alias (or URI), the catalog added first takes precedence.
     """
-    _list = []
-    def __init__(self, val = []):
-        self._list = val
+    def __init__(self, val = None):
+        self.set_catalogs([] if val is None else val)
+
+    def set_catalogs(self, catalogs):
+        """
+        Replace the catalogs in the store. Other threads reading the store
+        see either the old catalogs or the new ones, never a mix.
+        """
+        self._contents = _StoreContents(tuple(catalogs))
+
+    def _get_index(self):
+        """
+        Return the catalogs in the store and their merged _CatalogIndex.
+        The index is only looked up again when a catalog has changed since
+        it was last checked.
+        """
+        contents = self._contents
+        generation = _catalog_generation
+        (checked_generation, index) = contents.checked_index
+        if checked_generation != generation:
+            index = _get_catalog_index(contents.catalogs)
+            contents.checked_index = (generation, index)
+        return (contents.catalogs, index)
+
+    def snapshot(self):
+        """
+        Return a store holding the catalogs currently in this one, which
+        keeps them when this store's catalogs are replaced.
+        """
+        store = CatalogStore.__new__(CatalogStore)
+        store._contents = self._contents
+        return store
+
+    def get_code_cache(self, name):
+        """
+        Return the OrderedDict caching the results of qcodes_to_uris()
+        (`name` 'qcode_uris') or uris_to_qcodes() (`name` 'uri_qcodes') for
+        the catalogs in the store, least recently used first. The cache is
+        shared by all stores holding the same catalogs, and is dropped when
+        schemes are added to any of them.
+        """
+        if name not in ('qcode_uris', 'uri_qcodes'):
+            raise ValueError("Unknown code cache '" + name + "'")
+        (_, index) = self._get_index()
+        return getattr(index, name)
 
     def append(self, rhs):
-        self._list.append(rhs)
+        self.set_catalogs(self._contents.catalogs + (rhs,))
         return self
 
     def __getitem__(self, item):
         """
         Return a given catalog in our list.
         """
-        return self._list.__getitem__(item)
+        return self._contents.catalogs[item]
 
     def __len__(self):
-        return len(self._list)
+        return len(self._contents.catalogs)
 
     def get_scheme_for_alias(self, alias):
         """
         Return the catalog scheme matching a given alias.
         e.g. 'nrol' would return the Scheme for 'name role'.
         """
-        for catalog in self._list:
-            scheme = catalog.get_scheme_for_alias(alias)
-            if scheme is not None:
-                return scheme
-        raise AliasNotFoundInCatalogs()
+        (catalogs, index) = self._get_index()
+        position = index.alias_lookup.get(alias)
+        if position is None:
+            raise AliasNotFoundInCatalogs()
+        return catalogs[position].get_scheme_for_alias(alias)
 
     def get_scheme_for_uri(self, uri):
         """
@@ -53,11 +211,49 @@ class CatalogStore():
         e.g. 'https://cv.iptc.org/newscodes/scene' would return the Scheme for
         'scene'.
         """
-        for catalog in self._list:
-            scheme = catalog.get_scheme_for_uri(uri)
-            if scheme is not None:
-                return scheme
+        (catalogs, index) = self._get_index()
+        position = index.uri_lookup.get(uri)
+        if position is None:
+            raise URINotFoundInCatalogs()
+        return catalogs[position].get_scheme_for_uri(uri)
+
+
+    def find_scheme_for_uri(self, uri):
+        """
+        Return (scheme, code) for the scheme whose URI is the longest prefix
+        of a given URI, and the rest of the URI after that prefix.
+        e.g. 'http://cv.iptc.org/newscodes/scene/0001' would return the Scheme
+        for 'scene' and '0001'.
+        Only prefixes with the length of a scheme URI are looked up, longest
+        first, so there are at most as many lookups as there are distinct
+        lengths of scheme URIs no longer than the URI.
+        """
+        (catalogs, index) = self._get_index()
+        uri_lookup = index.uri_lookup
+        uri_length = len(uri)
+        for length in self._get_uri_lengths(index):
+            if length <= uri_length:
+                position = uri_lookup.get(uri[:length])
+                if position is not None:
+                    return (
+                        catalogs[position].get_scheme_for_uri(uri[:length]),
+                        uri[length:]
+                    )
         raise URINotFoundInCatalogs()
 
+    @staticmethod
+    def _get_uri_lengths(index):
+        """
+        Return the distinct lengths of the scheme URIs in a _CatalogIndex,
+        longest first.
+        """
+        uri_lengths = index.uri_lengths
+        if uri_lengths is None:
+            uri_lengths = tuple(sorted(
+                {len(uri) for uri in index.uri_lookup if uri}, reverse=True
+            ))
+            index.uri_lengths = uri_lengths
+        return uri_lengths
+
 
 CATALOG_STORE = CatalogStore([])
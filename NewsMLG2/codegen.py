@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+
+"""
+Specialized parsers: generate one parse function per NewsML-G2 class from
+its `attributes` and `elements` declarations, instead of interpreting the
+declarations for every element parsed.
+
+Generated parsers are opt-in:
+
+    NewsMLG2.enable_specialized_parsers()
+
+Each class's parser is generated the first time an instance of the class is
+parsed and cached (on its ClassDescriptor) for the rest of the process.
+Parsing with a specialized parser produces the same object graph as the
+generic parser in BaseObject._parse_xmlelement().
+"""
+
+import re
+
+from .core import (
+    _ABSENT, _EMPTY_MAPPING, _PENDING, _SET_ATTRIBUTE_MASK, _SET_ATTRIBUTE_VALUES,
+    _SET_ELEMENT_VALUES, _SET_EXTENSION_ELEMENTS, _SET_LAZY, _SET_TEXT,
+    _SET_XMLELEMENT, _SET_XS_ANY_CONTENT, ClassDescriptor, ExtensionElement,
+    GenericArray, NEWSMLG2NSPREFIX, NITFNSPREFIX, XMLNSPREFIX, _pack_attributes
+)
+
+# Generated parsers set BaseObject's slots with the setters from core, which
+# skips BaseObject.__setattr__()
+SLOT_SETTERS = {
+    'SET__ATTRIBUTE_MASK': _SET_ATTRIBUTE_MASK,
+    'SET__ATTRIBUTE_VALUES': _SET_ATTRIBUTE_VALUES,
+    'SET__ELEMENT_VALUES': _SET_ELEMENT_VALUES,
+    'SET__EXTENSION_ELEMENTS': _SET_EXTENSION_ELEMENTS,
+    'SET__XS_ANY_CONTENT': _SET_XS_ANY_CONTENT,
+    'SET__TEXT': _SET_TEXT,
+    'SET__XMLELEMENT': _SET_XMLELEMENT,
+    'SET__LAZY': _SET_LAZY,
+}
+
+
+def enable_specialized_parsers():
+    """
+    Use generated, per-class parse functions for all NewsML-G2 objects.
+    """
+    ClassDescriptor.parser_factory = build_parser
+
+
+def disable_specialized_parsers():
+    """
+    Go back to using the generic parser for all NewsML-G2 objects.
+    Parsers that have already been generated stay cached.
+    """
+    ClassDescriptor.parser_factory = None
+
+
+def build_parser(descriptor):
+    """
+    Generate, compile and return the parse function for the class described
+    by `descriptor`.
+    """
+    source, namespace = generate_parser_source(descriptor)
+    code = compile(
+        source, '<NewsMLG2 parser for ' + descriptor.cls.__name__ + '>', 'exec'
+    )
+    exec(code, namespace)  # pylint: disable=exec-used
+    parser = namespace['parse']
+    parser.source = source
+    return parser
+
+
+def generate_parser_source(descriptor):
+    """
+    Return the Python source of the parse function for the class described
+    by `descriptor`, and the namespace of constants it refers to.
+    """
+    namespace = {
+        'ABSENT': _ABSENT,
+        'EMPTY_MAPPING': _EMPTY_MAPPING,
+        'PENDING': _PENDING,
+        'ExtensionElement': ExtensionElement,
+        'GenericArray': GenericArray,
+        'WHITESPACE_RE': re.compile(r"\s+"),
+        'DEFINED_NAMES': frozenset(descriptor.defined_names),
+        'NEWSMLG2NSPREFIX': NEWSMLG2NSPREFIX,
+        'NITFNSPREFIX': NITFNSPREFIX,
+        'XMLNSPREFIX': XMLNSPREFIX,
+        'PACK_ATTRIBUTES': _pack_attributes,
+        **SLOT_SETTERS
+    }
+    lines = [
+        'def parse(self, xmlelement, lazy):',
+    ]
+    lines += _generate_attributes(descriptor, namespace)
+    lines += _generate_children(descriptor, namespace)
+    lines += [
+        '    text = xmlelement.text',
+        '    if text:',
+        '        SET__TEXT(self, WHITESPACE_RE.sub(" ", text).strip())',
+        '    else:',
+        '        SET__TEXT(self, None)',
+    ]
+    return '\n'.join(lines) + '\n', namespace
+
+
+def _generate_attributes(descriptor, namespace):
+    """
+    Code to read the attributes of the element into the positional
+    attribute storage.
+    """
+    if not descriptor.attributes:
+        return [
+            '    SET__ATTRIBUTE_MASK(self, 0)',
+            '    SET__ATTRIBUTE_VALUES(self, ())',
+        ]
+    bits_by_xml_name = descriptor.attribute_bits_by_xml_name
+    lines = [
+        '    attribute_mask = 0',
+        '    attribute_values = ()',
+        '    if xmlelement.attrib:',
+        '        found_attributes = []',
+        '        for attribute_xmlname, xmlattr_value in xmlelement.items():',
+    ]
+    if all(len(bits) == 1 for bits in bits_by_xml_name.values()):
+        namespace['ATTRIBUTE_BITS'] = {
+            xml_name: bits[0] for (xml_name, bits) in bits_by_xml_name.items()
+        }
+        lines += [
+            '            bit = ATTRIBUTE_BITS.get(attribute_xmlname)',
+            '            if bit is not None:',
+            '                found_attributes.append((bit, xmlattr_value))',
+        ]
+    else:
+        # several attributes are declared with the same XML name
+        namespace['ATTRIBUTE_BITS'] = {
+            xml_name: tuple(bits) for (xml_name, bits) in bits_by_xml_name.items()
+        }
+        lines += [
+            '            for bit in ATTRIBUTE_BITS.get(attribute_xmlname, ()):',
+            '                found_attributes.append((bit, xmlattr_value))',
+        ]
+    lines += [
+        '        if found_attributes:',
+        '            (attribute_mask, attribute_values) = PACK_ATTRIBUTES(found_attributes)',
+        '    SET__ATTRIBUTE_MASK(self, attribute_mask)',
+        '    SET__ATTRIBUTE_VALUES(self, attribute_values)',
+    ]
+    return lines
+
+
+def _generate_children(descriptor, namespace):
+    """
+    Code to dispatch the children of the element in a single pass and build
+    the defined child elements.
+    """
+    element_ids = [
+        element_id for (element_id, element_definition)
+        in descriptor.element_definitions
+    ]
+    # one list of matching children per distinct tag
+    tag_index = {}
+    for element_id in element_ids:
+        tag_index.setdefault(descriptor.element_tags[element_id], len(tag_index))
+    namespace['TAG_INDEX'] = tag_index
+    namespace['ELEMENT_IDS'] = element_ids
+    xs_any_value = descriptor.xs_any
+
+    lines = [
+        '    xs_any_content = None',
+        '    extension_elements = None',
+    ]
+    if tag_index:
+        lines.append('    found = [None] * ' + str(len(tag_index)))
+    lines += [
+        '    for child in xmlelement:',
+        '        tag = child.tag',
+        '        if not isinstance(tag, str):',
+        '            continue',
+    ]
+    if tag_index:
+        lines += [
+            '        index = TAG_INDEX.get(tag)',
+            '        if index is not None and not lazy:',
+            '            children = found[index]',
+            '            if children is None:',
+            '                found[index] = [child]',
+            '            else:',
+            '                children.append(child)',
+        ]
+    else:
+        lines.append('        index = None')
+    xs_any_test = _xs_any_test(xs_any_value, namespace)
+    if xs_any_test is not None:
+        lines += [
+            '        if ' + xs_any_test + ':',
+            '            if xs_any_content is None:',
+            '                xs_any_content = []',
+            '            xs_any_content.append(child)',
+            '            continue',
+        ]
+    lines += [
+        '        if index is not None:',
+        '            continue',
+        '        local_name = tag',
+        '        if local_name.startswith(NEWSMLG2NSPREFIX):',
+        '            local_name = local_name[' + str(len(NEWSMLG2NSPREFIX)) + ':]',
+        '        elif local_name.startswith(NITFNSPREFIX):',
+        '            local_name = local_name[' + str(len(NITFNSPREFIX)) + ':]',
+        '        elif local_name.startswith(XMLNSPREFIX):',
+        '            local_name = local_name[' + str(len(XMLNSPREFIX)) + ':]',
+        '        if local_name not in DEFINED_NAMES:',
+        '            if extension_elements is None:',
+        '                extension_elements = {}',
+        '            extension_elements["extension_" + local_name] = (',
+        '                ExtensionElement(xmlelement=child)',
+        '            )',
+        '    SET__XS_ANY_CONTENT(self, xs_any_content or ())',
+        '    SET__EXTENSION_ELEMENTS(self, extension_elements or EMPTY_MAPPING)',
+    ]
+    if not element_ids:
+        return lines + [
+            '    SET__ELEMENT_VALUES(self, EMPTY_MAPPING)',
+            '    SET__XMLELEMENT(self, xmlelement)',
+            '    SET__LAZY(self, lazy or False)',
+        ]
+
+    lines += [
+        '    SET__XMLELEMENT(self, xmlelement)',
+        '    if lazy:',
+        '        SET__LAZY(self, lazy)',
+        '        SET__ELEMENT_VALUES(self, dict.fromkeys(ELEMENT_IDS, PENDING))',
+        '    else:',
+        '        SET__LAZY(self, False)',
+    ]
+    values = []
+    for (position, element_id) in enumerate(element_ids):
+        element_class_name = 'CLASS_' + str(position)
+        namespace[element_class_name] = descriptor.element_classes[element_id]
+        index = tag_index[descriptor.element_tags[element_id]]
+        value = 'value_' + str(position)
+        lines.append('        children = found[' + str(index) + ']')
+        if element_id in descriptor.array_element_ids:
+            empty_array_name = 'EMPTY_ARRAY_' + str(position)
+            namespace[empty_array_name] = descriptor.get_empty_array(element_id)
+            lines += [
+                '        if children is None:',
+                '            ' + value + ' = ' + empty_array_name,
+                '        else:',
+                '            ' + value + ' = GenericArray(',
+                '                xmlarray = children,',
+                '                element_class = ' + element_class_name + ',',
+                '                lazy = False',
+                '            )',
+            ]
+        else:
+            lines += [
+                '        if children is None:',
+                '            ' + value + ' = ABSENT',
+                '        else:',
+                '            ' + value + ' = ' + element_class_name +
+                '(xmlelement = children[0], lazy = False)',
+            ]
+        values.append('            ' + repr(element_id) + ': ' + value + ',')
+    lines += ['        SET__ELEMENT_VALUES(self, {'] + values + ['        })']
+    return lines
+
+
+def _xs_any_test(xs_any_value, namespace):
+    """
+    Return the condition deciding whether a child element (`tag`) is xs:any
+    content, following BaseObject._should_process_as_xs_any(); or None if
+    the class doesn't accept xs:any content.
+    """
+    if xs_any_value is None:
+        return None
+    if xs_any_value == "any":
+        return 'True'
+    if xs_any_value == "other":
+        return 'not tag.startswith(NEWSMLG2NSPREFIX)'
+    if xs_any_value.startswith("http://") or xs_any_value.startswith("https://"):
+        namespace['XS_ANY_NSPREFIX'] = '{' + xs_any_value + '}'
+        return 'tag.startswith(XS_ANY_NSPREFIX)'
+    return None
@@ -6,7 +6,12 @@ of our XML-based elements. Use magic methods to handle
 property accessors to make processing easier.
 """
 
+import copy
+import io
+import itertools
 import re
+import zlib
+from types import MappingProxyType
 from lxml import etree
 
 from .catalogstore import CATALOG_STORE
@@ -21,20 +26,950 @@ XML_NS = 'http://www.w3.org/XML/1998/namespace'
 XMLNSPREFIX = '{%s}' % XML_NS
 NSMAP = {None : NEWSMLG2_NS, 'xml': XML_NS, 'nitf': NITF_NS}
 
+# Placeholder for a child element of a lazily parsed object that has not
+# been built yet
+_PENDING = object()
+
+# Value of the `lazy` parse option, and of BaseObject._lazy, for objects
+# parsed in write-through mode: they are built lazily, and setting their
+# attributes and elements changes the element they were parsed from
+_WRITE_THROUGH = 'write-through'
+
+
+class _WriteThroughPlaceholder():
+    """
+    Value of BaseObject._lazy for the empty object returned for a missing
+    element of an object in write-through mode. The empty object is added
+    to its parent's element when it is first modified.
+    """
+    __slots__ = ('parent', 'element_id')
+
+    def __init__(self, parent, element_id):
+        self.parent = parent
+        self.element_id = element_id
+
+
+def _is_write_through(obj):
+    """
+    Return True if changes to an object are written to its source element.
+    """
+    lazy = obj._lazy
+    return lazy is _WRITE_THROUGH or isinstance(lazy, _WriteThroughPlaceholder)
+
+
+class _AbsentElement():
+    """
+    Shared, immutable stand-in for a 'single' child element that was not
+    present in the parsed XML. It is replaced by an empty object of the
+    element's class when the element is first accessed.
+    """
+    __slots__ = ()
+
+    def __bool__(self):
+        return False
+
+    def __str__(self):
+        return ''
+
+_ABSENT = _AbsentElement()
+
+# Shared read-only mapping used in place of an empty dict by objects that
+# have no element values or extension elements
+_EMPTY_MAPPING = MappingProxyType({})
+
+
+def _copy_xs_any_element(xmlelement):
+    """
+    Return a copy of an xs:any element, without modifying the original.
+    Like serializing and re-parsing the element, the copy declares every
+    namespace in scope in the source document but not its tail.
+    """
+    copied_elem = etree.Element(xmlelement.tag, nsmap=xmlelement.nsmap)
+    for name, value in xmlelement.items():
+        copied_elem.set(name, value)
+    copied_elem.text = xmlelement.text
+    for child in xmlelement:
+        copied_elem.append(copy.deepcopy(child))
+    return copied_elem
+
+
+def _get_indent(xmlelement):
+    """
+    Return the whitespace (a newline and indentation) before an element of
+    a pretty printed document, or None if there isn't any.
+    """
+    previous = xmlelement.getprevious()
+    if previous is not None:
+        text = previous.tail
+    else:
+        parent = xmlelement.getparent()
+        if parent is None:
+            return '\n'
+        text = parent.text
+    if text is not None and text.startswith('\n') and text.isspace():
+        return text
+    return None
+
+
+def _get_indent_step(indent, child_indent):
+    """
+    Return the indentation added for each level of a pretty printed
+    document, given the whitespace before an element and its children.
+    """
+    if (indent is not None and child_indent.startswith(indent)
+            and len(child_indent) > len(indent)):
+        return child_indent[len(indent):]
+    return '  '
+
+
+def _get_child_indent(xmlelement):
+    """
+    Return the whitespace before each child of an element of a pretty
+    printed document, or None if its children aren't indented.
+    """
+    if len(xmlelement):
+        return _get_indent(xmlelement[0])
+    indent = _get_indent(xmlelement)
+    if indent is None or xmlelement.text:
+        return None
+    parent = xmlelement.getparent()
+    parent_indent = None if parent is None else _get_indent(parent)
+    return indent + _get_indent_step(parent_indent, indent)
+
+
+def _indent_source_element(xmlelement, indent, step):
+    """
+    Indent the content of a new element of a pretty printed document, given
+    the whitespace before it and the indentation of each level.
+    """
+    if not len(xmlelement):
+        return
+    etree.indent(xmlelement, space=step)
+    for element in xmlelement.iter():
+        if element is not xmlelement and element.tail and element.tail.isspace():
+            element.tail = indent + element.tail[1:]
+        if len(element) and element.text and element.text.isspace():
+            element.text = indent + element.text[1:]
+
+
+def _remove_source_elements(xmlelement, old_xmlelements):
+    """
+    Remove children of a source element, keeping the indentation of the
+    others.
+    """
+    for old_xmlelement in old_xmlelements:
+        if old_xmlelement.getnext() is None:
+            # the whitespace before our end tag now follows the previous child
+            previous = old_xmlelement.getprevious()
+            if previous is None:
+                if xmlelement.text is not None and xmlelement.text.isspace():
+                    xmlelement.text = None
+            elif previous.tail is not None and previous.tail.isspace():
+                previous.tail = old_xmlelement.tail
+        xmlelement.remove(old_xmlelement)
+
+
+def _insert_source_elements(xmlelement, index, new_xmlelements):
+    """
+    Insert new children in a source element at `index`, indented like the
+    rest of the document if it is pretty printed.
+    """
+    if not new_xmlelements:
+        return
+    child_indent = _get_child_indent(xmlelement)
+    if child_indent is not None:
+        if len(xmlelement):
+            end_indent = xmlelement[-1].tail
+        else:
+            end_indent = _get_indent(xmlelement)
+        step = _get_indent_step(_get_indent(xmlelement), child_indent)
+        if index == 0:
+            xmlelement.text = child_indent
+        else:
+            xmlelement[index - 1].tail = child_indent
+        for new_xmlelement in new_xmlelements:
+            _indent_source_element(new_xmlelement, child_indent, step)
+            new_xmlelement.tail = child_indent
+        if index == len(xmlelement):
+            new_xmlelements[-1].tail = end_indent
+    for (offset, new_xmlelement) in enumerate(new_xmlelements):
+        xmlelement.insert(index + offset, new_xmlelement)
+
+
+def _to_source_element(obj):
+    """
+    Return a new element for an object being added to a document in
+    write-through mode, without the namespace declarations it doesn't use.
+    """
+    xmlelement = obj.to_xml()
+    etree.cleanup_namespaces(xmlelement)
+    return xmlelement
+
+
+def _bind_source_element(obj, xmlelement):
+    """
+    Parse an object again from the element it was written to, so that
+    changes to it are written through to that element.
+    """
+    obj.get_descriptor().get_parser()(obj, xmlelement, _WRITE_THROUGH)
+
+
+def _get_bound_source_element(obj):
+    """
+    Return the element an object is written through to, or None.
+    """
+    if isinstance(obj, BaseObject) and _is_write_through(obj):
+        return obj._xmlelement
+    return None
+
+
+def _check_source_element(obj, replaceable_xmlelements):
+    """
+    Raise ValueError if an object being assigned in write-through mode is
+    written through to an element of a document, other than one of the
+    elements it is replacing: it can't be in two places at once.
+    """
+    xmlelement = _get_bound_source_element(obj)
+    if (xmlelement is not None and xmlelement.getparent() is not None
+            and not any(xmlelement is replaceable
+                        for replaceable in replaceable_xmlelements)):
+        raise ValueError(
+            "{} is already part of a write-through document, remove it "
+            "from there first or assign a copy".format(type(obj).__name__)
+        )
+
+
+def _take_source_element(obj, new_xmlelements):
+    """
+    Return the element to add to a document in write-through mode for an
+    object being assigned, and whether the object must be bound to it.
+    An object that is already written through keeps its element, which is
+    moved: if that element is still in the document, for another item of
+    the same array, a copy of it is left there for that item.
+    """
+    xmlelement = _get_bound_source_element(obj)
+    if xmlelement is None:
+        return (_to_source_element(obj), True)
+    if any(xmlelement is new_xmlelement for new_xmlelement in new_xmlelements):
+        # the same object twice: only its first element follows its changes
+        copied = copy.deepcopy(xmlelement)
+        etree.cleanup_namespaces(copied)
+        return (copied, False)
+    parent = xmlelement.getparent()
+    if parent is not None:
+        copied = copy.deepcopy(xmlelement)
+        parent.replace(xmlelement, copied)
+        etree.cleanup_namespaces(copied)
+    xmlelement.tail = None
+    etree.cleanup_namespaces(xmlelement)
+    return (xmlelement, False)
+
+
+def _swap_source_elements(xmlelement, other):
+    """
+    Swap two elements of a document, keeping the whitespace around them.
+    """
+    placeholder = etree.Comment()
+    xmlelement.getparent().replace(xmlelement, placeholder)
+    other.getparent().replace(other, xmlelement)
+    placeholder.getparent().replace(placeholder, other)
+    (xmlelement.tail, other.tail) = (other.tail, xmlelement.tail)
+
+
+def _get_array_source_elements(array, index):
+    """
+    Return the elements the items of a write-through array are written to,
+    by position: all the children with their tag of the element they are
+    in. Returns None if the array (or its item at `index`) isn't written
+    through.
+    """
+    if _get_bound_source_element(array._array_contents[index]) is None:
+        return None
+    for obj in array._array_contents:
+        xmlelement = _get_bound_source_element(obj)
+        parent = None if xmlelement is None else xmlelement.getparent()
+        if parent is not None:
+            xmlelements = parent.findall(xmlelement.tag)
+            if len(xmlelements) != len(array._array_contents):
+                raise TypeError(
+                    "Write-through array is out of step with its document"
+                )
+            return xmlelements
+    return None
+
+
+# Namespaces declared by the root element of a serialized document
+_ROOT_NSMAP = {prefix: uri for (prefix, uri) in NSMAP.items() if prefix != 'xml'}
+
+
+def _get_xmlfile_attributes(attributes):
+    """
+    Return attributes as a dict to pass to an lxml xmlfile. xmlfile would
+    declare a prefix for the xml namespace, so attributes in it are given
+    their reserved prefix directly.
+    """
+    xmlfile_attributes = {}
+    for (name, value) in attributes:
+        if name.startswith(XMLNSPREFIX):
+            name = 'xml:' + name[len(XMLNSPREFIX):]
+        xmlfile_attributes[name] = value
+    return xmlfile_attributes
+
+
+def _write_empty_element(xmlfile, tag, attributes, scope, nsmap=None):
+    """
+    Write an element with no content as an empty tag, if it can be written
+    declaring only the namespaces in `nsmap`: it is in the default namespace
+    of `scope` and its attributes are in no namespace or in one declared in
+    `nsmap`. Return whether it was written. xmlfile.element() would write a
+    start and an end tag.
+    """
+    nsmap = nsmap or {}
+    qname = etree.QName(tag)
+    if qname.namespace != scope.get(None) or None in nsmap:
+        return False
+    for (name, value) in attributes:
+        if name.startswith('{') and (
+                etree.QName(name).namespace not in nsmap.values()):
+            return False
+    # an element with no namespace is written without declaring one, so it
+    # takes on the default namespace in scope
+    xmlfile.write(etree.Element(qname.localname, dict(attributes), nsmap=nsmap))
+    return True
+
+
+def _get_prefixed_name(name, scope, prefix=None, is_attribute=False):
+    """
+    Return an element or attribute name in {namespace}localname form as
+    prefix:localname, using a prefix declared for its namespace in `scope`
+    (preferably `prefix`). Attributes can't take the default namespace.
+    The name is returned unchanged if no prefix is declared for it.
+    """
+    if not name.startswith('{'):
+        return name
+    qname = etree.QName(name)
+    if qname.namespace == XML_NS:
+        return 'xml:' + qname.localname
+    if scope.get(prefix) != qname.namespace or (prefix is None and is_attribute):
+        prefix = next((
+            scope_prefix for (scope_prefix, uri) in scope.items()
+            if uri == qname.namespace and not (scope_prefix is None and is_attribute)
+        ), False)
+        if prefix is False:
+            # let xmlfile declare a prefix for the namespace
+            return name
+    if prefix is None:
+        return qname.localname
+    return prefix + ':' + qname.localname
+
+
+def _write_xml_element(xmlfile, xmlelement, indent, scope, with_tail):
+    """
+    Write an lxml element (an extension element or xs:any content) to an
+    lxml xmlfile. As when the element is appended to a tree and serialized,
+    only namespaces not already in `scope` are declared, in the order of the
+    source document. Names are given their prefixes here, as xmlfile would
+    sort the namespace declarations.
+    """
+    if not isinstance(xmlelement.tag, str):
+        # comments and processing instructions
+        xmlfile.write(xmlelement, with_tail=with_tail)
+        return
+    in_scope = set(scope.values())
+    nsmap = {
+        prefix: uri for (prefix, uri) in xmlelement.nsmap.items()
+        if prefix != 'xml' and uri not in in_scope
+    }
+    attributes = xmlelement.items()
+    children = list(xmlelement)
+    if xmlelement.text is not None or any(
+            child.tail is not None for child in children):
+        indent = None
+    if children or xmlelement.text is not None or not _write_empty_element(
+            xmlfile, xmlelement.tag, attributes, scope, nsmap):
+        xmlfile_attributes = {}
+        if nsmap:
+            scope = dict(scope)
+            scope.update(nsmap)
+            for (prefix, uri) in nsmap.items():
+                xmlfile_attributes['xmlns:' + prefix if prefix else 'xmlns'] = uri
+        for (name, value) in attributes:
+            xmlfile_attributes[_get_prefixed_name(
+                name, scope, is_attribute=True
+            )] = value
+        tag = _get_prefixed_name(xmlelement.tag, scope, xmlelement.prefix)
+        with xmlfile.element(tag, xmlfile_attributes):
+            if xmlelement.text is not None:
+                xmlfile.write(xmlelement.text)
+            for child in children:
+                if indent is not None:
+                    xmlfile.write('\n' + '  ' * (indent + 1))
+                _write_xml_element(
+                    xmlfile, child, None if indent is None else indent + 1,
+                    scope, True
+                )
+            if indent is not None and children:
+                xmlfile.write('\n' + '  ' * indent)
+    if with_tail and xmlelement.tail is not None:
+        xmlfile.write(xmlelement.tail)
+
+
+def _copy_source_element(descriptor, xmlelement, obj=None):
+    """
+    Return a copy of `xmlelement`, made the same as the element to_xml()
+    builds for an object of the descriptor's class parsed from it, or None
+    if that can't be done. If `obj` is given, it is the object parsed from
+    `xmlelement`, and children of it that have been modified are built with
+    to_xml() in the copy.
+    Copying a source element with lxml is much faster than building it from
+    objects, and in lazy mode needs no objects to be built.
+    """
+    copied = copy.deepcopy(xmlelement)
+    copied.tail = None
+    # (copied child, element to replace it with, or None to remove it)
+    replacements = []
+    if not _match_source_copy(descriptor, xmlelement, copied, obj, replacements):
+        return None
+    placeholders = []
+    for (copied_child, replacement) in replacements:
+        if replacement is None:
+            copied_child.getparent().remove(copied_child)
+        else:
+            placeholder = etree.Comment()
+            copied_child.getparent().replace(copied_child, placeholder)
+            placeholders.append((placeholder, replacement))
+    # drop the namespace declarations of the source document that aren't
+    # used; the NewsML-G2 namespace declared on the copy is removed when it
+    # is appended to the output tree. Replacement elements are added after
+    # this, as they keep the namespace declarations to_xml() gives them.
+    etree.cleanup_namespaces(copied)
+    for (placeholder, replacement) in placeholders:
+        placeholder.getparent().replace(placeholder, replacement)
+    return copied
+
+
+def _is_empty_source(descriptor, xmlelement):
+    """
+    Return True if an object of the descriptor's class parsed from
+    `xmlelement` would be false, so that to_xml() leaves it out.
+    """
+    if descriptor.element_definitions:
+        return False
+    text = xmlelement.text
+    if text and re.sub(r"\s+", " ", text).strip():
+        return False
+    attribute_positions = descriptor.attribute_positions
+    for (attribute_name, value) in xmlelement.items():
+        if value and attribute_name in attribute_positions:
+            return False
+    return True
+
+
+def _source_attributes_unchanged(descriptor, attribute_names):
+    """
+    Return True if to_xml() outputs the attributes of a source element with
+    these attribute XML names as they are: they are declared, in the order
+    they are declared, and include those with a default value and those
+    that are required.
+    """
+    last_position = -1
+    attribute_positions = descriptor.attribute_positions
+    for attribute_name in attribute_names:
+        position = attribute_positions.get(attribute_name, -1)
+        if position <= last_position:
+            return False
+        last_position = position
+    return (descriptor.default_attribute_names.issubset(attribute_names)
+            and descriptor.required_attribute_names.issubset(attribute_names))
+
+
+def _get_source_attributes(descriptor, xmlelement):
+    """
+    Return the (XML name, value) of the attributes to_xml() outputs for an
+    object parsed from `xmlelement`, or None if a required attribute is
+    missing.
+    """
+    xml_attributes = {}
+    source_attributes = xmlelement.attrib
+    for (attribute_id, attribute_definition) in descriptor.attributes.items():
+        xml_name = attribute_definition['xml_name']
+        if xml_name in source_attributes:
+            xml_attributes.setdefault(xml_name, source_attributes[xml_name])
+        elif 'default' in attribute_definition:
+            xml_attributes.setdefault(xml_name, attribute_definition['default'])
+        elif attribute_definition.get('use') == 'required':
+            return None
+    return list(xml_attributes.items())
+
+
+# Kinds of the children of a source element (see _get_source_child_kind())
+_SOURCE_CHILD_DROPPED = 0
+_SOURCE_CHILD_XS_ANY = 1
+_SOURCE_CHILD_ELEMENT = 2
+_SOURCE_CHILD_UNCOPYABLE = 3
+
+
+def _get_source_child_kind(descriptor, child):
+    """
+    Return (kind, element ID) for a child of a source element of the
+    descriptor's class: whether to_xml() leaves it out (comments, processing
+    instructions, and elements whose local name is defined in the NITF or
+    XML namespace), outputs it as xs:any content, or as the defined element
+    with the returned ID, or whether it keeps the source element from being
+    copied (extension elements, and tags that are ambiguous).
+    """
+    tag = child.tag
+    if not isinstance(tag, str):
+        return (_SOURCE_CHILD_DROPPED, None)
+    element_ids = descriptor.element_ids_by_tag.get(tag)
+    xs_any = descriptor.xs_any
+    if xs_any is not None and BaseObject._should_process_as_xs_any(
+            child, xs_any, descriptor.defined_names):
+        if element_ids is not None:
+            return (_SOURCE_CHILD_UNCOPYABLE, None)
+        return (_SOURCE_CHILD_XS_ANY, None)
+    if element_ids is None:
+        # undefined elements are kept as extension elements, unless
+        # their local name is defined in the NITF or XML namespace
+        for prefix in (NITFNSPREFIX, XMLNSPREFIX):
+            if (tag.startswith(prefix)
+                    and tag[len(prefix):] in descriptor.defined_names):
+                return (_SOURCE_CHILD_DROPPED, None)
+        return (_SOURCE_CHILD_UNCOPYABLE, None)
+    if len(element_ids) > 1:
+        return (_SOURCE_CHILD_UNCOPYABLE, None)
+    return (_SOURCE_CHILD_ELEMENT, element_ids[0])
+
+
+def _match_source_copy(descriptor, xmlelement, copied, obj, replacements):
+    """
+    Make `copied`, a copy of `xmlelement`, the same as the element to_xml()
+    builds for an object parsed from `xmlelement` (or for `obj`, if given),
+    adding the changes to make to its children to `replacements`. Return
+    False if the copy can't be used.
+    """
+    if not descriptor.source_copyable or (
+            obj is not None and obj._xmlelement is not xmlelement):
+        return False
+    if xmlelement.tag != descriptor.xml_tag:
+        copied.tag = descriptor.xml_tag
+
+    # attributes are output in the order they are declared, with defaults
+    if not _source_attributes_unchanged(descriptor, xmlelement.keys()):
+        attributes = _get_source_attributes(descriptor, xmlelement)
+        if attributes is None:
+            return False
+        copied.attrib.clear()
+        for (xml_name, value) in attributes:
+            copied.set(xml_name, value)
+
+    text = xmlelement.text
+    if text is not None:
+        normalized_text = re.sub(r"\s+", " ", text).strip()
+        if normalized_text != text:
+            copied.text = normalized_text or None
+
+    # defined elements are output in the order they are defined, followed
+    # by xs:any content
+    element_positions = descriptor.element_positions
+    array_element_ids = descriptor.array_element_ids
+    element_values = obj._element_values if obj is not None else _EMPTY_MAPPING
+    element_counts = {}
+    # (copied child, replacement) for the children of each array element
+    array_replacements = {}
+    has_xs_any_content = False
+    last_position = -1
+    for (child, copied_child) in zip(xmlelement, copied):
+        (kind, element_id) = _get_source_child_kind(descriptor, child)
+        if kind == _SOURCE_CHILD_DROPPED:
+            replacements.append((copied_child, None))
+            continue
+        if kind == _SOURCE_CHILD_UNCOPYABLE:
+            return False
+        if copied_child.tail is not None:
+            copied_child.tail = None
+        if kind == _SOURCE_CHILD_XS_ANY:
+            has_xs_any_content = True
+            replacements.append((copied_child, _copy_xs_any_element(child)))
+            continue
+        if has_xs_any_content:
+            return False
+        position = element_positions[element_id]
+        count = element_counts.get(element_id, 0)
+        if position < last_position or (count and element_id not in array_element_ids):
+            return False
+        last_position = position
+        element_counts[element_id] = count + 1
+
+        child_obj = None
+        value = element_values.get(element_id, _PENDING)
+        if value is not _PENDING:
+            if isinstance(value, GenericArray):
+                if count >= len(value._array_contents):
+                    return False
+                child_obj = value._array_contents[count]
+            else:
+                child_obj = value
+            if not isinstance(child_obj, BaseObject):
+                return False
+            child_descriptor = child_obj.get_descriptor()
+        else:
+            child_descriptor = descriptor.element_classes[element_id].get_descriptor()
+        child_replacements = []
+        if _match_source_copy(child_descriptor, child, copied_child, child_obj,
+                              child_replacements):
+            replacements.extend(child_replacements)
+            if child_obj is not None:
+                is_empty = not child_obj
+            else:
+                is_empty = _is_empty_source(child_descriptor, child)
+            replacement = copied_child
+        else:
+            # build this child from its object instead
+            if child_obj is None:
+                child_obj = descriptor.element_classes[element_id](
+                    xmlelement=child, lazy=True
+                )
+            is_empty = not child_obj
+            replacement = child_obj.to_xml()
+        # empty elements are left out, and arrays only if all are empty
+        if element_id in array_element_ids:
+            array_replacements.setdefault(element_id, []).append(
+                (copied_child, replacement, is_empty)
+            )
+        elif is_empty:
+            replacements.append((copied_child, None))
+        elif replacement is not copied_child:
+            replacements.append((copied_child, replacement))
+
+    if obj is not None:
+        if obj._extension_elements:
+            return False
+        # other children that have been built must not be output
+        for (element_id, value) in element_values.items():
+            if value is _ABSENT or value is _PENDING:
+                continue
+            count = element_counts.get(element_id)
+            if count is None:
+                if value:
+                    return False
+            elif isinstance(value, GenericArray) and len(value._array_contents) != count:
+                return False
+    for children in array_replacements.values():
+        all_empty = all(is_empty for (copied_child, replacement, is_empty) in children)
+        for (copied_child, replacement, is_empty) in children:
+            if all_empty:
+                replacements.append((copied_child, None))
+            elif replacement is not copied_child:
+                replacements.append((copied_child, replacement))
+    return True
+
+
+def _get_written_source_attributes(descriptor, xmlelement):
+    """
+    Return the (XML name, value) of the attributes of the element to_xml()
+    builds for an object of the descriptor's class parsed from `xmlelement`,
+    if that element is the source element's copy (see _match_source_copy()),
+    and can be written from the source element; otherwise None.
+    """
+    if not descriptor.source_copyable:
+        return None
+    # defined elements are output in the order they are defined, followed
+    # by xs:any content
+    element_positions = descriptor.element_positions
+    array_element_ids = descriptor.array_element_ids
+    has_xs_any_content = False
+    last_position = -1
+    for child in xmlelement:
+        (kind, element_id) = _get_source_child_kind(descriptor, child)
+        if kind == _SOURCE_CHILD_UNCOPYABLE:
+            return None
+        if kind == _SOURCE_CHILD_XS_ANY:
+            has_xs_any_content = True
+        elif kind == _SOURCE_CHILD_ELEMENT:
+            position = element_positions[element_id]
+            if has_xs_any_content or position < last_position or (
+                    position == last_position
+                    and element_id not in array_element_ids):
+                return None
+            last_position = position
+    if _source_attributes_unchanged(descriptor, xmlelement.keys()):
+        return xmlelement.items()
+    return _get_source_attributes(descriptor, xmlelement)
+
+
+def _is_empty_output(element_class, xmlelement):
+    """
+    Return True if to_xml() leaves out the element of an object of
+    `element_class` parsed from `xmlelement` as empty.
+    """
+    descriptor = element_class.get_descriptor()
+    if _get_written_source_attributes(descriptor, xmlelement) is None:
+        return not element_class(xmlelement=xmlelement, lazy=True)
+    return _is_empty_source(descriptor, xmlelement)
+
+
+def _write_source_element(xmlfile, element_class, xmlelement, indent):
+    """
+    Write the element to_xml() builds for an object of `element_class`
+    parsed from `xmlelement` to an lxml xmlfile, as _write_xml_element()
+    writes the copy of the source element to_xml() would make (see
+    _copy_source_element()). The source element is written directly, a
+    child at a time, without copying it or building objects; children that
+    to_xml() would build from objects are parsed lazily and written, one
+    at a time.
+    """
+    descriptor = element_class.get_descriptor()
+    attributes = _get_written_source_attributes(descriptor, xmlelement)
+    if attributes is None:
+        element_class(xmlelement=xmlelement, lazy=True)._write_xml(xmlfile, indent)
+        return
+    text = xmlelement.text
+    if text is not None:
+        text = re.sub(r"\s+", " ", text).strip() or None
+    if text is not None:
+        indent = None
+    # empty elements are left out, and arrays only if all are empty
+    output_element_ids = set()
+    has_children = False
+    for child in xmlelement:
+        (kind, element_id) = _get_source_child_kind(descriptor, child)
+        if kind == _SOURCE_CHILD_XS_ANY:
+            has_children = True
+        elif (kind == _SOURCE_CHILD_ELEMENT
+                and element_id not in output_element_ids
+                and not _is_empty_output(
+                    descriptor.element_classes[element_id], child)):
+            output_element_ids.add(element_id)
+            has_children = True
+    if not has_children and text is None and _write_empty_element(
+            xmlfile, descriptor.xml_tag, attributes, _ROOT_NSMAP):
+        return
+    with xmlfile.element(_get_prefixed_name(descriptor.xml_tag, _ROOT_NSMAP),
+                         _get_xmlfile_attributes(attributes)):
+        if text is not None:
+            xmlfile.write(text)
+        child_indent = None if indent is None else indent + 1
+        for child in xmlelement:
+            (kind, element_id) = _get_source_child_kind(descriptor, child)
+            if kind == _SOURCE_CHILD_XS_ANY:
+                if indent is not None:
+                    xmlfile.write('\n' + '  ' * child_indent)
+                _write_xml_element(xmlfile, child, child_indent, _ROOT_NSMAP, False)
+            elif kind == _SOURCE_CHILD_ELEMENT and element_id in output_element_ids:
+                if indent is not None:
+                    xmlfile.write('\n' + '  ' * child_indent)
+                _write_source_element(
+                    xmlfile, descriptor.element_classes[element_id], child,
+                    child_indent
+                )
+        if indent is not None and has_children:
+            xmlfile.write('\n' + '  ' * indent)
+
+
+def _source_children_xml(xmlelement, element_tags):
+    """
+    Return the XML of an element holding copies of the children of
+    `xmlelement` with the given tags, in order, for pickling objects.
+    """
+    container = etree.Element(xmlelement.tag, nsmap=xmlelement.nsmap)
+    for xmlchild in xmlelement:
+        if xmlchild.tag in element_tags:
+            copied = copy.deepcopy(xmlchild)
+            copied.tail = None
+            container.append(copied)
+    return zlib.compress(etree.tostring(container), 1)
+
+
+def _extension_element_xml(xmlelement):
+    """
+    Return the XML of an extension element as a string, declaring only the
+    namespaces it uses, as when it is output by to_xml().
+    """
+    copied = copy.deepcopy(xmlelement)
+    copied.tail = None
+    etree.cleanup_namespaces(copied)
+    return etree.tostring(copied, encoding='unicode')
+
+
+def _extension_to_dict_value(extension_element):
+    """
+    Return the value representing an extension element in to_dict():
+    see _extension_xml_to_dict_value(), or {"#text": text} for one that
+    was set as text.
+    """
+    if extension_element._xmlelement is None:
+        return {'#text': extension_element._text}
+    return _extension_xml_to_dict_value(extension_element._xmlelement)
+
+
+def _extension_xml_to_dict_value(xmlelement):
+    """
+    Return the value representing the XML element of an extension element
+    in to_dict(): its XML as a string, or {"#xml": xml, "#tail": tail} if
+    it is followed by text, which to_xml() outputs after it.
+    """
+    xml = _extension_element_xml(xmlelement)
+    if xmlelement.tail is None:
+        return xml
+    return {'#xml': xml, '#tail': xmlelement.tail}
+
+
+def _extension_from_dict_value(value):
+    """
+    Return the ExtensionElement for a value returned by
+    _extension_to_dict_value().
+    """
+    if isinstance(value, dict):
+        if '#xml' not in value:
+            return ExtensionElement(text=value['#text'])
+        xmlelement = etree.fromstring(value['#xml'])
+        xmlelement.tail = value['#tail']
+        return ExtensionElement(xmlelement=xmlelement)
+    return ExtensionElement(xmlelement=etree.fromstring(value))
+
+
+def _pack_attributes(found_attributes):
+    """
+    Return the (mask, values) an object stores its attributes as, given the
+    (bit, value) of each attribute found in any order. The list is sorted in
+    place.
+    """
+    if len(found_attributes) == 1:
+        ((bit, value),) = found_attributes
+        return (bit, (value,))
+    found_attributes.sort(key=lambda found: found[0])
+    mask = 0
+    for (bit, value) in found_attributes:
+        mask |= bit
+    return (mask, tuple(value for (bit, value) in found_attributes))
+
+
+def _source_to_dict(descriptor, xmlelement):
+    """
+    Return (dict, is_empty) for an object of the descriptor's class parsed
+    from `xmlelement`, without building the object: the dict is the one
+    to_dict() returns for the object, and is_empty is True if the object
+    would be false (and so left out of its parent unless in an array).
+    This follows the parser (see BaseObject._parse_xmlelement).
+    """
+    if not descriptor.source_copyable:
+        obj = descriptor.cls(xmlelement=xmlelement, lazy=True)
+        return (obj.to_dict(), not obj)
+    data = {}
+    # objects with element definitions hold a value for each of them
+    is_empty = not descriptor.element_definitions
+
+    if xmlelement.attrib:
+        attribute_ids_by_xml_name = descriptor.attribute_ids_by_xml_name
+        attribute_bits = descriptor.attribute_bits
+        found_attributes = []
+        for (xml_name, value) in xmlelement.items():
+            for attribute_id in attribute_ids_by_xml_name.get(xml_name, ()):
+                found_attributes.append(
+                    (attribute_bits[attribute_id], (attribute_id, value))
+                )
+        (_, attributes) = _pack_attributes(found_attributes)
+        for (attribute_id, value) in attributes:
+            data['@' + attribute_id] = value
+            if value:
+                is_empty = False
+
+    element_ids_by_tag = descriptor.element_ids_by_tag
+    defined_names = descriptor.defined_names
+    xs_any_value = descriptor.xs_any
+    found_elements = {}
+    xs_any_content = []
+    extension_elements = {}
+    for child in xmlelement:
+        tag = child.tag
+        if not isinstance(tag, str):
+            continue
+        element_ids = element_ids_by_tag.get(tag)
+        if element_ids is not None:
+            for element_id in element_ids:
+                if element_id in found_elements:
+                    found_elements[element_id].append(child)
+                else:
+                    found_elements[element_id] = [child]
+        if (xs_any_value is not None and BaseObject._should_process_as_xs_any(
+                child, xs_any_value, defined_names)):
+            xs_any_content.append(child)
+            continue
+        if element_ids is not None:
+            continue
+        local_name = tag
+        if local_name.startswith(NEWSMLG2NSPREFIX):
+            local_name = local_name[len(NEWSMLG2NSPREFIX):]
+        elif local_name.startswith(NITFNSPREFIX):
+            local_name = local_name[len(NITFNSPREFIX):]
+        elif local_name.startswith(XMLNSPREFIX):
+            local_name = local_name[len(XMLNSPREFIX):]
+        if local_name not in defined_names:
+            extension_elements["extension_" + local_name] = child
+
+    if found_elements:
+        array_element_ids = descriptor.array_element_ids
+        element_classes = descriptor.element_classes
+        # in definition order, as for a parsed object
+        for element_id in descriptor.element_ids:
+            xmlchildren = found_elements.get(element_id)
+            if xmlchildren is None:
+                continue
+            child_descriptor = element_classes[element_id].get_descriptor()
+            if element_id in array_element_ids:
+                data[element_id] = [
+                    _source_to_dict(child_descriptor, xmlchild)[0]
+                    for xmlchild in xmlchildren
+                ]
+            else:
+                (child_data, child_is_empty) = _source_to_dict(
+                    child_descriptor, xmlchildren[0]
+                )
+                if not child_is_empty:
+                    data[element_id] = child_data
+
+    if xmlelement.text:
+        text = re.sub(r"\s+", " ", xmlelement.text).strip()
+        if text:
+            data['#text'] = text
+            is_empty = False
+    if extension_elements:
+        data['#extensions'] = {
+            extension_key: _extension_xml_to_dict_value(child)
+            for (extension_key, child) in extension_elements.items()
+        }
+    if xs_any_content:
+        data['#xs_any'] = [
+            etree.tostring(_copy_xs_any_element(child), encoding='unicode')
+            for child in xs_any_content
+        ]
+    return (data, is_empty)
+
+
+def _bit_count(value):
+    """Number of bits set in a non-negative integer."""
+    return bin(value).count('1')
+
 
 class ExtensionElement():
     """
     Handles NewsML-G2 elements that use xs:any constructs to allow non-G2 content.
     These elements are preserved as-is during parsing and serialization.
     """
+    __slots__ = ('_xmlelement', '_text')
+
     def __init__(self, xmlelement=None, **kwargs):
         self._xmlelement = xmlelement
         self._text = kwargs.get('text', '')
 
     def to_xml(self):
-        """Return the original XML element unchanged."""
+        """
+        Return a copy of the original XML element, so that the original
+        stays in its document when the copy is added to another.
+        """
         if self._xmlelement is not None:
-            return self._xmlelement
+            return copy.deepcopy(self._xmlelement)
         # If no original element, create a minimal one
         return etree.Element("extension")
 
@@ -46,38 +981,212 @@ class ExtensionElement():
     def __bool__(self):
         return self._xmlelement is not None or bool(self._text)
 
+    def __getstate__(self):
+        """
+        Pickle our element as XML, with its tail kept separately.
+        """
+        if self._xmlelement is None:
+            return (None, None, self._text)
+        return (
+            _extension_element_xml(self._xmlelement),
+            self._xmlelement.tail,
+            self._text
+        )
+
+    def __setstate__(self, state):
+        (xml, tail, self._text) = state
+        self._xmlelement = None
+        if xml is not None:
+            self._xmlelement = etree.fromstring(xml)
+            self._xmlelement.tail = tail
 
-class BaseObject():
+
+class ClassDescriptor():
+    """
+    Schema information for a BaseObject subclass, compiled once per class
+    from the `attributes` and `elements` declarations found in its MRO and
+    shared by every instance of that class.
+    """
+    def __init__(self, cls):
+        self.cls = cls
+        # Merged attribute definitions: subclasses override their parents
+        self.attributes = {}
+        for otherclass in reversed(cls.__mro__):
+            self.attributes.update(vars(otherclass).get('attributes', {}))
+        # Instances store the values of their attributes positionally: each
+        # attribute is given a bit, the instance keeps a mask of the bits of
+        # the attributes that have a value and a tuple of those values
+        self.attribute_bits = {}
+        self.attribute_bits_by_xml_name = {}
+        self.attribute_ids_by_xml_name = {}
+        for (index, (attribute_id, attribute_definition)) in enumerate(
+                self.attributes.items()):
+            bit = 1 << index
+            self.attribute_bits[attribute_id] = bit
+            self.attribute_bits_by_xml_name.setdefault(
+                attribute_definition['xml_name'], []
+            ).append(bit)
+            self.attribute_ids_by_xml_name.setdefault(
+                attribute_definition['xml_name'], []
+            ).append(attribute_id)
+        self.attribute_ids = tuple(self.attributes)
+        # Ordered element definitions, as (element_id, definition) tuples
+        self.element_definitions = []
+        for otherclass in reversed(cls.__mro__):
+            self.element_definitions += vars(otherclass).get('elements', ())
+        self.element_definitions_dict = dict(self.element_definitions)
+        self.element_ids = tuple(self.element_definitions_dict)
+        # Element classes (resolved from strings where necessary) and
+        # namespace-prefixed tag names, keyed by element id
+        self.element_classes = {}
+        self.element_tags = {}
+        for (element_id, element_definition) in self.element_definitions:
+            element_class = element_definition['element_class']
+            if isinstance(element_class, str):
+                element_class = import_string(element_class)
+            self.element_classes[element_id] = element_class
+            self.element_tags[element_id] = (
+                NEWSMLG2NSPREFIX + element_definition['xml_name']
+            )
+        self.array_element_ids = {
+            element_id
+            for (element_id, element_definition) in self.element_definitions
+            if element_definition['type'] == 'array'
+        }
+        self.defined_names = {
+            element_definition['xml_name']
+            for (element_id, element_definition) in self.element_definitions
+        }
+        # Map of prefixed tag name to the element ids declared with that tag,
+        # used to dispatch child elements in a single pass while parsing
+        self.element_ids_by_tag = {}
+        for (element_id, element_tag) in self.element_tags.items():
+            self.element_ids_by_tag.setdefault(element_tag, []).append(element_id)
+        self.xs_any = getattr(cls, 'xsAny', None)
+        # Namespace-prefixed tag used when serializing this class
+        xml_element_name = getattr(cls, 'xml_element_name', None)
+        if xml_element_name is None:
+            xml_element_name = cls.__name__[0].lower() + cls.__name__[1:]
+        self.xml_tag = NEWSMLG2NSPREFIX + xml_element_name
+        # Shared empty GenericArrays for array elements with no values
+        self._empty_arrays = {}
+        self._specialized_parser = None
+        # Used to check that the element an unmodified object was parsed from
+        # can be copied instead of building the element with to_xml() (see
+        # _copy_source_element): the position of each attribute XML name
+        # declared once, the XML names of attributes with a default value
+        # or that are required, and the position of each element
+        self.source_copyable = (
+            cls.to_xml is BaseObject.to_xml and cls.__bool__ is BaseObject.__bool__
+        )
+        self.attribute_positions = {
+            xml_name: position
+            for (position, (xml_name, bits)) in enumerate(
+                self.attribute_bits_by_xml_name.items())
+            if len(bits) == 1
+        }
+        self.default_attribute_names = frozenset(
+            attribute_definition['xml_name']
+            for attribute_definition in self.attributes.values()
+            if 'default' in attribute_definition
+        )
+        self.required_attribute_names = frozenset(
+            attribute_definition['xml_name']
+            for attribute_definition in self.attributes.values()
+            if attribute_definition.get('use') == 'required'
+        )
+        self.element_positions = {
+            element_id: position
+            for (position, (element_id, element_definition)) in enumerate(
+                self.element_definitions)
+        }
+
+    # Factory used to generate a specialized parse function for each class
+    # (see NewsMLG2.codegen). When None, the generic parser is used.
+    parser_factory = None
+
+    def get_parser(self):
+        """
+        Return the function used to initialise an instance of the class from
+        an XML element, called as parser(instance, xmlelement, lazy).
+        """
+        parser_factory = ClassDescriptor.parser_factory
+        if parser_factory is None:
+            return self.cls._parse_xmlelement
+        if self._specialized_parser is None:
+            self._specialized_parser = parser_factory(self)
+        return self._specialized_parser
+
+    def get_empty_array(self, element_id):
+        """
+        Return the GenericArray shared by all instances to represent an array
+        element with no values. It is read-only: its contents are an empty
+        tuple, so that modifying it can't affect other instances.
+        """
+        empty_array = self._empty_arrays.get(element_id)
+        if empty_array is None:
+            empty_array = GenericArray(
+                xmlarray = [],
+                element_class = self.element_classes[element_id]
+            )
+            empty_array._array_contents = ()
+            self._empty_arrays[element_id] = empty_array
+        return empty_array
+
+
+class BaseObjectMeta(type):
+    """
+    Metaclass for BaseObject: gives every subclass an empty `__slots__`
+    declaration unless it declares its own, so that NewsML-G2 objects don't
+    carry a per-instance `__dict__`.
+    """
+    def __new__(mcs, name, bases, namespace, **kwargs):
+        namespace.setdefault('__slots__', ())
+        return super().__new__(mcs, name, bases, namespace, **kwargs)
+
+
+class BaseObject(metaclass=BaseObjectMeta):
     """
     Implements `attributes` and `elements` handlers.
     """
-    _attribute_definitions = None
-    _attribute_values = {}
-    _element_values = {}
-    _extension_elements = {}  # Store xs:any elements
+    __slots__ = (
+        '_attribute_mask',      # bits (from the descriptor) of set attributes
+        '_attribute_values',    # tuple of attribute values, in bit order
+        '_element_values',
+        '_extension_elements',  # Store xs:any elements
+        '_xs_any_content',
+        '_text',
+        '_xmlelement',
+        '_lazy'
+    )
+
+    @classmethod
+    def get_descriptor(cls):
+        """
+        Return the ClassDescriptor for this class, compiling it on first use.
+        """
+        # look in this class's own namespace, so that a subclass never
+        # picks up the descriptor compiled for one of its parents
+        descriptor = cls.__dict__.get('_descriptor')
+        if descriptor is None:
+            descriptor = ClassDescriptor(cls)
+            cls._descriptor = descriptor
+        return descriptor
 
     def get_attribute_definitions(self):
         """
-        Load all 'attributes' from any class in the MRO inheritance chain
+        Return all 'attributes' from any class in the MRO inheritance chain.
+        The returned dict is shared by all instances and must not be modified.
         """
-        if self._attribute_definitions:
-            return self._attribute_definitions
-        self._attribute_definitions = {}
-        for otherclass in reversed(self.__class__.__mro__):
-            attrs = vars(otherclass).get('attributes', {})
-            self._attribute_definitions.update(attrs)
-        return self._attribute_definitions
+        return self.get_descriptor().attributes
 
     def get_element_definitions(self):
         """
-        Load all element definitions declared in any class in the MRO
-        inheritance chain
+        Return all element definitions declared in any class in the MRO
+        inheritance chain. The returned list is shared by all instances and
+        must not be modified.
         """
-        self._element_definitions = []
-        for otherclass in reversed(self.__class__.__mro__):
-            elements = vars(otherclass).get('elements', ())
-            self._element_definitions += elements
-        return self._element_definitions
+        return self.get_descriptor().element_definitions
 
     def get_element_class(self, element_class):
         """
@@ -92,51 +1201,137 @@ class BaseObject():
     def __init__(self, **kwargs):
         """
         This is our base object, we don't call super() from here
+
+        With `lazy=True`, child elements are kept as lxml elements and only
+        built into objects when they are first accessed.
+
+        Objects parsed from XML keep their source element until they are
+        modified, so that to_xml() can copy it rather than build it again.
+        With `write_through=True`, objects are parsed lazily and are never
+        detached from their source element: setting an attribute or element
+        changes the source element instead.
         """
-        self._attribute_values = {}
-        self._element_values = {}
-        self._extension_elements = {}
-        self._xs_any_content = []
+        descriptor = self.get_descriptor()
         xmlelement = kwargs.get('xmlelement')
-        attr_defns = self.get_attribute_definitions()
-        element_defns = self.get_element_definitions()
-        if 'text' in kwargs:
-            self._text = kwargs.get('text')
         if xmlelement is None:
+            self._init_slots(descriptor)
+            self._text = kwargs.get('text')
             return
         if not isinstance(xmlelement, etree._Element):
             raise AttributeError("xmlelement should be an instance of _Element. Currently it is a "+str(type(xmlelement)))
 
+        lazy = kwargs.get('lazy', False)
+        if kwargs.get('write_through'):
+            lazy = _WRITE_THROUGH
+        # the parser initialises all of our slots
+        descriptor.get_parser()(self, xmlelement, lazy)
+        if self._text is None and kwargs.get('text') is not None:
+            self._forget_source()
+            self._text = kwargs.get('text')
+
+    def _init_slots(self, descriptor):
+        """
+        Initialise the internal storage of an empty object.
+        """
+        self._attribute_mask = 0
+        self._attribute_values = ()
+        if descriptor.element_definitions:
+            self._element_values = {}
+        else:
+            # this object can never have element values
+            self._element_values = _EMPTY_MAPPING
+        self._extension_elements = _EMPTY_MAPPING
+        self._xs_any_content = ()
+        self._text = None
+        self._xmlelement = None
+        self._lazy = False
+
+    def _parse_xmlelement(self, xmlelement, lazy):
+        """
+        Populate this object from an XML element. This is the generic parser,
+        driven by the class descriptor: see NewsMLG2.codegen for specialized
+        parsers generated for each class.
+        """
+        descriptor = self.get_descriptor()
+        self._init_slots(descriptor)
+
         # Process attributes
-        for attribute_id, attribute_definition in attr_defns.items():
-            attribute_xmlname = attribute_definition['xml_name']
-            xmlattr_value = xmlelement.get(attribute_xmlname)
-            if xmlattr_value is not None:
-                self._attribute_values[attribute_id] = xmlattr_value
-
-        # Process defined child elements
-        for (element_id, element_definition) in element_defns:
-            element_class = self.get_element_class(element_definition['element_class'])
-            if element_definition['type'] == 'array':
-                self._element_values[element_id] = GenericArray(
-                    xmlarray = xmlelement.findall(
-                                    NEWSMLG2NSPREFIX+element_definition['xml_name']
-                               ),
-                    element_class = element_definition['element_class']
-                )
-            else:
-                self._element_values[element_id] = element_class(
-                    xmlelement = xmlelement.find(
-                                    NEWSMLG2NSPREFIX+element_definition['xml_name']
-                                 )
+        if xmlelement.attrib:
+            attribute_bits_by_xml_name = descriptor.attribute_bits_by_xml_name
+            found_attributes = []
+            for attribute_xmlname, xmlattr_value in xmlelement.items():
+                for bit in attribute_bits_by_xml_name.get(attribute_xmlname, ()):
+                    found_attributes.append((bit, xmlattr_value))
+            if found_attributes:
+                (self._attribute_mask, self._attribute_values) = (
+                    _pack_attributes(found_attributes)
                 )
 
-        # Process extension elements (xs:any)
-        self._process_extension_elements(xmlelement, element_defns)
+        # Process defined child elements, extension elements and xs:any
+        # content in a single pass over the children
+        found_elements = self._process_child_elements(
+            xmlelement, descriptor, collect_defined = not lazy
+        )
+        # kept so that to_xml() can copy the source of unmodified objects
+        self._xmlelement = xmlelement
+        if lazy:
+            self._lazy = lazy
+            for (element_id, element_definition) in descriptor.element_definitions:
+                self._element_values[element_id] = _PENDING
+        else:
+            for (element_id, element_definition) in descriptor.element_definitions:
+                self._element_values[element_id] = self._build_element(
+                    element_id, found_elements.get(element_id)
+                )
 
         if xmlelement.text:
             self._text = re.sub(r"\s+", " ", xmlelement.text).strip()
 
+    def _has_attribute_value(self, attribute_id):
+        """
+        Return True if a value has been set for the given attribute.
+        """
+        return bool(
+            self._attribute_mask & self.get_descriptor().attribute_bits[attribute_id]
+        )
+
+    def _get_attribute_value(self, attribute_id):
+        """
+        Return the value set for the given attribute. The attribute must
+        have a value (see _has_attribute_value).
+        """
+        bit = self.get_descriptor().attribute_bits[attribute_id]
+        return self._attribute_values[_bit_count(self._attribute_mask & (bit - 1))]
+
+    def _set_attribute_value(self, attribute_id, value):
+        """
+        Set the value of the given attribute.
+        """
+        bit = self.get_descriptor().attribute_bits[attribute_id]
+        mask = self._attribute_mask
+        index = _bit_count(mask & (bit - 1))
+        values = self._attribute_values
+        if mask & bit:
+            self._attribute_values = values[:index] + (value,) + values[index+1:]
+        else:
+            self._attribute_values = values[:index] + (value,) + values[index:]
+            self._attribute_mask = mask | bit
+
+    def _iter_attribute_values(self):
+        """
+        Return (attribute_id, value) for every attribute that has a value,
+        in the order the attributes are defined.
+        """
+        mask = self._attribute_mask
+        if not mask:
+            return []
+        attribute_bits = self.get_descriptor().attribute_bits
+        return zip(
+            [attribute_id for (attribute_id, bit) in attribute_bits.items()
+             if mask & bit],
+            self._attribute_values
+        )
+
     def get_extension_elements(self):
         """
         Return all extension elements (xs:any) found in this object.
@@ -155,77 +1350,84 @@ class BaseObject():
         Set an extension element by name.
         """
         extension_key = f"extension_{name}"
+        if _is_write_through(self):
+            old_extension_element = self._extension_elements.get(extension_key)
+            if isinstance(element, etree._Element):
+                xmlelement = self._get_write_through_element()
+                old_xmlelement = (
+                    None if old_extension_element is None
+                    else old_extension_element._xmlelement
+                )
+                if (old_xmlelement is not None
+                        and old_xmlelement.getparent() is xmlelement):
+                    xmlelement.replace(old_xmlelement, element)
+                else:
+                    xmlelement.append(element)
+        else:
+            self._forget_source()
+        if self._extension_elements is _EMPTY_MAPPING:
+            self._extension_elements = {}
         if isinstance(element, etree._Element):
             self._extension_elements[extension_key] = ExtensionElement(xmlelement=element)
         else:
             self._extension_elements[extension_key] = ExtensionElement(text=str(element))
 
-    def _process_extension_elements(self, xmlelement, element_defns):
+    def _process_child_elements(self, xmlelement, descriptor, collect_defined=True):
         """
-        Process any elements that are not defined in the schema (xs:any).
-        These are stored as ExtensionElement objects and preserved during serialization.
+        Dispatch the children of `xmlelement` in a single pass.
+        Children matching a defined element are returned as a dict of
+        element_id -> list of XML elements (if `collect_defined` is set).
+        Elements that are not defined in the schema are stored as xs:any
+        content or ExtensionElement objects and preserved during serialization.
         """
+        found_elements = {}
+        element_ids_by_tag = descriptor.element_ids_by_tag
+        defined_names = descriptor.defined_names
         # Check if this class supports xs:any
-        xs_any_value = getattr(self, 'xsAny', None)
-        has_xs_any = xs_any_value is not None
-
-        if has_xs_any:
-            self._xs_any_content = []
-            
-            # Get all defined element names to identify extensions
-            defined_names = set()
-            for (element_id, element_definition) in element_defns:
-                defined_names.add(element_definition['xml_name'])
-
-            # Find all child elements
-            for child in xmlelement:
-                if child.tag is not None and isinstance(child.tag, str):  # Skip comments, processing instructions, etc.
-                    # Check if this element should be processed as xs:any content
-                    should_process = self._should_process_as_xs_any(child, xs_any_value, defined_names)
-                    
-                    if should_process:
-                        self._xs_any_content.append(child)
+        xs_any_value = descriptor.xs_any
+        xs_any_content = []
+        extension_elements = {}
+
+        for child in xmlelement:
+            tag = child.tag
+            if not isinstance(tag, str):
+                # Skip comments, processing instructions, etc.
+                continue
+            element_ids = element_ids_by_tag.get(tag)
+            if element_ids is not None and collect_defined:
+                for element_id in element_ids:
+                    if element_id in found_elements:
+                        found_elements[element_id].append(child)
                     else:
-                        # Process as extension element if not handled by xs:any
-                        local_name = child.tag
-                        if local_name.startswith(NEWSMLG2NSPREFIX):
-                            local_name = local_name[len(NEWSMLG2NSPREFIX):]
-                        elif local_name.startswith(NITFNSPREFIX):
-                            local_name = local_name[len(NITFNSPREFIX):]
-                        elif local_name.startswith(XMLNSPREFIX):
-                            local_name = local_name[len(XMLNSPREFIX):]
-
-                        # If this element is not defined in our schema, treat it as an extension
-                        if local_name not in defined_names:
-                            # Use the full tag as the key to preserve namespace information
-                            extension_key = f"extension_{local_name}"
-                            self._extension_elements[extension_key] = ExtensionElement(xmlelement=child)
-        else:
-            # For classes that don't support xs:any, process undefined elements as extensions
-            # Get all defined element names to identify extensions
-            defined_names = set()
-            for (element_id, element_definition) in element_defns:
-                defined_names.add(element_definition['xml_name'])
-
-            # Find all child elements
-            for child in xmlelement:
-                if child.tag is not None and isinstance(child.tag, str):  # Skip comments, processing instructions, etc.
-                    # Remove namespace prefix to get local name
-                    local_name = child.tag
-                    if local_name.startswith(NEWSMLG2NSPREFIX):
-                        local_name = local_name[len(NEWSMLG2NSPREFIX):]
-                    elif local_name.startswith(NITFNSPREFIX):
-                        local_name = local_name[len(NITFNSPREFIX):]
-                    elif local_name.startswith(XMLNSPREFIX):
-                        local_name = local_name[len(XMLNSPREFIX):]
-
-                    # If this element is not defined in our schema, treat it as an extension
-                    if local_name not in defined_names:
-                        # Use the full tag as the key to preserve namespace information
-                        extension_key = f"extension_{local_name}"
-                        self._extension_elements[extension_key] = ExtensionElement(xmlelement=child)
-
-    def _should_process_as_xs_any(self, child_element, xs_any_value, defined_names):
+                        found_elements[element_id] = [child]
+            # Check if this element should be processed as xs:any content
+            if (xs_any_value is not None and
+                self._should_process_as_xs_any(child, xs_any_value, defined_names)):
+                xs_any_content.append(child)
+                continue
+            if element_ids is not None:
+                continue
+            # Remove namespace prefix to get local name
+            local_name = tag
+            if local_name.startswith(NEWSMLG2NSPREFIX):
+                local_name = local_name[len(NEWSMLG2NSPREFIX):]
+            elif local_name.startswith(NITFNSPREFIX):
+                local_name = local_name[len(NITFNSPREFIX):]
+            elif local_name.startswith(XMLNSPREFIX):
+                local_name = local_name[len(XMLNSPREFIX):]
+
+            # If this element is not defined in our schema, treat it as an extension
+            if local_name not in defined_names:
+                extension_key = f"extension_{local_name}"
+                extension_elements[extension_key] = ExtensionElement(xmlelement=child)
+        if xs_any_content:
+            self._xs_any_content = xs_any_content
+        if extension_elements:
+            self._extension_elements = extension_elements
+        return found_elements
+
+    @staticmethod
+    def _should_process_as_xs_any(child_element, xs_any_value, defined_names):
         """
         Determine if a child element should be processed as xs:any content
         based on the xsAny value.
@@ -249,32 +1451,306 @@ class BaseObject():
             # Unknown xsAny value, don't process as xs:any content
             return False
 
+    def _build_element(self, element_id, xmlchildren):
+        """
+        Build the object (or GenericArray) for a defined child element from
+        the list of matching XML child elements (or None if there are none).
+        A missing 'single' element is represented by the shared _ABSENT
+        sentinel rather than an empty object.
+        """
+        descriptor = self.get_descriptor()
+        element_class = descriptor.element_classes[element_id]
+        if element_id in descriptor.array_element_ids:
+            if not xmlchildren:
+                return descriptor.get_empty_array(element_id)
+            return GenericArray(
+                xmlarray = xmlchildren,
+                element_class = element_class,
+                lazy = self._lazy
+            )
+        if not xmlchildren:
+            return _ABSENT
+        return element_class(xmlelement = xmlchildren[0], lazy = self._lazy)
+
+    def _get_built_element_value(self, item):
+        """
+        Return value of the element as read from the XML, building it first
+        if this object was parsed lazily. May return the _ABSENT sentinel.
+        """
+        value = self._element_values[item]
+        if value is _PENDING:
+            element_tag = self.get_descriptor().element_tags[item]
+            value = self._build_element(
+                item, self._xmlelement.findall(element_tag)
+            )
+            self._element_values[item] = value
+        return value
+
     def get_element_value(self, item):
         """
         Return value of the element as read from the XML.
         """
-        return self._element_values[item]
+        value = self._get_built_element_value(item)
+        if value is _ABSENT:
+            # create the empty object on first access, so that it can be
+            # modified in place like any other element
+            value = self._create_empty_element(item)
+        return value
+
+    def _create_empty_element(self, element_id):
+        """
+        Create and store the empty object returned for a missing element.
+        """
+        element_class = self.get_descriptor().element_classes[element_id]
+        value = element_class()
+        if _is_write_through(self):
+            value._lazy = _WriteThroughPlaceholder(self, element_id)
+        self._element_values[element_id] = value
+        return value
+
+    def _get_write_through_element(self):
+        """
+        Return our source element in write-through mode. An empty object
+        standing for a missing element is added to its parent first.
+        """
+        if self._xmlelement is None:
+            placeholder = self._lazy
+            setattr(placeholder.parent, placeholder.element_id, self)
+        return self._xmlelement
+
+    def _write_attribute_value(self, attribute_id, value):
+        """
+        Set an attribute of our source element, in write-through mode.
+        A value of None removes the attribute.
+        """
+        xmlelement = self._get_write_through_element()
+        xml_name = self.get_descriptor().attributes[attribute_id]['xml_name']
+        if value is None:
+            xmlelement.attrib.pop(xml_name, None)
+        else:
+            xmlelement.set(xml_name, value)
+
+    def _write_element_value(self, element_id, value):
+        """
+        Replace the children of our source element for an element by the
+        XML of its new value, in write-through mode. The new objects are
+        then parsed again from their elements, so that changes to them are
+        written through as well; objects that already are keep their
+        elements, which are moved.
+        """
+        xmlelement = self._get_write_through_element()
+        descriptor = self.get_descriptor()
+        if isinstance(value, GenericArray):
+            objects = value._array_contents
+        elif value is None or value is _ABSENT:
+            objects = []
+        else:
+            objects = [value]
+
+        old_xmlelements = xmlelement.findall(descriptor.element_tags[element_id])
+        for obj in objects:
+            _check_source_element(obj, old_xmlelements)
+        if old_xmlelements:
+            index = xmlelement.index(old_xmlelements[0])
+            _remove_source_elements(xmlelement, old_xmlelements)
+        else:
+            # after the last child that comes before it in the definitions
+            position = descriptor.element_positions[element_id]
+            element_ids_by_tag = descriptor.element_ids_by_tag
+            element_positions = descriptor.element_positions
+            index = 0
+            for (child_index, child) in enumerate(xmlelement):
+                element_ids = element_ids_by_tag.get(child.tag)
+                if element_ids and element_positions[element_ids[0]] < position:
+                    index = child_index + 1
+        new_xmlelements = []
+        bound_objects = []
+        for obj in objects:
+            (new_xmlelement, bind) = _take_source_element(obj, new_xmlelements)
+            new_xmlelements.append(new_xmlelement)
+            if bind:
+                bound_objects.append((obj, new_xmlelement))
+        _insert_source_elements(xmlelement, index, new_xmlelements)
+        for (obj, new_xmlelement) in bound_objects:
+            _bind_source_element(obj, new_xmlelement)
+
+    def _forget_source(self):
+        """
+        Stop using the element this object was parsed from as the source of
+        its XML, as the object is being modified. Children still to be built
+        from it are built first.
+        """
+        if self._xmlelement is None:
+            return
+        if self._lazy:
+            for (element_id, value) in list(self._element_values.items()):
+                if value is _PENDING:
+                    self._get_built_element_value(element_id)
+        self._xmlelement = None
+
+    def _is_unmodified(self):
+        """
+        Return True if this object was parsed from an element and neither it
+        nor any object built from that element's children has been modified
+        since, so that the element still holds all of its content.
+        """
+        if self._xmlelement is None:
+            return False
+        descriptor = self.get_descriptor()
+        for (element_id, value) in self._element_values.items():
+            if (value is not _PENDING and value is not _ABSENT
+                    and not self._is_unmodified_value(descriptor, element_id, value)):
+                return False
+        return True
+
+    def _is_unmodified_value(self, descriptor, element_id, value):
+        """
+        Return True if the value of one of our elements is still the one
+        built from the children of our source element (or hasn't been built
+        yet), and hasn't been modified since.
+        """
+        if value is _PENDING or value is _ABSENT:
+            return True
+        xmlelement = self._xmlelement
+        element_tag = descriptor.element_tags[element_id]
+        if isinstance(value, GenericArray):
+            # the shared empty arrays stand for elements the source doesn't
+            # have, and are read-only
+            if value is descriptor._empty_arrays.get(element_id):
+                return True
+            children = value._array_contents
+            xmlchildren = xmlelement.findall(element_tag)
+            if len(children) != len(xmlchildren):
+                return False
+        elif isinstance(value, BaseObject) and value._xmlelement is None:
+            # an empty object created when a missing element was read
+            return not value and xmlelement.find(element_tag) is None
+        else:
+            children = (value,)
+            xmlchildren = (xmlelement.find(element_tag),)
+        # each child must still be the object built from the matching
+        # source element, so that reordered or repeated children are
+        # seen as modifications
+        for (child, xmlchild) in zip(children, xmlchildren):
+            if not (isinstance(child, BaseObject)
+                    and child._xmlelement is xmlchild
+                    and child._is_unmodified()):
+                return False
+        return True
+
+    def _copy_source(self):
+        """
+        Return a copy of the element this object was parsed from, if the
+        object hasn't been modified and the copy is the same as the element
+        that to_xml() would build; otherwise None.
+        """
+        if self._xmlelement is None:
+            return None
+        return _copy_source_element(
+            self.get_descriptor(), self._xmlelement, self
+        )
+
+    def _iter_child_xml(self):
+        """
+        Return the values of our child elements to output, in order: each
+        value is either an object, or a copy of the source element of a
+        child that hasn't been modified (or built).
+        """
+        descriptor = self.get_descriptor()
+        for child_element_id, child_element_value in self._element_values.items():
+            if child_element_value is _PENDING:
+                # not built, so not modified: copy our source's children
+                # (objects built from a catalog index have no source)
+                if self._xmlelement is not None:
+                    element_tag = descriptor.element_tags[child_element_id]
+                    if child_element_id in descriptor.array_element_ids:
+                        xmlchildren = self._xmlelement.findall(element_tag)
+                    else:
+                        xmlchildren = self._xmlelement.find(element_tag)
+                        xmlchildren = [] if xmlchildren is None else [xmlchildren]
+                    child_descriptor = (
+                        descriptor.element_classes[child_element_id].get_descriptor()
+                    )
+                    copies = []
+                    for xmlchild in xmlchildren:
+                        copied = _copy_source_element(child_descriptor, xmlchild)
+                        if copied is None:
+                            break
+                        copies.append(copied)
+                    else:
+                        # like an empty object, or an array of empty objects
+                        if not all(_is_empty_source(child_descriptor, xmlchild)
+                                   for xmlchild in xmlchildren):
+                            yield from copies
+                        continue
+                child_element_value = self._get_built_element_value(child_element_id)
+            if child_element_value:
+                if isinstance(child_element_value, GenericArray):
+                    children = child_element_value._array_contents
+                else:
+                    children = (child_element_value,)
+                for child in children:
+                    copied = None
+                    if isinstance(child, BaseObject):
+                        copied = child._copy_source()
+                    yield child if copied is None else copied
+
+    def _iter_child_output(self):
+        """
+        Return the values of our child elements to write with _write_xml(),
+        in order: each value is either an object, or (element class, source
+        element) for a child that hasn't been built, written from the
+        source element by _write_source_element().
+        """
+        descriptor = self.get_descriptor()
+        xmlelement = self._xmlelement
+        for child_element_id, child_element_value in self._element_values.items():
+            if child_element_value is _PENDING:
+                if xmlelement is not None:
+                    element_class = descriptor.element_classes[child_element_id]
+                    element_tag = descriptor.element_tags[child_element_id]
+                    if child_element_id in descriptor.array_element_ids:
+                        xmlchildren = xmlelement.findall(element_tag)
+                    else:
+                        xmlchildren = xmlelement.find(element_tag)
+                        xmlchildren = [] if xmlchildren is None else [xmlchildren]
+                    # like an empty object, or an array of empty objects
+                    if not all(_is_empty_output(element_class, xmlchild)
+                               for xmlchild in xmlchildren):
+                        for xmlchild in xmlchildren:
+                            yield (element_class, xmlchild)
+                    continue
+                child_element_value = self._get_built_element_value(child_element_id)
+            if child_element_value:
+                if isinstance(child_element_value, GenericArray):
+                    yield from child_element_value._array_contents
+                else:
+                    yield child_element_value
 
     def __getattr__(self, name):
         """
         Default getter for all property access operations that don't have a defined method
         """
+        if name.startswith('_'):
+            # internal properties are held in __slots__: if we get here, the
+            # property hasn't been set
+            raise AttributeError(
+                "'" + self.__class__.__name__ + "' object has no attribute '" +
+                name + "'"
+            )
         if name in self._element_values:
             return self.get_element_value(name)
-        # convert our list of tuples to a dict so we can look up keys
-        elemdefndict = dict(self._element_definitions)
-        if name in elemdefndict:
+        descriptor = self.get_descriptor()
+        if name in descriptor.element_classes:
             # no value, but the element definition exists - so create an empty object on the fly
-            element_definition = elemdefndict[name]
-            element_class = self.get_element_class(element_definition['element_class'])
-            self._element_values[name] = element_class()
-            return self._element_values[name]
-
-        if name in self._attribute_definitions:
-            if name in self._attribute_values:
-                return self._attribute_values[name]
-            if 'default' in self._attribute_definitions[name]:
-                return self._attribute_definitions[name]['default']
+            return self._create_empty_element(name)
+
+        attr_defns = descriptor.attributes
+        if name in attr_defns:
+            if self._has_attribute_value(name):
+                return self._get_attribute_value(name)
+            if 'default' in attr_defns[name]:
+                return attr_defns[name]['default']
             # <name> is a defined attribute of the class but
             # has no defined value or default: return None
             return None
@@ -298,23 +1774,26 @@ class BaseObject():
             # it's a property internal to this module, handle it normally
             super().__setattr__(name, value)
             return
-        # convert our list of tuples to a dict so we can look up keys
-        elemdefndict = dict(self._element_definitions)
+        descriptor = self.get_descriptor()
+        write_through = _is_write_through(self)
+        if not write_through and (name in descriptor.element_definitions_dict
+                                  or name in descriptor.attributes):
+            self._forget_source()
+        elemdefndict = descriptor.element_definitions_dict
         if name in elemdefndict:
-            element_class_name = elemdefndict[name]['element_class']
-            element_class = self.get_element_class(element_class_name)
+            element_class = descriptor.element_classes[name]
             if isinstance(value, str):
                 if ('xml_type' in elemdefndict[name]
                     and elemdefndict[name]['xml_type'] == 'xs:enumeration'
-                    and value not in self._element_definitions['enum_values']):
+                    and value not in elemdefndict[name]['enum_values']):
                     # validate that value is defined in the enum
                     raise AttributeError(
                             "Trying to assign a value not defined in enumeration"
                           )
-                self._element_values[name] = element_class(text = value)
+                value = element_class(text = value)
             elif isinstance(value, list):
                 if elemdefndict[name]['type'] == 'array':
-                    self._element_values[name] = GenericArray(
+                    value = GenericArray(
                         xmlarray = value,
                         element_class = element_class
                     )
@@ -322,10 +1801,13 @@ class BaseObject():
                     raise AttributeError(
                             "Trying to assign a list to a non-array element"
                           )
-            else:
-                self._element_values[name] = value
-        elif name in self._attribute_definitions:
-            self._attribute_values[name] = value
+            if write_through:
+                self._write_element_value(name, value)
+            self._element_values[name] = value
+        elif name in descriptor.attributes:
+            if write_through:
+                self._write_attribute_value(name, value)
+            self._set_attribute_value(name, value)
         else:
             raise AttributeError(
                 "'" + self.__class__.__name__ +
@@ -333,16 +1815,16 @@ class BaseObject():
                   )
 
     def __bool__(self):
-        if any(self._attribute_values.values()):
+        if any(self._attribute_values):
             return True
-        if [bool(elem) for elem in self._element_values.values()]:
+        if self._element_values:
             return True
-        if getattr(self, '_text', None):
+        if self._text:
             return True
         return False
 
     def __str__(self):
-        if hasattr(self, '_text') and self._text != '':
+        if self._text:
             return self._text
         elif hasattr(self, 'qcode') and self.qcode:
             return '<'+self.__class__.__name__+' qcode="'+str(self.qcode)+'">'
@@ -355,36 +1837,17 @@ class BaseObject():
         Convert the current object to XML representation.
         Any XML generated should conform to the NewsML-G2 schema.
         """
-        if hasattr(self, 'xml_element_name'):
-            xml_element_name = self.xml_element_name
-        else:
-            xml_element_name = self.__class__.__name__
-            xml_element_name = (xml_element_name[0].lower()
-                + xml_element_name[1:])
-        elem = etree.Element(NEWSMLG2NSPREFIX+xml_element_name, nsmap=NSMAP)
-        if hasattr(self, '_text') and self._text != '':
+        descriptor = self.get_descriptor()
+        elem = etree.Element(descriptor.xml_tag, nsmap=NSMAP)
+        if self._text:
             elem.text = self._text
-        for attr_id, attr_defn in self.get_attribute_definitions().items():
-            if attr_id in self._attribute_values:
-                xml_attr = attr_defn['xml_name']
-                elem.set(xml_attr, self._attribute_values[attr_id])
-            elif not isinstance(attr_defn, str):
-                if 'default' in attr_defn:
-                    attr_xml_name = attr_defn['xml_name']
-                    attr_default_value = attr_defn['default']
-                    elem.set(attr_xml_name, attr_default_value)
-                elif 'use' in attr_defn and attr_defn['use'] == 'required':
-                    raise AttributeError(
-                        "Attribute '" + attr_id + "' is required but has no value"
-                    )
-        for child_element_id, child_element_value in self._element_values.items():
-            if child_element_value:
-                if isinstance(child_element_value, GenericArray):
-                    for arrayelem in child_element_value:
-                        elem.append(arrayelem.to_xml())
-                else:
-                    child_elem_xml = child_element_value.to_xml()
-                    elem.append(child_elem_xml)
+        for (xml_attr, value) in self._get_xml_attributes(descriptor):
+            elem.set(xml_attr, value)
+        for child in self._iter_child_xml():
+            if isinstance(child, etree._Element):
+                elem.append(child)
+            else:
+                elem.append(child.to_xml())
 
         # Add extension elements (xs:any)
         for extension_key, extension_element in self._extension_elements.items():
@@ -392,15 +1855,267 @@ class BaseObject():
                 elem.append(extension_element.to_xml())
 
         # If this class supports xs:any, add all content elements
-        if hasattr(self, '_xs_any_content') and self._xs_any_content:
+        if self._xs_any_content:
             for content_elem in self._xs_any_content:
-                # Create a deep copy to avoid modifying the original
-                # and preserve the original namespace context
-                copied_elem = etree.fromstring(etree.tostring(content_elem, encoding='unicode'))
-                elem.append(copied_elem)
+                elem.append(_copy_xs_any_element(content_elem))
 
         return elem
 
+    def __getstate__(self):
+        """
+        Return the state of this object for pickling: its attribute values,
+        text and the values of its elements that are present, with extension
+        elements and xs:any content as XML. For an object parsed from an
+        element, the children that haven't been modified (or built, in lazy
+        mode) are pickled as their source XML rather than as objects, which
+        is more compact and doesn't build them. The element the object was
+        parsed from isn't pickled, and the class descriptor is compiled
+        again when unpickling.
+        Subclasses with their own slots extend the state.
+        """
+        descriptor = self.get_descriptor()
+        element_values = self._element_values
+        # parsed objects hold a value for every element, in definition order:
+        # only the values of elements that are present are pickled
+        parsed_layout = tuple(element_values) == descriptor.element_ids
+        has_source = parsed_layout and self._xmlelement is not None
+        empty_arrays = descriptor._empty_arrays
+        elements = []
+        source_element_ids = []
+        for (element_id, value) in list(element_values.items()):
+            if has_source and self._is_unmodified_value(descriptor, element_id, value):
+                source_element_ids.append(element_id)
+                continue
+            if value is _PENDING:
+                value = self._get_built_element_value(element_id)
+            if parsed_layout and (
+                    value is _ABSENT
+                    or value is empty_arrays.get(element_id)
+                    or (isinstance(value, BaseObject) and not value)):
+                continue
+            elements.append((element_id, value))
+        source_xml = None
+        if source_element_ids:
+            source_xml = _source_children_xml(self._xmlelement, {
+                descriptor.element_tags[element_id]
+                for element_id in source_element_ids
+            })
+        return (
+            self._attribute_mask,
+            self._attribute_values,
+            self._text,
+            parsed_layout,
+            tuple(elements),
+            tuple(source_element_ids),
+            source_xml,
+            self._extension_elements or None,
+            tuple(
+                etree.tostring(_copy_xs_any_element(content_elem))
+                for content_elem in self._xs_any_content
+            )
+        )
+
+    def __setstate__(self, state):
+        """
+        Restore an object from the state returned by __getstate__().
+        Children pickled as their source XML are built from it lazily.
+        """
+        (attribute_mask, attribute_values, text, parsed_layout, elements,
+         source_element_ids, source_xml, extension_elements,
+         xs_any_content) = state
+        descriptor = self.get_descriptor()
+        self._init_slots(descriptor)
+        self._attribute_mask = attribute_mask
+        self._attribute_values = attribute_values
+        self._text = text
+        if parsed_layout:
+            for element_id in descriptor.element_ids:
+                if element_id in descriptor.array_element_ids:
+                    self._element_values[element_id] = (
+                        descriptor.get_empty_array(element_id)
+                    )
+                else:
+                    self._element_values[element_id] = _ABSENT
+        for (element_id, value) in elements:
+            self._element_values[element_id] = value
+        if source_xml is not None:
+            source = etree.fromstring(zlib.decompress(source_xml))
+            self._lazy = True
+            for element_id in source_element_ids:
+                self._element_values[element_id] = self._build_element(
+                    element_id, source.findall(descriptor.element_tags[element_id])
+                )
+        if extension_elements:
+            self._extension_elements = extension_elements
+        if xs_any_content:
+            self._xs_any_content = [
+                etree.fromstring(content_xml) for content_xml in xs_any_content
+            ]
+
+    def to_dict(self):
+        """
+        Return this object as a dict of plain values, following the class
+        declarations: "@<attribute id>" for each attribute with a value,
+        "<element id>" for each element that is present (a dict, or a list
+        of dicts for an array element), "#text" for the object's text,
+        "#extensions" for extension elements (by key, as XML strings, with
+        any text that follows them under "#tail") and
+        "#xs_any" for xs:any content (a list of XML strings).
+        Attribute defaults and empty elements are left out, as in to_xml().
+        In lazy mode, elements that haven't been built are read from the
+        source element without building objects for them.
+        """
+        descriptor = self.get_descriptor()
+        data = {}
+        for (attribute_id, value) in self._iter_attribute_values():
+            if value is not None:
+                data['@' + attribute_id] = value
+        array_element_ids = descriptor.array_element_ids
+        for (element_id, value) in self._element_values.items():
+            if value is _PENDING and self._xmlelement is None:
+                # objects built from a catalog index have no source element
+                value = self._get_built_element_value(element_id)
+            if value is _PENDING:
+                element_tag = descriptor.element_tags[element_id]
+                child_descriptor = (
+                    descriptor.element_classes[element_id].get_descriptor()
+                )
+                if element_id in array_element_ids:
+                    xmlchildren = self._xmlelement.findall(element_tag)
+                    if xmlchildren:
+                        data[element_id] = [
+                            _source_to_dict(child_descriptor, xmlchild)[0]
+                            for xmlchild in xmlchildren
+                        ]
+                else:
+                    xmlchild = self._xmlelement.find(element_tag)
+                    if xmlchild is not None:
+                        (child_data, child_is_empty) = _source_to_dict(
+                            child_descriptor, xmlchild
+                        )
+                        if not child_is_empty:
+                            data[element_id] = child_data
+            elif isinstance(value, GenericArray):
+                if value._array_contents:
+                    data[element_id] = [
+                        child.to_dict() for child in value._array_contents
+                    ]
+            elif isinstance(value, BaseObject) and value:
+                data[element_id] = value.to_dict()
+        if self._text:
+            data['#text'] = self._text
+        extension_elements = {
+            extension_key: _extension_to_dict_value(extension_element)
+            for (extension_key, extension_element) in self._extension_elements.items()
+            if extension_element
+        }
+        if extension_elements:
+            data['#extensions'] = extension_elements
+        if self._xs_any_content:
+            data['#xs_any'] = [
+                etree.tostring(_copy_xs_any_element(content_elem), encoding='unicode')
+                for content_elem in self._xs_any_content
+            ]
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Return a new object built from a dict returned by to_dict(), without
+        going through XML. As in a parsed object, its elements are held in
+        the order they are defined. Subclasses with their own slots set them.
+        """
+        descriptor = cls.get_descriptor()
+        attribute_bits = descriptor.attribute_bits
+        element_definitions_dict = descriptor.element_definitions_dict
+        found_attributes = []
+        found_elements = {}
+        text = None
+        extension_elements = _EMPTY_MAPPING
+        xs_any_content = ()
+        for (key, value) in data.items():
+            if key in element_definitions_dict:
+                found_elements[key] = value
+            elif key.startswith('@') and key[1:] in attribute_bits:
+                found_attributes.append((attribute_bits[key[1:]], value))
+            elif key == '#text':
+                text = value
+            elif key == '#extensions':
+                extension_elements = {
+                    extension_key: _extension_from_dict_value(extension_value)
+                    for (extension_key, extension_value) in value.items()
+                }
+            elif key == '#xs_any':
+                xs_any_content = [
+                    etree.fromstring(content_xml) for content_xml in value
+                ]
+            else:
+                raise AttributeError(
+                    "'" + cls.__name__ + "' has no element or attribute '" +
+                    key.lstrip('@') + "'"
+                )
+
+        # the slots are set directly, as specialized parsers do
+        obj = cls.__new__(cls)
+        (attribute_mask, attribute_values) = _pack_attributes(found_attributes)
+        _SET_ATTRIBUTE_MASK(obj, attribute_mask)
+        _SET_ATTRIBUTE_VALUES(obj, attribute_values)
+        if descriptor.element_definitions:
+            element_values = {}
+            array_element_ids = descriptor.array_element_ids
+            element_classes = descriptor.element_classes
+            for element_id in descriptor.element_ids:
+                value = found_elements.get(element_id)
+                if element_id in array_element_ids:
+                    if value:
+                        element_class = element_classes[element_id]
+                        value = GenericArray(
+                            xmlarray = [
+                                element_class.from_dict(child_data)
+                                for child_data in value
+                            ],
+                            element_class = element_class
+                        )
+                    else:
+                        value = descriptor.get_empty_array(element_id)
+                elif value is None:
+                    value = _ABSENT
+                else:
+                    value = element_classes[element_id].from_dict(value)
+                element_values[element_id] = value
+        else:
+            element_values = _EMPTY_MAPPING
+        _SET_ELEMENT_VALUES(obj, element_values)
+        _SET_EXTENSION_ELEMENTS(obj, extension_elements)
+        _SET_XS_ANY_CONTENT(obj, xs_any_content)
+        _SET_TEXT(obj, text)
+        _SET_XMLELEMENT(obj, None)
+        _SET_LAZY(obj, False)
+        return obj
+
+    def _get_xml_attributes(self, descriptor):
+        """
+        Return the (XML name, value) of each attribute to output, in the
+        order the attributes are defined, including default values.
+        """
+        xml_attributes = []
+        attribute_mask = self._attribute_mask
+        attribute_values = iter(self._attribute_values)
+        for attr_id, attr_defn in descriptor.attributes.items():
+            if attribute_mask & descriptor.attribute_bits[attr_id]:
+                xml_attr = attr_defn['xml_name']
+                xml_attributes.append((xml_attr, next(attribute_values)))
+            elif not isinstance(attr_defn, str):
+                if 'default' in attr_defn:
+                    attr_xml_name = attr_defn['xml_name']
+                    attr_default_value = attr_defn['default']
+                    xml_attributes.append((attr_xml_name, attr_default_value))
+                elif 'use' in attr_defn and attr_defn['use'] == 'required':
+                    raise AttributeError(
+                        "Attribute '" + attr_id + "' is required but has no value"
+                    )
+        return xml_attributes
+
     def to_xml_string(self):
         """Return this document in XML as a string."""
         xml = self.to_xml()
@@ -411,6 +2126,108 @@ class BaseObject():
                     encoding='utf-8'
                ).decode('utf-8') 
 
+    def write_xml(self, output, pretty_print=True, xml_declaration=False):
+        """
+        Write this object as XML to `output`, a filename or a binary file
+        object (such as an open file, a socket file or a BytesIO). Elements
+        are written one at a time as the object graph is walked, without
+        building an XML tree first, so memory use doesn't grow with the
+        size of the document.
+        The output is the same as to_xml_string() (encoded as UTF-8), or as
+        the unindented XML with `pretty_print=False`.
+        """
+        if isinstance(output, str):
+            with open(output, 'wb') as output_file:
+                self.write_xml(output_file, pretty_print, xml_declaration)
+            return
+        with etree.xmlfile(output, encoding='utf-8') as xmlfile:
+            if xml_declaration:
+                xmlfile.write_declaration()
+            self._write_xml(xmlfile, 0 if pretty_print else None, True)
+        if pretty_print:
+            output.write(b'\n')
+
+    def to_xml_bytes(self, pretty_print=True, xml_declaration=False):
+        """
+        Return this object in XML as UTF-8 encoded bytes, written by
+        write_xml() rather than by building an XML tree.
+        """
+        output = io.BytesIO()
+        self.write_xml(output, pretty_print, xml_declaration)
+        return output.getvalue()
+
+    def _write_xml(self, xmlfile, indent, is_root=False):
+        """
+        Write this object to an lxml xmlfile. `indent` is the depth of this
+        element when pretty printing, or None if its content isn't indented.
+        Follows the same rules as to_xml() and libxml2's pretty printer, which
+        doesn't indent the content of an element that contains text.
+        """
+        descriptor = self.get_descriptor()
+        attributes = self._get_xml_attributes(descriptor)
+        # children are written one at a time as they are found, and those
+        # that haven't been built straight from their source element
+        children = self._iter_child_output()
+        first_child = next(children, None)
+        # extension elements (copied one at a time as they are written,
+        # since a copy only declares the namespaces it uses) and xs:any
+        # content
+        xml_children = []
+        for extension_element in self._extension_elements.values():
+            if extension_element:
+                xmlelement = extension_element._xmlelement
+                if xmlelement is not None and xmlelement.tail is not None:
+                    # the tail is output after the element, as text content
+                    indent = None
+                xml_children.append(extension_element)
+        xml_children.extend(self._xs_any_content)
+        if self._text:
+            indent = None
+
+        if (first_child is None and not xml_children and not self._text
+                and not is_root and _write_empty_element(
+                    xmlfile, descriptor.xml_tag, attributes, _ROOT_NSMAP)):
+            return
+        with xmlfile.element(descriptor.xml_tag, _get_xmlfile_attributes(attributes),
+                             nsmap=_ROOT_NSMAP if is_root else None):
+            if self._text:
+                xmlfile.write(self._text)
+            child_indent = None if indent is None else indent + 1
+            if first_child is not None:
+                for child in itertools.chain((first_child,), children):
+                    if indent is not None:
+                        xmlfile.write('\n' + '  ' * child_indent)
+                    if isinstance(child, tuple):
+                        _write_source_element(xmlfile, child[0], child[1], child_indent)
+                    else:
+                        child._write_xml(xmlfile, child_indent)
+            for xml_child in xml_children:
+                if indent is not None:
+                    xmlfile.write('\n' + '  ' * child_indent)
+                if isinstance(xml_child, ExtensionElement):
+                    _write_xml_element(
+                        xmlfile, xml_child.to_xml(), child_indent, _ROOT_NSMAP, True
+                    )
+                else:
+                    _write_xml_element(
+                        xmlfile, xml_child, child_indent, _ROOT_NSMAP, False
+                    )
+            if indent is not None and (first_child is not None or xml_children):
+                xmlfile.write('\n' + '  ' * indent)
+
+# Setters of BaseObject's slots. Objects built without the generic parser (by
+# specialized parsers, from_dict() and catalog indexes) have their slots set
+# with them, which skips BaseObject.__setattr__()
+_SET_ATTRIBUTE_MASK = BaseObject._attribute_mask.__set__
+_SET_ATTRIBUTE_VALUES = BaseObject._attribute_values.__set__
+_SET_ELEMENT_VALUES = BaseObject._element_values.__set__
+_SET_EXTENSION_ELEMENTS = BaseObject._extension_elements.__set__
+_SET_XS_ANY_CONTENT = BaseObject._xs_any_content.__set__
+_SET_TEXT = BaseObject._text.__set__
+_SET_XMLELEMENT = BaseObject._xmlelement.__set__
+_SET_LAZY = BaseObject._lazy.__set__
+
+
 class GenericArray():
     """
     Handle arrays of objects.
@@ -418,10 +2235,9 @@ class GenericArray():
     or by module and class name in strings as 'element_module_name' and
     'element_class_name'
     """
-    _array_contents = []
+    __slots__ = ('_array_contents', '_element_class', '_iterindex')
     _element_module_name = None
     _element_class_name = None
-    _element_class = None
 
     def __init__(self, **kwargs):
         self._array_contents = []
@@ -437,7 +2253,10 @@ class GenericArray():
             if isinstance(xmlarray, list):
                 for element in xmlarray:
                     if isinstance(element, etree._Element):
-                        array_elem = self._element_class(xmlelement = element)
+                        array_elem = self._element_class(
+                            xmlelement = element,
+                            lazy = kwargs.get('lazy', False)
+                        )
                         self._array_contents.append(array_elem)
                     else:
                         self._array_contents.append(element)
@@ -458,15 +2277,89 @@ class GenericArray():
     def __len__(self):
         return len(self._array_contents)
 
+    def __getstate__(self):
+        return (self._element_class, list(self._array_contents))
+
+    def __setstate__(self, state):
+        (self._element_class, self._array_contents) = state
+        self._iterindex = -1
+
     def __getitem__(self, item):
         return self._array_contents[item]
 
+    def _check_mutable(self):
+        if self._array_contents.__class__ is tuple:
+            raise TypeError(
+                "Empty arrays of parsed objects are shared and can't be "
+                "modified, assign a new GenericArray to the element instead"
+            )
+
     def __setitem__(self, item, value):
+        self._check_mutable()
+        if isinstance(item, slice):
+            for old_value in self._array_contents[item]:
+                if isinstance(old_value, BaseObject) and _is_write_through(old_value):
+                    raise TypeError(
+                        "Slices of a write-through array can't be assigned"
+                    )
+        else:
+            self._replace_source_element(item, value)
         self._array_contents[item] = value
 
     def __delitem__(self, item):
+        self._check_mutable()
+        indexes = range(len(self._array_contents))[item]
+        if not isinstance(item, slice):
+            indexes = [indexes]
+        xmlelements = None
+        if indexes:
+            xmlelements = _get_array_source_elements(self, indexes[0])
+        if xmlelements is not None:
+            self._remove_source_elements(xmlelements, indexes)
         del self._array_contents[item]
 
+    def _remove_source_elements(self, xmlelements, indexes):
+        """
+        In write-through mode, remove the elements of the items at `indexes`
+        from their document. An object that is also at another position
+        keeps its element, which takes the place of the copy left there.
+        """
+        for index in indexes:
+            obj = self._array_contents[index]
+            if _get_bound_source_element(obj) is not xmlelements[index]:
+                continue
+            for (other_index, other) in enumerate(self._array_contents):
+                if other is obj and other_index not in indexes:
+                    _swap_source_elements(xmlelements[index], xmlelements[other_index])
+                    (xmlelements[index], xmlelements[other_index]) = (
+                        xmlelements[other_index], xmlelements[index]
+                    )
+                    break
+        _remove_source_elements(
+            xmlelements[0].getparent(),
+            [xmlelements[index] for index in indexes]
+        )
+
+    def _replace_source_element(self, index, value):
+        """
+        In write-through mode, replace the element of the item at `index`
+        in its document by the element of `value`.
+        """
+        index = range(len(self._array_contents))[index]
+        xmlelements = _get_array_source_elements(self, index)
+        if xmlelements is None:
+            return
+        if _get_bound_source_element(value) is xmlelements[index]:
+            return
+        _check_source_element(value, xmlelements)
+        parent = xmlelements[index].getparent()
+        position = parent.index(xmlelements[index])
+        self._remove_source_elements(xmlelements, [index])
+        (new_xmlelement, bind) = _take_source_element(value, ())
+        _insert_source_elements(parent, position, [new_xmlelement])
+        if bind:
+            _bind_source_element(value, new_xmlelement)
+
     def __str__(self):
         """
         Hack / "syntactic sugar": if an array has only one element,
@@ -487,6 +2380,11 @@ class GenericArray():
         method on the array, and the array only contains one element, then pass
         the call on to the first element in the array.
         """
+        if name.startswith('_'):
+            raise AttributeError(
+                "'" + self.__class__.__name__ + "' object has no attribute '" +
+                name + "'"
+            )
         if len(self._array_contents) == 1:
             return getattr(self._array_contents[0], name)
         raise AttributeError(
@@ -4,6 +4,8 @@
 Parent class to paarse a NewsMLG2 document.
 """
 
+import io
+
 from lxml import etree
 
 from .anyitem import AnyItem
@@ -12,57 +14,80 @@ from .catalogitem import CatalogItem
 from .conceptitem import ConceptItem
 from .knowledgeitem import KnowledgeItem
 from .newsitem import NewsItem
-from .newsmessage import NewsMessage
+from .newsmessage import Header, NewsMessage
 from .packageitem import PackageItem
 from .planningitem import PlanningItem
 
+# Classes of the items that can be the root of a document or be contained in
+# a newsMessage, keyed by their prefixed tag names
+ITEM_CLASSES = {
+    NEWSMLG2NSPREFIX+'catalogItem': CatalogItem,
+    NEWSMLG2NSPREFIX+'conceptItem': ConceptItem,
+    NEWSMLG2NSPREFIX+'knowledgeItem': KnowledgeItem,
+    NEWSMLG2NSPREFIX+'newsItem': NewsItem,
+    NEWSMLG2NSPREFIX+'packageItem': PackageItem,
+    NEWSMLG2NSPREFIX+'planningItem': PlanningItem
+}
+
+# Classes of the elements that can be the root of a NewsML-G2 document
+ROOT_CLASSES = dict(ITEM_CLASSES)
+ROOT_CLASSES[NEWSMLG2NSPREFIX+'newsMessage'] = NewsMessage
+
 
 class NewsMLG2Document():
     """
     Parent class to parse a NewsMLG2 document.
     """
     _root_element = None
+    # the bytes the document was parsed from, kept with `passthrough=True`
+    _source = None
+    _write_through = False
     item = None
 
-    def __init__(self, filename_or_string=None):
+    def __init__(self, filename_or_string=None, lazy=False, passthrough=False,
+                 write_through=False):
+        """
+        Parse a NewsML-G2 document from a filename or a bytes string.
+        With `lazy=True`, objects are only built for elements as they are
+        accessed.
+        With `passthrough=True`, the bytes of the document are kept and
+        output as they are by to_xml_string(), to_xml_bytes() and
+        write_xml() as long as nothing in the document has been modified.
+        With `write_through=True`, objects are built lazily, and setting
+        their attributes and elements changes the parsed XML tree, which
+        to_xml_string(), to_xml_bytes() and write_xml() then serialize as
+        it is.
+        """
+        source = None
         if isinstance(filename_or_string, str):
-            tree = etree.parse(filename_or_string)
-            self._root_element = tree.getroot()
+            if passthrough and not write_through:
+                with open(filename_or_string, 'rb') as xmlfile:
+                    source = xmlfile.read()
+                self._root_element = etree.fromstring(
+                    source, base_url=filename_or_string
+                )
+            else:
+                tree = etree.parse(filename_or_string)
+                self._root_element = tree.getroot()
         elif isinstance(filename_or_string, (str, bytes)):
+            source = filename_or_string
             self._root_element = etree.fromstring(filename_or_string)
+        if (passthrough and not write_through and source is not None and
+                self._root_element.getroottree().docinfo.encoding.upper() == 'UTF-8'):
+            # other encodings are output as UTF-8 when serialized
+            self._source = source
         if self._root_element is not None:
-            if self._root_element.tag == NEWSMLG2NSPREFIX+'catalogItem':
-                self.item = CatalogItem(
-                    xmlelement = self._root_element
-                )
-            elif self._root_element.tag == NEWSMLG2NSPREFIX+'conceptItem':
-                self.item = ConceptItem(
-                    xmlelement = self._root_element
-                )
-            elif self._root_element.tag == NEWSMLG2NSPREFIX+'knowledgeItem':
-                self.item = KnowledgeItem(
-                    xmlelement = self._root_element
-                )
-            elif self._root_element.tag == NEWSMLG2NSPREFIX+'newsItem':
-                self.item = NewsItem(
-                    xmlelement = self._root_element
-                )
-            elif self._root_element.tag == NEWSMLG2NSPREFIX+'packageItem':
-                self.item = PackageItem(
-                    xmlelement = self._root_element
-                )
-            elif self._root_element.tag == NEWSMLG2NSPREFIX+'planningItem':
-                self.item = PlanningItem(
-                    xmlelement = self._root_element
-                )
-            elif self._root_element.tag == NEWSMLG2NSPREFIX+'newsMessage':
-                self.item = NewsMessage(
-                    xmlelement = self._root_element
-                )
-            else:
+            root_class = ROOT_CLASSES.get(self._root_element.tag)
+            if root_class is None:
                 raise Exception(
                     "Root element is not a NewsML-G2 specified document root."
                 )
+            self.item = root_class(
+                xmlelement = self._root_element,
+                lazy = lazy,
+                write_through = write_through
+            )
+            self._write_through = write_through
 
     def get_item(self):
         """
@@ -87,8 +112,40 @@ class NewsMLG2Document():
         """Return this document in XML form."""
         return self.item.to_xml()
 
+    def _get_passthrough_source(self):
+        """
+        Return the bytes this document was parsed from, if it was parsed
+        with `passthrough=True` and hasn't been modified; otherwise None.
+        """
+        if (self._source is None
+                or self.item is None
+                or self.item._xmlelement is not self._root_element
+                or not self.item._is_unmodified()):
+            return None
+        return self._source
+
+    def _get_write_through_tree(self):
+        """
+        Return the XML tree this document was parsed from, if it was parsed
+        with `write_through=True` and its item hasn't been replaced;
+        otherwise None.
+        """
+        if (not self._write_through
+                or self.item is None
+                or self.item._xmlelement is not self._root_element):
+            return None
+        return self._root_element.getroottree()
+
     def to_xml_string(self):
         """Return this document in XML as a string."""
+        source = self._get_passthrough_source()
+        if source is not None:
+            return source.decode('utf-8')
+        tree = self._get_write_through_tree()
+        if tree is not None:
+            return etree.tostring(
+                tree, pretty_print=True, xml_declaration=True, encoding='utf-8'
+            ).decode('utf-8')
         xml = self.to_xml()
         return etree.tostring(
                     xml,
@@ -96,3 +153,122 @@ class NewsMLG2Document():
                     xml_declaration=True,
                     encoding='utf-8'
                ).decode('utf-8')
+
+    def write_xml(self, output, pretty_print=True):
+        """
+        Write this document as XML, with an XML declaration, to a filename
+        or a binary file object, without building an XML tree first.
+        See BaseObject.write_xml().
+        """
+        source = self._get_passthrough_source() if pretty_print else None
+        tree = self._get_write_through_tree()
+        if tree is not None:
+            tree.write(
+                output, pretty_print=pretty_print, xml_declaration=True,
+                encoding='utf-8'
+            )
+        elif source is None:
+            self.item.write_xml(output, pretty_print, xml_declaration=True)
+        elif isinstance(output, str):
+            with open(output, 'wb') as output_file:
+                output_file.write(source)
+        else:
+            output.write(source)
+
+    def to_xml_bytes(self, pretty_print=True):
+        """
+        Return this document in XML as UTF-8 encoded bytes, with an XML
+        declaration, without building an XML tree first.
+        """
+        source = self._get_passthrough_source() if pretty_print else None
+        if source is not None:
+            return source
+        tree = self._get_write_through_tree()
+        if tree is not None:
+            return etree.tostring(
+                tree, pretty_print=pretty_print, xml_declaration=True,
+                encoding='utf-8'
+            )
+        return self.item.to_xml_bytes(pretty_print, xml_declaration=True)
+
+
+class NewsMessageReader():
+    """
+    Read a NewsML-G2 newsMessage incrementally, for messages too large to
+    parse in one go.
+
+    The header is parsed when the reader is created. Iterating over the
+    reader yields one NewsItem, PackageItem etc for each item in the
+    message's itemSet. The XML for each item is detached from the document
+    once the item has been parsed, so memory use doesn't grow with the
+    number of items read.
+    """
+    header = None
+    item_classes = ITEM_CLASSES
+
+    def __init__(self, filename_or_string, lazy=False):
+        """
+        Start reading a newsMessage from a filename, a file object or a
+        bytes string. `lazy` is passed on to each item, see NewsMLG2Document.
+        """
+        if isinstance(filename_or_string, bytes):
+            filename_or_string = io.BytesIO(filename_or_string)
+        self._lazy = lazy
+        self._events = self._read_events(filename_or_string)
+        # read up to the end of the header
+        next(self._events, None)
+        if self.header is None:
+            self.header = Header()
+
+    def _read_events(self, source):
+        """
+        Parse the newsMessage, setting self.header and yielding None once
+        the header has been read (or the itemSet starts without one), then
+        yielding each item.
+        """
+        depth = 0
+        root = None
+        itemset = None
+        for event, element in etree.iterparse(source, events=('start', 'end')):
+            if event == 'start':
+                depth += 1
+                if depth == 1:
+                    if element.tag != NEWSMLG2NSPREFIX+'newsMessage':
+                        raise Exception(
+                            "Root element is not a NewsML-G2 newsMessage."
+                        )
+                    root = element
+                elif depth == 2 and element.tag == NEWSMLG2NSPREFIX+'itemSet':
+                    if self.header is None:
+                        yield None
+                    itemset = element
+                continue
+            depth -= 1
+            if depth == 1 and element.tag == NEWSMLG2NSPREFIX+'header':
+                self.header = Header(xmlelement = element, lazy = self._lazy)
+                yield None
+            elif depth == 2 and element.getparent() is itemset:
+                # drop comments etc that came before this item
+                while element.getprevious() is not None:
+                    del itemset[0]
+                # detach the item's XML so it is freed along with the item
+                itemset.remove(element)
+                item_class = self.item_classes.get(element.tag)
+                if item_class is not None:
+                    yield item_class(xmlelement = element, lazy = self._lazy)
+        if root is not None and self.header is None:
+            yield None
+
+    def __iter__(self):
+        """
+        Yield each item in the newsMessage's itemSet.
+        """
+        for item in self._events:
+            if item is not None:
+                yield item
+
+    def get_header(self):
+        """
+        Return the Header of this newsMessage.
+        """
+        return self.header
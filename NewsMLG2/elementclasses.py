@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+
+"""
+lxml backend: register NewsML-G2 classes as lxml custom element classes, so
+that parsing produces a tree of typed elements in one step, without building
+NewsML-G2 objects.
+
+    root = NewsMLG2.parse_typed_tree("newsitem.xml")
+    root.get_element_class()        # NewsMLG2.NewsItem
+    root.itemmeta.itemclass.qcode   # 'ninat:text'
+
+Each NewsML-G2 tag gets an lxml element class (e.g. NewsItemElement for
+<newsItem>) through an ElementNamespaceClassLookup on the NewsML-G2 namespace.
+Accessors for elements and attributes are driven by the declarations of the
+NewsML-G2 class. Some tags (e.g. <name>, <subject>) are declared with
+different classes in different parents: their class is found from the
+parent element when it is needed.
+"""
+
+from lxml import etree
+
+from .core import BaseObject, NEWSMLG2_NS
+from .document import ROOT_CLASSES
+
+
+class NewsMLG2Element(etree.ElementBase):
+    """
+    Base lxml element class for elements in the NewsML-G2 namespace.
+    As with all lxml custom element classes, instances must not keep any
+    state of their own.
+    """
+    # NewsML-G2 class for elements of this tag, or None if it depends on
+    # the parent element
+    element_class = None
+
+    def get_element_class(self):
+        """
+        Return the NewsML-G2 class of this element, or None if the element
+        isn't declared by the NewsML-G2 class of its parent.
+        """
+        if self.element_class is not None:
+            return self.element_class
+        parent = self.getparent()
+        if not isinstance(parent, NewsMLG2Element):
+            return None
+        parent_class = parent.get_element_class()
+        if parent_class is None:
+            return None
+        descriptor = parent_class.get_descriptor()
+        element_ids = descriptor.element_ids_by_tag.get(self.tag)
+        if element_ids is None:
+            return None
+        return descriptor.element_classes[element_ids[0]]
+
+    def get_value(self, name):
+        """
+        Return the child element(s) or attribute value declared with id
+        `name` by the NewsML-G2 class of this element. Repeating elements are
+        returned as a list; a missing single element as None.
+        """
+        element_class = self.get_element_class()
+        if element_class is None:
+            raise AttributeError(
+                "'" + self.__class__.__name__ +
+                "' is not a declared NewsML-G2 element"
+            )
+        descriptor = element_class.get_descriptor()
+        if name in descriptor.element_tags:
+            tag = descriptor.element_tags[name]
+            if name in descriptor.array_element_ids:
+                return list(self.iterchildren(tag))
+            return self.find(tag)
+        attribute_definition = descriptor.attributes.get(name)
+        if attribute_definition is not None:
+            value = self.get(attribute_definition['xml_name'])
+            if value is None:
+                return attribute_definition.get('default')
+            return value
+        raise AttributeError(
+            "'" + element_class.__name__ +
+            "' has no element or attribute '" + name + "'"
+        )
+
+    def __getattr__(self, name):
+        """
+        Dot-syntax access to the elements and attributes declared by the
+        NewsML-G2 class. Names that are part of the lxml element API (e.g.
+        `tag`) are not available this way: use get_value() instead.
+        """
+        if name.startswith('_'):
+            raise AttributeError(
+                "'" + self.__class__.__name__ + "' object has no attribute '" +
+                name + "'"
+            )
+        return self.get_value(name)
+
+    def get_text(self):
+        """
+        Return the text of the element, with whitespace normalised as it is
+        in NewsML-G2 objects; or None if the element has no text.
+        """
+        if self.text is None:
+            return None
+        return " ".join(self.text.split())
+
+    def to_object(self):
+        """
+        Build the NewsML-G2 object for this element.
+        """
+        element_class = self.get_element_class()
+        if element_class is None:
+            raise AttributeError(
+                "'" + self.__class__.__name__ +
+                "' is not a declared NewsML-G2 element"
+            )
+        return element_class(xmlelement=self)
+
+    def __bool__(self):
+        """
+        Elements are always True, unlike plain lxml elements which are False
+        when they have no children. Missing single elements are None.
+        """
+        return True
+
+    def __str__(self):
+        text = self.get_text()
+        if text:
+            return text
+        element_class = self.get_element_class()
+        if element_class is None:
+            return '<' + self.__class__.__name__ + '>'
+        attributes = element_class.get_descriptor().attributes
+        if 'qcode' in attributes and self.get('qcode'):
+            return '<'+element_class.__name__+' qcode="'+self.get('qcode')+'">'
+        if 'uri' in attributes and self.get('uri'):
+            return '<'+element_class.__name__+' uri="'+self.get('uri')+'">'
+        return '<'+element_class.__name__+'>'
+
+
+def _get_tag_classes():
+    """
+    Return a map of local tag name to the NewsML-G2 class for that tag, or
+    None when different classes are declared for the tag.
+    """
+    tag_classes = {}
+    declared_classes = set()
+    pending_classes = list(ROOT_CLASSES.values())
+    for tag, element_class in ROOT_CLASSES.items():
+        tag_classes[etree.QName(tag).localname] = element_class
+    while pending_classes:
+        parent_class = pending_classes.pop()
+        if parent_class in declared_classes:
+            continue
+        declared_classes.add(parent_class)
+        descriptor = parent_class.get_descriptor()
+        for element_id, tag in descriptor.element_tags.items():
+            element_class = descriptor.element_classes[element_id]
+            localname = etree.QName(tag).localname
+            if tag_classes.get(localname, element_class) is not element_class:
+                tag_classes[localname] = None
+            elif localname not in tag_classes:
+                tag_classes[localname] = element_class
+            pending_classes.append(element_class)
+    return tag_classes
+
+
+def build_element_class_lookup(fallback=None):
+    """
+    Return an lxml ElementNamespaceClassLookup that creates NewsMLG2Element
+    subclasses for elements in the NewsML-G2 namespace.
+    """
+    lookup = etree.ElementNamespaceClassLookup(fallback)
+    namespace = lookup.get_namespace(NEWSMLG2_NS)
+    # undeclared elements, and tags declared with different classes
+    namespace[None] = NewsMLG2Element
+    for localname, element_class in _get_tag_classes().items():
+        if element_class is not None:
+            namespace[localname] = get_lxml_element_class(element_class)
+    return lookup
+
+
+_LXML_ELEMENT_CLASSES = {}
+
+def get_lxml_element_class(element_class):
+    """
+    Return the lxml element class for a NewsML-G2 class.
+    """
+    lxml_element_class = _LXML_ELEMENT_CLASSES.get(element_class)
+    if lxml_element_class is None:
+        if not issubclass(element_class, BaseObject):
+            raise TypeError(str(element_class) + " is not a NewsML-G2 class")
+        lxml_element_class = type(
+            element_class.__name__ + 'Element',
+            (NewsMLG2Element,),
+            {'element_class': element_class, '__module__': __name__}
+        )
+        _LXML_ELEMENT_CLASSES[element_class] = lxml_element_class
+    return lxml_element_class
+
+
+_ELEMENT_CLASS_LOOKUP = None
+
+def get_typed_tree_parser():
+    """
+    Return a new lxml XMLParser that produces NewsML-G2 typed elements.
+    (lxml parsers must not be shared between threads.)
+    """
+    global _ELEMENT_CLASS_LOOKUP  # pylint: disable=global-statement
+    if _ELEMENT_CLASS_LOOKUP is None:
+        _ELEMENT_CLASS_LOOKUP = build_element_class_lookup()
+    parser = etree.XMLParser()
+    parser.set_element_class_lookup(_ELEMENT_CLASS_LOOKUP)
+    return parser
+
+
+def parse_typed_tree(filename_or_string):
+    """
+    Parse a NewsML-G2 document from a filename or a bytes string and return
+    its root element, as a NewsMLG2Element.
+    """
+    parser = get_typed_tree_parser()
+    if isinstance(filename_or_string, bytes):
+        return etree.fromstring(filename_or_string, parser)
+    return etree.parse(filename_or_string, parser).getroot()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+
+"""
+Pull parser: read a NewsML-G2 document as a stream of events, without
+building NewsML-G2 objects.
+
+Events are typed using the same class declarations as the object model, e.g.
+
+    for event in NewsMLG2.iter_events("newsmessage.xml"):
+        if (isinstance(event, NewsMLG2.AttributeEvent)
+                and event.element_class is NewsMLG2.Subject
+                and event.attribute_id == 'qcode'):
+            print(event.value)
+
+The document is read incrementally and parsed elements are discarded as soon
+as their events have been emitted, so any size of input can be read.
+"""
+
+import io
+
+from lxml import etree
+
+from .document import ITEM_CLASSES, ROOT_CLASSES
+from .newsmessage import ItemSet, NewsMessage
+
+
+class PullEvent():
+    """
+    Base class of the events emitted by iter_events().
+    """
+    __slots__ = ()
+
+    def __repr__(self):
+        return '<' + self.__class__.__name__ + ' ' + ', '.join(
+            name + '=' + repr(getattr(self, name)) for name in self.__slots__
+        ) + '>'
+
+
+class StartItemEvent(PullEvent):
+    """
+    The start of an item (NewsItem, PackageItem etc), either the root of the
+    document or an item in a newsMessage.
+    """
+    __slots__ = ('item_class',)
+
+    def __init__(self, item_class):
+        self.item_class = item_class
+
+
+class EndItemEvent(PullEvent):
+    """
+    The end of an item started by a StartItemEvent.
+    """
+    __slots__ = ('item_class',)
+
+    def __init__(self, item_class):
+        self.item_class = item_class
+
+
+class AttributeEvent(PullEvent):
+    """
+    The value of an attribute declared by a NewsML-G2 class. `element_id` is
+    the id the element is declared with in its parent class, or None for the
+    root of the document and items in a newsMessage.
+    """
+    __slots__ = ('element_class', 'element_id', 'attribute_id', 'value')
+
+    def __init__(self, element_class, element_id, attribute_id, value):
+        self.element_class = element_class
+        self.element_id = element_id
+        self.attribute_id = attribute_id
+        self.value = value
+
+
+class TextEvent(PullEvent):
+    """
+    The text of an element declared by a NewsML-G2 class, with whitespace
+    normalised as it is in the object model. Elements with no text other
+    than whitespace don't generate text events.
+    """
+    __slots__ = ('element_class', 'element_id', 'text')
+
+    def __init__(self, element_class, element_id, text):
+        self.element_class = element_class
+        self.element_id = element_id
+        self.text = text
+
+
+ITEM_CLASS_SET = frozenset(ITEM_CLASSES.values())
+
+
+def iter_events(source, element_classes=None):
+    """
+    Yield PullEvents for a NewsML-G2 document read from a filename, a file
+    object or a bytes string.
+
+    Only elements declared in the NewsML-G2 classes generate events:
+    extension elements and xs:any content are skipped. If `element_classes`
+    is given, attribute and text events are only emitted for elements of
+    those classes.
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    if element_classes is not None:
+        element_classes = frozenset(element_classes)
+    # for each open element: (descriptor, element id), or None for
+    # elements that aren't declared
+    stack = []
+    for event, element in etree.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            if stack:
+                parent = stack[-1]
+                if parent is None:
+                    stack.append(None)
+                    continue
+                element_ids = parent[0].element_ids_by_tag.get(element.tag)
+                if element_ids is not None:
+                    element_id = element_ids[0]
+                    element_class = parent[0].element_classes[element_id]
+                elif parent[0].cls is ItemSet and element.tag in ITEM_CLASSES:
+                    element_id = None
+                    element_class = ITEM_CLASSES[element.tag]
+                    yield StartItemEvent(element_class)
+                else:
+                    stack.append(None)
+                    continue
+            else:
+                element_id = None
+                element_class = ROOT_CLASSES.get(element.tag)
+                if element_class is None:
+                    raise Exception(
+                        "Root element is not a NewsML-G2 specified document root."
+                    )
+                if element_class is not NewsMessage:
+                    yield StartItemEvent(element_class)
+            descriptor = element_class.get_descriptor()
+            stack.append((descriptor, element_id))
+            if element.attrib and (element_classes is None
+                                   or element_class in element_classes):
+                attribute_ids_by_xml_name = descriptor.attribute_ids_by_xml_name
+                for attribute_xmlname, xmlattr_value in element.items():
+                    for attribute_id in attribute_ids_by_xml_name.get(
+                            attribute_xmlname, ()):
+                        yield AttributeEvent(
+                            element_class, element_id, attribute_id, xmlattr_value
+                        )
+            continue
+
+        # end event
+        current = stack.pop()
+        if current is not None:
+            element_class = current[0].cls
+            text = element.text
+            if text and (element_classes is None
+                         or element_class in element_classes):
+                # same as the object model's re.sub(r"\s+", " ", text).strip()
+                text = " ".join(text.split())
+                if text:
+                    yield TextEvent(element_class, current[1], text)
+            if current[1] is None and element_class in ITEM_CLASS_SET:
+                yield EndItemEvent(element_class)
+        if len(stack) <= 1 or (current is not None and current[1] is None):
+            # discard what has been read: items and the children of the root
+            # element, along with everything inside them
+            element.clear(keep_tail=True)
+            parent_element = element.getparent()
+            if parent_element is not None:
+                while element.getprevious() is not None:
+                    del parent_element[0]
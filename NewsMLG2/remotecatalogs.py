@@ -0,0 +1,309 @@
+#!/usr/bin/env python
+
+"""
+Load remote catalogs referenced by catalogRef elements.
+
+    NewsMLG2.enable_remote_catalogs()
+
+Each remote catalog is fetched once, saved in a cache directory along with
+its ETag and Last-Modified headers, and then served from memory. When a
+catalog is older than `max_age` it is refreshed in a background thread with
+a conditional request, while items keep using the catalog already loaded.
+Parsing an item only waits for the network the first time a catalog that
+isn't in the cache directory is used.
+
+Catalogs are fetched with a fetcher function, by default fetch_url(). A
+fetcher is called as `fetcher(url, headers)` and returns a tuple of
+(HTTP status, response headers, response body).
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from lxml import etree
+
+from .core import NEWSMLG2NSPREFIX
+from .catalog import Catalog, set_remote_catalogs
+
+
+# Timeout in seconds for fetching a remote catalog with fetch_url()
+FETCH_TIMEOUT = 10
+
+
+class RemoteCatalogError(Exception):
+    """A remote catalog could not be fetched or parsed"""
+
+
+def fetch_url(url, headers):
+    """
+    Fetch a URL with urllib, sending the given request headers. Return
+    (status, response headers, body).
+    """
+    request = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=FETCH_TIMEOUT) as response:
+            return (response.status, dict(response.headers), response.read())
+    except urllib.error.HTTPError as err:
+        if err.code == 304:
+            return (304, dict(err.headers), b'')
+        raise
+
+
+def get_default_cache_dir():
+    """
+    Return the default directory for saving remote catalogs.
+    """
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(
+        os.path.expanduser('~'), '.cache'
+    )
+    return os.path.join(cache_home, 'newsmlg2', 'catalogs')
+
+
+class _CachedCatalog():
+    """
+    A remote catalog held in memory, with the metadata needed to refresh it.
+    `catalog` is None if the catalog could not be loaded.
+    """
+    __slots__ = ('catalog', 'etag', 'last_modified', 'expires')
+
+    def __init__(self, catalog, etag, last_modified, expires):
+        self.catalog = catalog
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires = expires
+
+
+class RemoteCatalogCache():
+    """
+    Memory and disk cache of remote catalogs, keyed by catalogRef href.
+    Catalogs are kept for `max_age` seconds before being refreshed; after a
+    failure, loading is retried after `retry_interval` seconds.
+    """
+    def __init__(self, cache_dir=None, fetcher=None, max_age=86400,
+                 retry_interval=300):
+        if cache_dir is None:
+            cache_dir = get_default_cache_dir()
+        self.cache_dir = cache_dir
+        self.fetcher = fetcher or fetch_url
+        self.max_age = max_age
+        self.retry_interval = retry_interval
+        self._catalogs = {}
+        self._lock = threading.Lock()
+        # locks held while loading each catalog, by href
+        self._load_locks = {}
+        # hrefs being refreshed in the background
+        self._refreshing = set()
+
+    def get_catalog(self, href):
+        """
+        Return the Catalog for a catalogRef href, or None if it can't be
+        loaded. Only blocks on the network if the catalog isn't in memory
+        or in the cache directory.
+        """
+        cached = self._catalogs.get(href)
+        if cached is None:
+            cached = self._load(href)
+        if cached.expires < time.time():
+            self._refresh_in_background(href)
+        return cached.catalog
+
+    def refresh(self, href):
+        """
+        Fetch a catalog again, using a conditional request if it has been
+        fetched before, and replace the catalog held in memory if it has
+        changed. Return the current Catalog, or None if there is none.
+        """
+        cached = self._catalogs.get(href)
+        headers = {}
+        if cached is not None and cached.catalog is not None:
+            if cached.etag:
+                headers['If-None-Match'] = cached.etag
+            if cached.last_modified:
+                headers['If-Modified-Since'] = cached.last_modified
+        try:
+            (status, response_headers, body) = self.fetcher(href, headers)
+            if status == 304 and headers:
+                cached = _CachedCatalog(
+                    cached.catalog, cached.etag, cached.last_modified,
+                    time.time() + self.max_age
+                )
+                self._save_metadata(href, cached)
+            elif status == 200:
+                cached = _CachedCatalog(
+                    parse_catalog(body),
+                    _get_header(response_headers, 'ETag'),
+                    _get_header(response_headers, 'Last-Modified'),
+                    time.time() + self.max_age
+                )
+                self._save(href, cached, body)
+            else:
+                raise RemoteCatalogError(
+                    "HTTP status " + str(status) + " fetching " + href
+                )
+        except Exception as err:  # pylint: disable=broad-except
+            # TODO convert to a logged warning
+            print("WARNING: Remote catalog {} could not be loaded: {}".format(
+                href, err
+            ))
+            catalog = cached.catalog if cached is not None else None
+            cached = _CachedCatalog(
+                catalog,
+                cached.etag if cached is not None else None,
+                cached.last_modified if cached is not None else None,
+                time.time() + self.retry_interval
+            )
+        self._catalogs[href] = cached
+        return cached.catalog
+
+    def clear(self):
+        """
+        Forget all catalogs held in memory. The cache directory is kept.
+        """
+        with self._lock:
+            self._catalogs.clear()
+
+    def _load(self, href):
+        """
+        Load a catalog that isn't in memory, from the cache directory or
+        else from the network. Threads loading the same catalog wait for
+        each other; loading other catalogs doesn't wait.
+        """
+        with self._lock:
+            load_lock = self._load_locks.setdefault(href, threading.Lock())
+        with load_lock:
+            # another thread may have loaded the catalog in the meantime
+            cached = self._catalogs.get(href)
+            if cached is not None:
+                return cached
+            cached = self._load_from_disk(href)
+            if cached is not None:
+                self._catalogs[href] = cached
+                return cached
+            self.refresh(href)
+            return self._catalogs[href]
+
+    def _refresh_in_background(self, href):
+        """
+        Start refreshing a catalog in a background thread, unless it is
+        already being refreshed.
+        """
+        with self._lock:
+            if href in self._refreshing:
+                return
+            self._refreshing.add(href)
+        thread = threading.Thread(
+            target=self._background_refresh, args=(href,), daemon=True
+        )
+        thread.start()
+
+    def _background_refresh(self, href):
+        try:
+            self.refresh(href)
+        finally:
+            with self._lock:
+                self._refreshing.discard(href)
+
+    def _get_filename(self, href, extension):
+        """
+        Return the name of a file in the cache directory for a catalog.
+        """
+        key = hashlib.sha256(href.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key + extension)
+
+    def _load_from_disk(self, href):
+        """
+        Return the _CachedCatalog saved in the cache directory for a catalog,
+        or None if there isn't one.
+        """
+        try:
+            with open(self._get_filename(href, '.json'), 'r') as metadata_file:
+                metadata = json.load(metadata_file)
+            with open(self._get_filename(href, '.xml'), 'rb') as catalog_file:
+                catalog = parse_catalog(catalog_file.read())
+        except (OSError, ValueError, etree.XMLSyntaxError, RemoteCatalogError):
+            return None
+        if metadata.get('href') != href:
+            return None
+        return _CachedCatalog(
+            catalog, metadata.get('etag'), metadata.get('last_modified'),
+            metadata.get('expires', 0)
+        )
+
+    def _save(self, href, cached, body):
+        """
+        Save a fetched catalog and its metadata in the cache directory.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        _write_file(self._get_filename(href, '.xml'), body)
+        self._save_metadata(href, cached)
+
+    def _save_metadata(self, href, cached):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        metadata = {
+            'href': href,
+            'etag': cached.etag,
+            'last_modified': cached.last_modified,
+            'expires': cached.expires
+        }
+        _write_file(
+            self._get_filename(href, '.json'),
+            json.dumps(metadata).encode('utf-8')
+        )
+
+
+def _get_header(headers, name):
+    """
+    Return a response header, whatever the case of its name.
+    """
+    name = name.lower()
+    for (header_name, value) in headers.items():
+        if header_name.lower() == name:
+            return value
+    return None
+
+
+def _write_file(filename, data):
+    """
+    Replace a file in one step, so that readers never see a partial file.
+    """
+    temp_filename = filename + '.' + str(os.getpid()) + '.' + str(threading.get_ident())
+    with open(temp_filename, 'wb') as temp_file:
+        temp_file.write(data)
+    os.replace(temp_filename, filename)
+
+
+def parse_catalog(data):
+    """
+    Parse a remote catalog document, without loading any external entities.
+    """
+    parser = etree.XMLParser(resolve_entities=False, no_network=True)
+    root = etree.fromstring(data, parser)
+    if root.tag != NEWSMLG2NSPREFIX + 'catalog':
+        raise RemoteCatalogError("Not a NewsML-G2 catalog: " + str(root.tag))
+    return Catalog(xmlelement=root)
+
+
+def enable_remote_catalogs(cache_dir=None, fetcher=None, max_age=86400,
+                           retry_interval=300):
+    """
+    Load remote catalogs referenced by catalogRef elements, using a new
+    RemoteCatalogCache created with the given options. Return the cache.
+    """
+    remote_catalogs = RemoteCatalogCache(
+        cache_dir=cache_dir, fetcher=fetcher, max_age=max_age,
+        retry_interval=retry_interval
+    )
+    set_remote_catalogs(remote_catalogs)
+    return remote_catalogs
+
+
+def disable_remote_catalogs():
+    """
+    Stop loading remote catalogs.
+    """
+    set_remote_catalogs(None)
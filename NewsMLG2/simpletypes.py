@@ -23,18 +23,36 @@ class TruncatedDateTimeType(BaseObject):
     which may be truncated from the second part to the month part
     XSD definition: <xs:union memberTypes="xs:date xs:dateTime xs:gYearMonth xs:gYear" />
     """
-    # store name of the tag used, this can vary
-    _element_name = None
-    # value of the date-time
-    _date_time = None
+    __slots__ = (
+        # store name of the tag used, this can vary
+        '_element_name',
+        # value of the date-time
+        '_date_time'
+    )
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
+        self._element_name = None
+        self._date_time = None
         xmlelement = kwargs.get('xmlelement')
         if isinstance(xmlelement, etree._Element):
             self._element_name = xmlelement.tag
             self._date_time = xmlelement.text.strip()
 
+    def __getstate__(self):
+        return (super().__getstate__(), self._element_name, self._date_time)
+
+    def __setstate__(self, state):
+        (base_state, self._element_name, self._date_time) = state
+        super().__setstate__(base_state)
+
+    @classmethod
+    def from_dict(cls, data):
+        obj = super().from_dict(data)
+        obj._element_name = None
+        obj._date_time = obj._text
+        return obj
+
 
 class UnionDateTimeType(BaseObject):
     """
@@ -48,6 +66,7 @@ class UnionDateTimeEmptyStringType(BaseObject):
     """
     The base type for dateTimes which may be empty
     """
+    __slots__ = ('_element_name', '_date_time')
     # value of the date-time
     date_time = None
 
@@ -61,6 +80,28 @@ class UnionDateTimeEmptyStringType(BaseObject):
     def __str__(self):
         return self._date_time
 
+    def __getstate__(self):
+        return (
+            super().__getstate__(),
+            getattr(self, '_element_name', None),
+            getattr(self, '_date_time', None)
+        )
+
+    def __setstate__(self, state):
+        (base_state, element_name, date_time) = state
+        super().__setstate__(base_state)
+        if element_name is not None:
+            self._element_name = element_name
+        if date_time is not None:
+            self._date_time = date_time
+
+    @classmethod
+    def from_dict(cls, data):
+        obj = super().from_dict(data)
+        if obj._text is not None:
+            obj._date_time = obj._text
+        return obj
+
 
 class EmptyStringType(BaseObject):
     """
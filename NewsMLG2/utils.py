@@ -3,7 +3,17 @@ Generic utils used by other classes
 """
 
 from importlib import import_module
-from .catalogstore import CATALOG_STORE
+from .catalogstore import (
+    CATALOG_STORE, AliasNotFoundInCatalogs, CodesNotFoundInCatalogs,
+    URINotFoundInCatalogs
+)
+
+# Maximum number of resolved codes remembered by qcodes_to_uris() and
+# uris_to_qcodes() for each set of catalogs
+CODE_CACHE_SIZE = 8192
+
+# stands for codes not yet in the cache of _resolve_codes()
+_NOT_CACHED = object()
 
 
 def import_string(dotted_path):
@@ -25,27 +35,118 @@ def import_string(dotted_path):
             module_path, class_name)
         ) from err
 
-def qcode_to_uri(qcode):
+def qcode_to_uri(qcode, catalogs=None):
     """
     Return the value of this property as a URI by looking up the
-    qcode's prefix in the catalog
+    qcode's prefix in the catalog.
+    `catalogs` is the CatalogStore to use, e.g. from item.get_catalogs();
+    by default the catalogs of the most recently parsed item.
     """
+    if catalogs is None:
+        catalogs = CATALOG_STORE
     alias, code = qcode.split(':')
     # get catalog
-    scheme = CATALOG_STORE.get_scheme_for_alias(alias)
+    scheme = catalogs.get_scheme_for_alias(alias)
     # look up catalog for alias, get URI
     uri = scheme.uri
     return uri + code
 
-def uri_to_qcode(uri):
+def uri_to_qcode(uri, catalogs=None):
     """
     Return the value of this property as a qcode by looking up the
-    URI's prefix in the catalog
+    URI's prefix in the catalog.
+    `catalogs` is the CatalogStore to use, e.g. from item.get_catalogs();
+    by default the catalogs of the most recently parsed item.
     """
-    # convert URI to qcode:
-    urimainpart, code = uri.rsplit('/', 1)
-    # get catalog - we need to put the slash back
-    scheme = CATALOG_STORE.get_scheme_for_uri(urimainpart+'/')
+    if catalogs is None:
+        catalogs = CATALOG_STORE
+    # find the scheme with the longest URI that the URI starts with
+    scheme, code = catalogs.find_scheme_for_uri(uri)
     # look up catalog for URI, get prefix
     alias = scheme.alias
     return alias + ':' + code
+
+def _find_uri_for_qcode(qcode, catalogs):
+    """
+    qcode_to_uri() for qcodes_to_uris(): None if the qcode is malformed or
+    its alias is not in the catalogs.
+    """
+    (alias, separator, code) = qcode.partition(':')
+    if not separator or ':' in code:
+        return None
+    try:
+        scheme = catalogs.get_scheme_for_alias(alias)
+    except AliasNotFoundInCatalogs:
+        return None
+    return scheme.uri + code
+
+def _find_qcode_for_uri(uri, catalogs):
+    """
+    uri_to_qcode() for uris_to_qcodes(): None if no scheme URI in the
+    catalogs is a prefix of the URI.
+    """
+    try:
+        (scheme, code) = catalogs.find_scheme_for_uri(uri)
+    except URINotFoundInCatalogs:
+        return None
+    return scheme.alias + ':' + code
+
+def _resolve_codes(resolve, cache_name, codes, catalogs):
+    """
+    Resolve a batch of codes, raising CodesNotFoundInCatalogs for all the
+    codes that could not be resolved once the batch is done. Results are
+    cached for the catalogs (see CatalogStore.get_code_cache()), so they
+    are shared by all items using the same catalogs and dropped when a
+    catalog changes. The least recently used results are dropped once
+    there are CODE_CACHE_SIZE of them.
+    """
+    if catalogs is None:
+        catalogs = CATALOG_STORE
+    # resolve the whole batch with the catalogs current when it started
+    catalogs = catalogs.snapshot()
+    cache = catalogs.get_code_cache(cache_name)
+    get_cached = cache.get
+    move_to_end = cache.move_to_end
+    results = []
+    unresolved = []
+    for code in codes:
+        result = get_cached(code, _NOT_CACHED)
+        if result is _NOT_CACHED:
+            result = resolve(code, catalogs)
+            cache[code] = result
+            if len(cache) > CODE_CACHE_SIZE:
+                try:
+                    cache.popitem(last=False)
+                except KeyError:
+                    # emptied by another thread
+                    pass
+        else:
+            try:
+                move_to_end(code)
+            except KeyError:
+                # dropped by another thread in the meantime
+                pass
+        results.append(result)
+        if result is None:
+            unresolved.append(code)
+    if unresolved:
+        raise CodesNotFoundInCatalogs(unresolved, results)
+    return results
+
+def qcodes_to_uris(qcodes, catalogs=None):
+    """
+    Return the list of URIs for an iterable of qcodes, as qcode_to_uri().
+    Recently resolved qcodes are cached for each set of catalogs. If any
+    qcodes can't be resolved, CodesNotFoundInCatalogs is raised once all
+    the qcodes have been tried, listing all of them.
+    """
+    return _resolve_codes(_find_uri_for_qcode, 'qcode_uris', qcodes, catalogs)
+
+def uris_to_qcodes(uris, catalogs=None):
+    """
+    Return the list of qcodes for an iterable of URIs, as uri_to_qcode().
+    Recently resolved URIs are cached for each set of catalogs. If any URIs
+    can't be resolved, CodesNotFoundInCatalogs is raised once all the URIs
+    have been tried, listing all of them.
+    """
+    return _resolve_codes(_find_qcode_for_uri, 'uri_qcodes', uris, catalogs)
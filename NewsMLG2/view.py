@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+
+"""
+Read-only views over a parsed NewsML-G2 document.
+
+Views answer the same dot-syntax lookups as NewsML-G2 objects, e.g.
+`newsitem.itemmeta.itemclass.qcode`, directly from the lxml tree using the
+class declarations. No objects are built for the document and a view holds
+nothing but its lxml element, so scanning documents costs little more than
+parsing the XML.
+"""
+
+from lxml import etree
+
+from .document import ROOT_CLASSES
+
+
+class ElementView():
+    """
+    Read-only view of an XML element as an instance of a NewsML-G2 class.
+    The view of an element that isn't present in the document has no
+    xmlelement: its attributes are None (or their defaults) and it is False
+    in a boolean context.
+    """
+    __slots__ = ('_xmlelement', '_descriptor')
+
+    def __init__(self, xmlelement, element_class):
+        self._xmlelement = xmlelement
+        self._descriptor = element_class.get_descriptor()
+
+    def __getattr__(self, name):
+        """
+        Return the view of a child element, or the value of an attribute,
+        declared by the NewsML-G2 class.
+        """
+        if name.startswith('_'):
+            raise AttributeError(
+                "'" + self.__class__.__name__ + "' object has no attribute '" +
+                name + "'"
+            )
+        descriptor = self._descriptor
+        element_class = descriptor.element_classes.get(name)
+        if element_class is not None:
+            tag = descriptor.element_tags[name]
+            if name in descriptor.array_element_ids:
+                if self._xmlelement is None:
+                    return ArrayView([], element_class)
+                return ArrayView(
+                    list(self._xmlelement.iterchildren(tag)), element_class
+                )
+            child = None
+            if self._xmlelement is not None:
+                child = self._xmlelement.find(tag)
+            return ElementView(child, element_class)
+        attribute_definition = descriptor.attributes.get(name)
+        if attribute_definition is not None:
+            value = None
+            if self._xmlelement is not None:
+                value = self._xmlelement.get(attribute_definition['xml_name'])
+            if value is None:
+                return attribute_definition.get('default')
+            return value
+        raise AttributeError(
+            "'" + descriptor.cls.__name__ +
+            "' has no element or attribute '" + name + "'"
+        )
+
+    def __setattr__(self, name, value):
+        if name.startswith('_'):
+            super().__setattr__(name, value)
+            return
+        raise AttributeError(
+            "'" + self.__class__.__name__ + "' is read-only"
+        )
+
+    def get_element_class(self):
+        """
+        Return the NewsML-G2 class this element is viewed as.
+        """
+        return self._descriptor.cls
+
+    def get_text(self):
+        """
+        Return the text of the element, with whitespace normalised as it is
+        in NewsML-G2 objects; or None if the element has no text.
+        """
+        if self._xmlelement is None or self._xmlelement.text is None:
+            return None
+        return " ".join(self._xmlelement.text.split())
+
+    def to_object(self):
+        """
+        Build the NewsML-G2 object for this element.
+        """
+        if self._xmlelement is None:
+            return self._descriptor.cls()
+        return self._descriptor.cls(xmlelement=self._xmlelement)
+
+    def __bool__(self):
+        """
+        The same as bool() of the NewsML-G2 object for this element.
+        """
+        xmlelement = self._xmlelement
+        if xmlelement is None:
+            return False
+        if self._descriptor.element_definitions or self.get_text():
+            return True
+        return any(
+            xmlelement.get(attribute_definition['xml_name'])
+            for attribute_definition in self._descriptor.attributes.values()
+        )
+
+    def __str__(self):
+        text = self.get_text()
+        if text:
+            return text
+        class_name = self._descriptor.cls.__name__
+        attributes = self._descriptor.attributes
+        if 'qcode' in attributes and self.qcode:
+            return '<'+class_name+' qcode="'+str(self.qcode)+'">'
+        if 'uri' in attributes and self.uri:
+            return '<'+class_name+' uri="'+str(self.uri)+'">'
+        return '<'+class_name+'>'
+
+
+class ArrayView():
+    """
+    Read-only view of a repeating element, the counterpart of GenericArray.
+    """
+    __slots__ = ('_xmlelements', '_element_class')
+
+    def __init__(self, xmlelements, element_class):
+        self._xmlelements = xmlelements
+        self._element_class = element_class
+
+    def __iter__(self):
+        for xmlelement in self._xmlelements:
+            yield ElementView(xmlelement, self._element_class)
+
+    def __len__(self):
+        return len(self._xmlelements)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return [
+                ElementView(xmlelement, self._element_class)
+                for xmlelement in self._xmlelements[item]
+            ]
+        return ElementView(self._xmlelements[item], self._element_class)
+
+    def __str__(self):
+        """
+        As for GenericArray, the str() of an array with only one element is
+        the str() of that element.
+        """
+        if len(self._xmlelements) == 1:
+            return str(self[0])
+        return (
+            '<' + self.__class__.__name__ + ' of ' +
+            str(len(self._xmlelements)) + ' ' +
+            self._element_class.__name__ +' objects>'
+        )
+
+    def __getattr__(self, name):
+        """
+        As for GenericArray, properties of an array with only one element
+        are those of that element.
+        """
+        if name.startswith('_'):
+            raise AttributeError(
+                "'" + self.__class__.__name__ + "' object has no attribute '" +
+                name + "'"
+            )
+        if len(self._xmlelements) == 1:
+            return getattr(self[0], name)
+        raise AttributeError(
+            "'" + self.__class__.__name__ + "'" +
+            " has more than one element, shortcut property accessor failed"
+        )
+
+    def __bool__(self):
+        return any(bool(item) for item in self)
+
+    def get_languages(self):
+        """
+        For repeating elements with xml:lang attributes,
+        this helper function returns all available language codes.
+        """
+        return [elem.xml_lang for elem in self]
+
+    def get_for_language(self, language):
+        """
+        For repeating elements with xml:lang attributes,
+        this helper function finds the correct language version.
+        """
+        for elem in self:
+            if elem.xml_lang == language:
+                return elem
+        return None
+
+
+class NewsMLG2DocumentView():
+    """
+    Read-only alternative to NewsMLG2Document: parse a NewsML-G2 document
+    and return views of its elements instead of NewsML-G2 objects.
+    """
+    _root_element = None
+    item = None
+
+    def __init__(self, filename_or_string):
+        """
+        Parse a NewsML-G2 document from a filename or a bytes string.
+        """
+        if isinstance(filename_or_string, str):
+            self._root_element = etree.parse(filename_or_string).getroot()
+        elif isinstance(filename_or_string, bytes):
+            self._root_element = etree.fromstring(filename_or_string)
+        if self._root_element is not None:
+            item_class = ROOT_CLASSES.get(self._root_element.tag)
+            if item_class is None:
+                raise Exception(
+                    "Root element is not a NewsML-G2 specified document root."
+                )
+            self.item = ElementView(self._root_element, item_class)
+
+    def get_item(self):
+        """
+        Return the view of the main item (NewsItem, KnowledgeItem etc) of
+        this document.
+        """
+        return self.item
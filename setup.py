@@ -0,0 +1,35 @@
+#!/usr/bin/env python
+
+"""
+The project is declared in pyproject.toml. This only extends the build so
+that the index of each bundled catalog (see tools/build_catalog_index.py) is
+generated in the built package; indexes aren't kept in the source tree.
+"""
+
+import glob
+import os
+import sys
+
+from setuptools import setup
+from setuptools.command.build_py import build_py
+
+
+class BuildPyWithCatalogIndexes(build_py):
+    """
+    Copy the package as usual, then write the index of each catalog copied
+    to NewsMLG2/catalogs.
+    """
+    def run(self):
+        super().run()
+        if getattr(self, 'editable_mode', False):
+            # editable installs use the source tree, where catalogs without
+            # an index are loaded from their XML
+            return
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        from NewsMLG2.catalog import write_catalog_index
+        catalogs_dirname = os.path.join(self.build_lib, 'NewsMLG2', 'catalogs')
+        for filename in sorted(glob.glob(os.path.join(catalogs_dirname, '*.xml'))):
+            write_catalog_index(filename)
+
+
+setup(cmdclass={'build_py': BuildPyWithCatalogIndexes})
@@ -51,5 +51,175 @@ class TestNewsMLG2NewsItemStrings(unittest.TestCase):
         with self.assertRaises(Exception):
             g2doc = NewsMLG2.NewsMLG2Document(string='<foo></foo>')
 
+    def test_class_descriptor_is_shared(self):
+        item1 = NewsMLG2.NewsItem()
+        item2 = NewsMLG2.NewsItem()
+        assert item1.get_descriptor() is item2.get_descriptor()
+        assert item1.get_element_definitions() is item2.get_element_definitions()
+        assert item1.get_attribute_definitions() is item2.get_attribute_definitions()
+
+    def test_class_descriptor_per_subclass(self):
+        anyitem_descriptor = NewsMLG2.AnyItem.get_descriptor()
+        newsitem_descriptor = NewsMLG2.NewsItem.get_descriptor()
+        assert anyitem_descriptor is not newsitem_descriptor
+        assert 'contentset' in newsitem_descriptor.element_classes
+        assert 'contentset' not in anyitem_descriptor.element_classes
+        assert newsitem_descriptor.xml_tag == NewsMLG2.NEWSMLG2NSPREFIX + 'newsItem'
+        assert (newsitem_descriptor.element_tags['itemmeta']
+                == NewsMLG2.NEWSMLG2NSPREFIX + 'itemMeta')
+
+    def test_class_descriptor_resolves_string_classes(self):
+        # Hop declares its 'party' element class as a string
+        descriptor = NewsMLG2.Hop.get_descriptor()
+        assert descriptor.element_classes['party'] is NewsMLG2.Party
+        xmlelement = etree.fromstring(
+            '<hop xmlns="http://iptc.org/std/nar/2006-10-01/">'
+            '<party qcode="nprov:IPTC"/></hop>'
+        )
+        hop = NewsMLG2.Hop(xmlelement=xmlelement)
+        assert hop.party[0].qcode == 'nprov:IPTC'
+
+    def test_single_pass_child_dispatch(self):
+        xmlelement = etree.fromstring(
+            '<published xmlns="http://iptc.org/std/nar/2006-10-01/"'
+            ' xmlns:x="http://example.com/x">'
+            '<name>one</name><timestamp>2020-06-22</timestamp><foo/>'
+            '<!-- comment --><name>two</name><x:bar/></published>'
+        )
+        published = NewsMLG2.Published(xmlelement=xmlelement)
+        assert str(published.timestamp) == '2020-06-22'
+        assert [str(name) for name in published.name] == ['one', 'two']
+        assert len(published.related) == 0
+        assert list(published.get_extension_elements()) == ['extension_foo']
+        assert [elem.tag for elem in published._xs_any_content] == [
+            '{http://example.com/x}bar'
+        ]
+
+    def test_objects_have_no_instance_dict(self):
+        newsitem = NewsMLG2.NewsItem()
+        assert not hasattr(newsitem, '__dict__')
+        array = NewsMLG2.GenericArray(xmlarray=[], element_class=NewsMLG2.Name)
+        assert not hasattr(array, '__dict__')
+        with self.assertRaises(AttributeError):
+            newsitem._not_a_slot = True
+
+    def test_attribute_values_stored_positionally(self):
+        subject = NewsMLG2.Subject()
+        assert subject.qcode is None
+        subject.type = 'cpnat:abstract'
+        subject.qcode = 'medtop:04000000'
+        subject.id = 'subj1'
+        subject.qcode = 'medtop:20000523'
+        assert subject.qcode == 'medtop:20000523'
+        assert subject.type == 'cpnat:abstract'
+        assert subject.id == 'subj1'
+        assert len(subject._attribute_values) == 3
+        # serialised in declaration order, regardless of the order of assignment
+        xml = subject.to_xml()
+        declared_order = [
+            attr_defn['xml_name']
+            for attr_defn in subject.get_attribute_definitions().values()
+        ]
+        assert list(xml.attrib) == sorted(xml.attrib, key=declared_order.index)
+        assert xml.get('qcode') == 'medtop:20000523'
+        assert xml.get('type') == 'cpnat:abstract'
+        assert xml.get('id') == 'subj1'
+
+    def test_shared_empty_arrays_are_read_only(self):
+        xml = (
+            '<itemMeta xmlns="http://iptc.org/std/nar/2006-10-01/">'
+            '<itemClass qcode="ninat:text"/></itemMeta>'
+        )
+        itemmeta1 = NewsMLG2.ItemMeta(xmlelement=etree.fromstring(xml))
+        itemmeta2 = NewsMLG2.ItemMeta(xmlelement=etree.fromstring(xml))
+        assert itemmeta1.signal is itemmeta2.signal
+        with self.assertRaises(TypeError):
+            itemmeta1.signal[0:0] = [NewsMLG2.Signal()]
+        with self.assertRaises(TypeError):
+            del itemmeta1.signal[:]
+        signal = NewsMLG2.Signal()
+        signal.qcode = 'sig:update'
+        itemmeta1.signal = NewsMLG2.GenericArray(
+            xmlarray=[signal], element_class=NewsMLG2.Signal
+        )
+        assert len(itemmeta1.signal) == 1
+        assert len(itemmeta2.signal) == 0
+        assert len(NewsMLG2.ItemMeta(xmlelement=etree.fromstring(xml)).signal) == 0
+        assert b'signal' not in etree.tostring(itemmeta2.to_xml())
+
+
+def object_graph(value):
+    """
+    Return a comparable representation of a parsed object graph.
+    """
+    if isinstance(value, NewsMLG2.GenericArray):
+        return ('array', [object_graph(item) for item in value])
+    if isinstance(value, NewsMLG2.BaseObject):
+        return (
+            type(value).__name__,
+            value._attribute_mask,
+            value._attribute_values,
+            value._text,
+            value._lazy,
+            [(element_id, object_graph(element_value))
+             for (element_id, element_value) in value._element_values.items()],
+            [(name, extension._xmlelement)
+             for (name, extension) in value._extension_elements.items()],
+            list(value._xs_any_content),
+        )
+    return value
+
+
+class TestNewsMLG2SpecializedParsers(unittest.TestCase):
+
+    test_files = [
+        '001_simplest_file.xml',
+        '008_roundtrip_test.xml',
+        'LISTING_1_A_NewsML-G2_News_Item.xml',
+        'LISTING_6_Simple_NewsML-G2_Package.xml',
+        'LISTING_13_Complete_Catalog_Item.xml',
+    ]
+
+    def tearDown(self):
+        NewsMLG2.disable_specialized_parsers()
+
+    def parse_both(self, filename, lazy=False):
+        test_newsmlg2_file = os.path.join('tests', 'test_files', filename)
+        root = etree.parse(test_newsmlg2_file).getroot()
+        item_class = type(NewsMLG2.NewsMLG2Document(test_newsmlg2_file).get_item())
+        NewsMLG2.disable_specialized_parsers()
+        generic = item_class(xmlelement=root, lazy=lazy)
+        NewsMLG2.enable_specialized_parsers()
+        specialized = item_class(xmlelement=root, lazy=lazy)
+        return generic, specialized
+
+    def test_specialized_parsers_build_same_object_graph(self):
+        for filename in self.test_files:
+            generic, specialized = self.parse_both(filename)
+            assert object_graph(specialized) == object_graph(generic), filename
+
+    def test_specialized_parsers_lazy(self):
+        for filename in self.test_files:
+            generic, specialized = self.parse_both(filename, lazy=True)
+            assert object_graph(specialized) == object_graph(generic), filename
+            assert specialized.to_xml_string() == generic.to_xml_string()
+
+    def test_specialized_parser_is_cached(self):
+        NewsMLG2.enable_specialized_parsers()
+        descriptor = NewsMLG2.Name.get_descriptor()
+        parser = descriptor.get_parser()
+        assert descriptor.get_parser() is parser
+        assert 'def parse(self, xmlelement, lazy):' in parser.source
+        NewsMLG2.disable_specialized_parsers()
+        assert descriptor.get_parser() is not parser
+
+    def test_specialized_parser_output(self):
+        NewsMLG2.enable_specialized_parsers()
+        test_newsmlg2_file = os.path.join('tests', 'test_files', 'LISTING_1_A_NewsML-G2_News_Item.xml')
+        specialized_output = NewsMLG2.NewsMLG2Document(test_newsmlg2_file).to_xml_string()
+        NewsMLG2.disable_specialized_parsers()
+        generic_output = NewsMLG2.NewsMLG2Document(test_newsmlg2_file).to_xml_string()
+        assert specialized_output == generic_output
+
 if __name__ == '__main__':
     unittest.main()
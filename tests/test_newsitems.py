@@ -30,8 +30,11 @@ NewsML-G2 Python library - NewsItem unit tests
 """
 
 from lxml import etree
+import contextlib
+import io
 import os
 import sys
+import time
 import unittest
 sys.path.append(os.getcwd())
 
@@ -746,5 +749,636 @@ class TestNewsMLG2NewsItemFromCode(unittest.TestCase):
         assert newsitem.catalog.scheme[0].alias == 'baz'
 
 
+class TestNewsMLG2NewsItemAbsentElements(unittest.TestCase):
+
+    def test_absent_single_element_not_built_until_accessed(self):
+        test_newsmlg2_file = os.path.join('tests', 'test_files', '001_simplest_file.xml')
+        g2doc = NewsMLG2.NewsMLG2Document(test_newsmlg2_file)
+        newsitem = g2doc.get_item()
+        assert not isinstance(
+            newsitem._element_values['pubhistory'], NewsMLG2.BaseObject
+        )
+        pubhistory = newsitem.pubhistory
+        assert isinstance(pubhistory, NewsMLG2.PubHistory)
+        assert not pubhistory
+        assert str(pubhistory) == '<PubHistory>'
+        assert newsitem.pubhistory is pubhistory
+
+    def test_modify_absent_element_keeps_schema_order(self):
+        test_newsmlg2_file = os.path.join('tests', 'test_files', '001_simplest_file.xml')
+        g2doc = NewsMLG2.NewsMLG2Document(test_newsmlg2_file)
+        itemmeta = g2doc.get_item().itemmeta
+        assert itemmeta.pubstatus.qcode is None
+        itemmeta.pubstatus.qcode = 'stat:usable'
+        itemmeta.firstcreated = '2020-06-22T11:00:00+03:00'
+        output_xml = g2doc.to_xml_string()
+        assert (
+            '    <versionCreated>2020-06-22T12:00:00+03:00</versionCreated>\n'
+            '    <firstCreated>2020-06-22T11:00:00+03:00</firstCreated>\n'
+            '    <pubStatus qcode="stat:usable"/>\n'
+            '  </itemMeta>\n'
+        ) in output_xml
+
+
+class TestNewsMLG2NewsItemLazy(unittest.TestCase):
+
+    def test_lazy_children_built_on_access(self):
+        test_newsmlg2_file = os.path.join('tests', 'test_files', 'LISTING_1_A_NewsML-G2_News_Item.xml')
+        g2doc = NewsMLG2.NewsMLG2Document(test_newsmlg2_file, lazy=True)
+
+        newsitem = g2doc.get_item()
+        assert newsitem.guid == 'urn:newsml:acmenews.com:20161018:US-FINANCE-FED'
+        # contentMeta hasn't been accessed so no object has been built for it
+        assert not isinstance(
+            newsitem._element_values['contentmeta'], NewsMLG2.BaseObject
+        )
+        contentmeta = newsitem.contentmeta
+        assert isinstance(contentmeta, NewsMLG2.NewsItemContentMeta)
+        assert newsitem._element_values['contentmeta'] is contentmeta
+        assert str(contentmeta.headline) == 'Fed to halt QE to avert "bubble"'
+        assert contentmeta.subject[1].name.get_for_language('de').xml_lang == 'de'
+        assert newsitem.itemmeta.pubstatus.qcode == 'stat:usable'
+
+    def test_lazy_output_matches_eager(self):
+        test_newsmlg2_file = os.path.join('tests', 'test_files', 'LISTING_1_A_NewsML-G2_News_Item.xml')
+        eager_doc = NewsMLG2.NewsMLG2Document(test_newsmlg2_file)
+        lazy_doc = NewsMLG2.NewsMLG2Document(test_newsmlg2_file, lazy=True)
+        assert lazy_doc.to_xml_string() == eager_doc.to_xml_string()
+
+
+class TestNewsMLG2NewsItemView(unittest.TestCase):
+    test_newsmlg2_file = os.path.join('tests', 'test_files', 'LISTING_1_A_NewsML-G2_News_Item.xml')
+
+    def test_view_properties(self):
+        newsitem = NewsMLG2.NewsMLG2DocumentView(self.test_newsmlg2_file).get_item()
+        assert newsitem.get_element_class() is NewsMLG2.NewsItem
+        assert newsitem.guid == 'urn:newsml:acmenews.com:20161018:US-FINANCE-FED'
+        assert newsitem.itemmeta.itemclass.qcode == 'ninat:text'
+        assert str(newsitem.itemmeta.versioncreated) == '2018-10-21T16:25:32-05:00'
+        contentmeta = newsitem.contentmeta
+        assert str(contentmeta.headline) == 'Fed to halt QE to avert "bubble"'
+        assert len(contentmeta.subject) == 2
+        assert contentmeta.subject[1].name.get_for_language('de').xml_lang == 'de'
+        assert contentmeta.subject[1].get_element_class() is NewsMLG2.Subject
+
+    def test_view_absent_elements(self):
+        newsitem = NewsMLG2.NewsMLG2DocumentView(self.test_newsmlg2_file).get_item()
+        assert not newsitem.itemmeta.role
+        assert newsitem.itemmeta.role.get_text() is None
+        assert newsitem.itemmeta.role.qcode is None
+        assert str(newsitem.itemmeta.role) == '<Role>'
+        assert not newsitem.itemmeta.generator
+        assert len(newsitem.partmeta) == 0
+        # defaults are returned as for objects
+        assert newsitem.version == '11'
+        empty_newsitem = NewsMLG2.ElementView(
+            etree.fromstring(b'<newsItem xmlns="http://iptc.org/std/nar/2006-10-01/"/>'),
+            NewsMLG2.NewsItem
+        )
+        assert empty_newsitem.version == '1'
+        assert empty_newsitem.guid is None
+
+    def test_view_matches_objects(self):
+        newsitem_view = NewsMLG2.NewsMLG2DocumentView(self.test_newsmlg2_file).get_item()
+        newsitem = NewsMLG2.NewsMLG2Document(self.test_newsmlg2_file).get_item()
+        for subject, subject_view in zip(newsitem.contentmeta.subject,
+                                         newsitem_view.contentmeta.subject):
+            assert subject.qcode == subject_view.qcode
+            assert subject.type == subject_view.type
+            assert str(subject) == str(subject_view)
+            assert bool(subject) == bool(subject_view)
+        assert newsitem_view.to_object().to_xml_string() == newsitem.to_xml_string()
+
+    def test_view_is_read_only(self):
+        newsitem = NewsMLG2.NewsMLG2DocumentView(self.test_newsmlg2_file).get_item()
+        with self.assertRaises(AttributeError):
+            newsitem.guid = 'foo'
+        with self.assertRaises(AttributeError):
+            newsitem.foo
+
+
+class TestNewsMLG2NewsItemElementClasses(unittest.TestCase):
+    test_newsmlg2_file = os.path.join('tests', 'test_files', 'LISTING_1_A_NewsML-G2_News_Item.xml')
+
+    def test_typed_tree(self):
+        newsitem = NewsMLG2.parse_typed_tree(self.test_newsmlg2_file)
+        assert isinstance(newsitem, NewsMLG2.NewsMLG2Element)
+        assert isinstance(newsitem, etree._Element)
+        assert newsitem.get_element_class() is NewsMLG2.NewsItem
+        assert isinstance(newsitem.itemmeta, NewsMLG2.get_lxml_element_class(NewsMLG2.ItemMeta))
+        assert newsitem.guid == 'urn:newsml:acmenews.com:20161018:US-FINANCE-FED'
+        assert newsitem.itemmeta.itemclass.qcode == 'ninat:text'
+        assert str(newsitem.itemmeta.versioncreated) == '2018-10-21T16:25:32-05:00'
+        assert str(newsitem.contentmeta.headline[0]) == 'Fed to halt QE to avert "bubble"'
+
+    def test_tags_declared_with_several_classes(self):
+        # <subject> and <name> are declared with different classes in
+        # different parents, their class is found from the parent element
+        newsitem = NewsMLG2.parse_typed_tree(self.test_newsmlg2_file)
+        subjects = newsitem.contentmeta.subject
+        assert len(subjects) == 2
+        assert subjects[1].get_element_class() is NewsMLG2.Subject
+        assert subjects[1].name[1].get_element_class() is NewsMLG2.Name
+        assert subjects[1].name[1].xml_lang == 'de'
+
+    def test_missing_elements_and_defaults(self):
+        newsitem = NewsMLG2.parse_typed_tree(
+            b'<newsItem xmlns="http://iptc.org/std/nar/2006-10-01/"><itemMeta/></newsItem>'
+        )
+        assert newsitem.version == '1'
+        assert newsitem.guid is None
+        assert newsitem.itemmeta
+        assert newsitem.itemmeta.pubstatus is None
+        assert newsitem.itemmeta.link == []
+        with self.assertRaises(AttributeError):
+            newsitem.foo
+
+    def test_typed_tree_to_object(self):
+        newsitem = NewsMLG2.parse_typed_tree(self.test_newsmlg2_file).to_object()
+        g2doc = NewsMLG2.NewsMLG2Document(self.test_newsmlg2_file)
+        assert newsitem.to_xml_string() == g2doc.get_item().to_xml_string()
+
+
+def newsitem_with_local_catalog(scheme_uri):
+    """
+    Return a newsItem declaring the alias "ex" for `scheme_uri`.
+    """
+    return (
+        b'<newsItem xmlns="http://iptc.org/std/nar/2006-10-01/" guid="catalog-test">'
+        b'<catalog><scheme alias="ex" uri="' + scheme_uri + b'"/></catalog>'
+        b'<itemMeta><itemClass qcode="ex:text"/></itemMeta>'
+        b'</newsItem>'
+    )
+
+
+class TestNewsMLG2NewsItemCatalogContext(unittest.TestCase):
+
+    def test_items_keep_their_own_catalogs(self):
+        item_a = NewsMLG2.NewsMLG2Document(
+            newsitem_with_local_catalog(b'http://example.com/a/')
+        ).get_item()
+        item_b = NewsMLG2.NewsMLG2Document(
+            newsitem_with_local_catalog(b'http://example.com/b/')
+        ).get_item()
+        assert NewsMLG2.qcode_to_uri('ex:text', item_a.get_catalogs()) == 'http://example.com/a/text'
+        assert NewsMLG2.qcode_to_uri('ex:text', item_b.get_catalogs()) == 'http://example.com/b/text'
+        assert NewsMLG2.uri_to_qcode('http://example.com/a/text', item_a.get_catalogs()) == 'ex:text'
+        with self.assertRaises(NewsMLG2.URINotFoundInCatalogs):
+            NewsMLG2.uri_to_qcode('http://example.com/a/text', item_b.get_catalogs())
+        # without a catalog store, the most recently parsed item's catalogs are used
+        assert NewsMLG2.qcode_to_uri('ex:text') == 'http://example.com/b/text'
+
+    def test_schemes_built_on_demand(self):
+        item = NewsMLG2.NewsMLG2Document(
+            b'<newsItem xmlns="http://iptc.org/std/nar/2006-10-01/" guid="catalog-test">'
+            b'<catalog>'
+            b'<scheme alias="ex1" uri="http://example.com/1/"><name>One</name></scheme>'
+            b'<scheme alias="ex2" uri="http://example.com/2/"><name>Two</name></scheme>'
+            b'</catalog>'
+            b'</newsItem>'
+        ).get_item()
+        catalog = item.get_catalogs()[0]
+        assert isinstance(catalog._catalog[1], etree._Element)
+        scheme = catalog.get_scheme_for_alias('ex2')
+        assert str(scheme.name) == 'Two'
+        assert isinstance(catalog._catalog[0], etree._Element)
+        assert catalog.get_scheme_for_uri('http://example.com/2/') is scheme
+        # the "scheme" array holds the same objects
+        assert catalog.scheme[1] is scheme
+        assert [scheme.alias for scheme in catalog] == ['ex1', 'ex2']
+        assert catalog[-1] is scheme
+
+    def test_catalog_precedence(self):
+        item = NewsMLG2.NewsMLG2Document(
+            b'<newsItem xmlns="http://iptc.org/std/nar/2006-10-01/" guid="catalog-test">'
+            b'<catalogRef href="http://www.iptc.org/std/catalog/catalog.IPTC-G2-Standards_41.xml" />'
+            b'<catalog><scheme alias="ninat" uri="http://example.com/ninat/"/></catalog>'
+            b'<catalog><scheme alias="ninat" uri="http://example.com/other/"/>'
+            b'<scheme alias="ex" uri="http://example.com/ex/"/></catalog>'
+            b'</newsItem>'
+        ).get_item()
+        catalogs = item.get_catalogs()
+        assert len(catalogs) == 3
+        # local catalogs come first, in document order
+        assert NewsMLG2.qcode_to_uri('ninat:text', catalogs) == 'http://example.com/ninat/text'
+        assert NewsMLG2.qcode_to_uri('ex:text', catalogs) == 'http://example.com/ex/text'
+        assert NewsMLG2.qcode_to_uri('nprov:IPTC', catalogs) == 'http://cv.iptc.org/newscodes/newsprovider/IPTC'
+        assert NewsMLG2.uri_to_qcode('http://example.com/other/text', catalogs) == 'ninat:text'
+        with self.assertRaises(NewsMLG2.AliasNotFoundInCatalogs):
+            NewsMLG2.qcode_to_uri('undeclared:text', catalogs)
+
+    def test_uri_to_qcode_longest_scheme(self):
+        item = NewsMLG2.NewsMLG2Document(
+            b'<newsItem xmlns="http://iptc.org/std/nar/2006-10-01/" guid="catalog-test">'
+            b'<catalog>'
+            b'<scheme alias="ex" uri="http://example.com/codes/"/>'
+            b'<scheme alias="exsub" uri="http://example.com/codes/sub/"/>'
+            b'<scheme alias="exhash" uri="http://example.com/vocab#"/>'
+            b'</catalog>'
+            b'</newsItem>'
+        ).get_item()
+        catalogs = item.get_catalogs()
+        assert NewsMLG2.uri_to_qcode('http://example.com/codes/one', catalogs) == 'ex:one'
+        assert NewsMLG2.uri_to_qcode('http://example.com/codes/sub/two', catalogs) == 'exsub:two'
+        assert NewsMLG2.uri_to_qcode('http://example.com/codes/a/b', catalogs) == 'ex:a/b'
+        assert NewsMLG2.uri_to_qcode('http://example.com/vocab#three', catalogs) == 'exhash:three'
+        scheme, code = catalogs.find_scheme_for_uri('http://example.com/codes/sub/two')
+        assert scheme.alias == 'exsub'
+        assert code == 'two'
+        with self.assertRaises(NewsMLG2.URINotFoundInCatalogs):
+            NewsMLG2.uri_to_qcode('http://example.com/other/one', catalogs)
+
+    def test_batch_resolution(self):
+        item = NewsMLG2.NewsMLG2Document(
+            newsitem_with_local_catalog(b'http://example.com/a/')
+        ).get_item()
+        catalogs = item.get_catalogs()
+        assert NewsMLG2.qcodes_to_uris(['ex:one', 'ex:two'], catalogs) == [
+            'http://example.com/a/one', 'http://example.com/a/two'
+        ]
+        assert NewsMLG2.uris_to_qcodes(iter(['http://example.com/a/one']), catalogs) == ['ex:one']
+        with self.assertRaises(NewsMLG2.CodesNotFoundInCatalogs) as context:
+            NewsMLG2.qcodes_to_uris(['ex:one', 'other:two', 'malformed', 'ex:three'], catalogs)
+        assert context.exception.codes == ['other:two', 'malformed']
+        assert context.exception.results == [
+            'http://example.com/a/one', None, None, 'http://example.com/a/three'
+        ]
+        # cached results are not used once the catalog store has changed
+        assert NewsMLG2.qcodes_to_uris(['ex:one']) == ['http://example.com/a/one']
+        NewsMLG2.NewsMLG2Document(newsitem_with_local_catalog(b'http://example.com/b/'))
+        assert NewsMLG2.qcodes_to_uris(['ex:one']) == ['http://example.com/b/one']
+
+    def test_batch_results_least_recently_used_dropped(self):
+        from unittest import mock
+        NewsMLG2.NewsMLG2Document(newsitem_with_local_catalog(b'http://example.com/lru/'))
+        cache = NewsMLG2.CATALOG_STORE.get_code_cache('qcode_uris')
+        with mock.patch('NewsMLG2.utils.CODE_CACHE_SIZE', 2):
+            NewsMLG2.qcodes_to_uris(['ex:one', 'ex:two'])
+            # using 'ex:one' again makes 'ex:two' the least recently used
+            NewsMLG2.qcodes_to_uris(['ex:one', 'ex:three'])
+            assert list(cache) == ['ex:one', 'ex:three']
+            NewsMLG2.qcodes_to_uris(['ex:four'])
+            assert list(cache) == ['ex:three', 'ex:four']
+        with self.assertRaises(ValueError):
+            NewsMLG2.CATALOG_STORE.get_code_cache('nonexistent')
+
+    def test_batch_results_shared_by_items(self):
+        test_newsmlg2_file = os.path.join('tests', 'test_files', '001_simplest_file.xml')
+        item_a = NewsMLG2.NewsMLG2Document(test_newsmlg2_file).get_item()
+        item_b = NewsMLG2.NewsMLG2Document(test_newsmlg2_file).get_item()
+        assert NewsMLG2.qcodes_to_uris(['nprov:IPTC'], item_a.get_catalogs()) == [
+            'http://cv.iptc.org/newscodes/newsprovider/IPTC'
+        ]
+        cache = item_b.get_catalogs().get_code_cache('qcode_uris')
+        assert cache['nprov:IPTC'] == 'http://cv.iptc.org/newscodes/newsprovider/IPTC'
+        # codes that aren't strings are errors, not unresolved codes
+        with self.assertRaises(AttributeError):
+            NewsMLG2.qcodes_to_uris([None], item_a.get_catalogs())
+
+    def test_concurrent_parsing(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        def parse_and_resolve(index):
+            scheme_uri = 'http://example.com/' + str(index) + '/'
+            item = NewsMLG2.NewsMLG2Document(
+                newsitem_with_local_catalog(scheme_uri.encode('utf-8'))
+            ).get_item()
+            return NewsMLG2.qcode_to_uri(
+                item.itemmeta.itemclass.qcode, item.get_catalogs()
+            ) == scheme_uri + 'text'
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            assert all(executor.map(parse_and_resolve, range(400)))
+
+    def test_global_catalogs_replaced_as_a_whole(self):
+        from concurrent.futures import ThreadPoolExecutor
+        store_a = NewsMLG2.CatalogStore([
+            NewsMLG2.NewsMLG2Document(
+                newsitem_with_local_catalog(b'http://example.com/a/')
+            ).get_item().get_catalogs()[0]
+        ])
+        store_b = NewsMLG2.CatalogStore([
+            NewsMLG2.NewsMLG2Document(
+                newsitem_with_local_catalog(b'http://example.com/b/')
+            ).get_item().get_catalogs()[0]
+        ])
+        expected = {'http://example.com/a/text', 'http://example.com/b/text'}
+
+        def swap(index):
+            NewsMLG2.catalog.set_global_catalogs(store_a if index % 2 else store_b)
+            # whichever catalogs are current, they are resolved together
+            # with their own index
+            return NewsMLG2.qcode_to_uri('ex:text') in expected
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            assert all(executor.map(swap, range(400)))
+
+    def test_global_catalogs_not_changed_when_rebuilding_items(self):
+        import pickle
+        item_a = NewsMLG2.NewsMLG2Document(
+            newsitem_with_local_catalog(b'http://example.com/a/')
+        ).get_item()
+        NewsMLG2.NewsMLG2Document(newsitem_with_local_catalog(b'http://example.com/b/'))
+        pickle.loads(pickle.dumps(item_a))
+        NewsMLG2.NewsItem.from_dict(item_a.to_dict())
+        # the most recently parsed item's catalogs are still the global ones
+        assert NewsMLG2.qcode_to_uri('ex:text') == 'http://example.com/b/text'
+
+    def test_built_in_catalogs_are_shared(self):
+        test_newsmlg2_file = os.path.join('tests', 'test_files', '001_simplest_file.xml')
+        item_a = NewsMLG2.NewsMLG2Document(test_newsmlg2_file).get_item()
+        item_b = NewsMLG2.NewsMLG2Document(test_newsmlg2_file).get_item()
+        assert len(item_a.get_catalogs()) == 1
+        assert item_a.get_catalogs()[0] is item_b.get_catalogs()[0]
+
+    def test_catalog_index_follows_added_schemes(self):
+        item = NewsMLG2.NewsMLG2Document(
+            newsitem_with_local_catalog(b'http://example.com/a/')
+        ).get_item()
+        catalogs = item.get_catalogs()
+        assert NewsMLG2.qcode_to_uri('ex:text', catalogs) == 'http://example.com/a/text'
+        with self.assertRaises(NewsMLG2.AliasNotFoundInCatalogs):
+            NewsMLG2.qcode_to_uri('added:text', catalogs)
+        scheme = NewsMLG2.Scheme()
+        scheme.alias = 'added'
+        scheme.uri = 'http://example.com/added/'
+        catalogs[0].add_scheme_to_catalog(scheme)
+        assert NewsMLG2.qcode_to_uri('added:text', catalogs) == 'http://example.com/added/text'
+        assert NewsMLG2.uri_to_qcode('http://example.com/added/text', catalogs) == 'added:text'
+
+    def test_catalog_indexes_dont_keep_catalogs(self):
+        catalog = NewsMLG2.NewsMLG2Document(
+            newsitem_with_local_catalog(b'http://example.com/a/')
+        ).get_item().get_catalogs()[0]
+        store = NewsMLG2.CatalogStore([catalog])
+        references = sys.getrefcount(catalog)
+        assert NewsMLG2.qcode_to_uri('ex:text', store) == 'http://example.com/a/text'
+        assert NewsMLG2.uri_to_qcode('http://example.com/a/text', store) == 'ex:text'
+        assert sys.getrefcount(catalog) == references
+
+    def test_catalog_file_reloaded_when_refreshed(self):
+        import tempfile
+        with tempfile.TemporaryDirectory() as dirname:
+            filename = os.path.join(dirname, 'catalog.xml')
+            with open(filename, 'wb') as catalog_file:
+                catalog_file.write(
+                    b'<catalog xmlns="http://iptc.org/std/nar/2006-10-01/">'
+                    b'<scheme alias="ex" uri="http://example.com/a/"/></catalog>'
+                )
+            catalog = NewsMLG2.load_catalog_file(filename)
+            assert NewsMLG2.load_catalog_file(filename) is catalog
+            with open(filename, 'wb') as catalog_file:
+                catalog_file.write(
+                    b'<catalog xmlns="http://iptc.org/std/nar/2006-10-01/">'
+                    b'<scheme alias="ex" uri="http://example.com/bb/"/></catalog>'
+                )
+            # files are only checked for changes when the cache is refreshed
+            assert NewsMLG2.load_catalog_file(filename) is catalog
+            NewsMLG2.refresh_catalog_file_cache()
+            reloaded_catalog = NewsMLG2.load_catalog_file(filename)
+            assert reloaded_catalog is not catalog
+            assert reloaded_catalog.get_scheme_for_alias('ex').uri == 'http://example.com/bb/'
+
+    def test_built_in_catalogs_can_be_indexed(self):
+        # indexes are generated when the package is built
+        import shutil
+        import tempfile
+        catalogs_dirname = os.path.join('NewsMLG2', 'catalogs')
+        with tempfile.TemporaryDirectory() as dirname:
+            for catalog_filename in NewsMLG2.CATALOG_CACHE.values():
+                filename = shutil.copy2(
+                    os.path.join(catalogs_dirname, os.path.basename(catalog_filename)),
+                    dirname
+                )
+                NewsMLG2.write_catalog_index(filename)
+                catalog = NewsMLG2.load_catalog_index(filename)
+                assert catalog is not None, filename
+                assert len(catalog._catalog) == len(
+                    etree.parse(filename).getroot().findall(
+                        NewsMLG2.NEWSMLG2NSPREFIX + 'scheme')
+                ), filename
+
+    def test_catalog_from_index(self):
+        import tempfile
+        with tempfile.TemporaryDirectory() as dirname:
+            filename = os.path.join(dirname, 'catalog.xml')
+            with open(filename, 'wb') as catalog_file:
+                catalog_file.write(
+                    b'<catalog xmlns="http://iptc.org/std/nar/2006-10-01/" url="http://example.com/catalog.xml">'
+                    b'<title xml:lang="en">Example catalog</title>'
+                    b'<scheme alias="ex" uri="http://example.com/a/">'
+                    b'<name xml:lang="en">Example</name>'
+                    b'<name xml:lang="de">Beispiel</name>'
+                    b'<definition>An example scheme</definition>'
+                    b'<sameAsScheme>http://example.com/b/</sameAsScheme>'
+                    b'</scheme></catalog>'
+                )
+            assert NewsMLG2.load_catalog_index(filename) is None
+            NewsMLG2.write_catalog_index(filename)
+            catalog = NewsMLG2.load_catalog_index(filename)
+            assert str(catalog) == '<Catalog "Example catalog">'
+            assert catalog.url == 'http://example.com/catalog.xml'
+            scheme = catalog.get_scheme_for_uri('http://example.com/a/')
+            assert scheme is catalog.get_scheme_for_alias('ex')
+            assert scheme.name.get_languages() == ['en', 'de']
+            assert str(scheme.name.get_for_language('de')) == 'Beispiel'
+            assert str(scheme.sameasscheme) == 'http://example.com/b/'
+            assert str(scheme.definition) == 'An example scheme'
+            # the index is ignored once the catalog file changes
+            with open(filename, 'ab') as catalog_file:
+                catalog_file.write(b'\n')
+            assert NewsMLG2.load_catalog_index(filename) is None
+
+    def test_catalog_from_index_to_xml(self):
+        # catalogs loaded from an index have no source XML to copy, and
+        # output the same XML as when they are parsed
+        import shutil
+        import tempfile
+        filename = os.path.join('NewsMLG2', 'catalogs', 'catalog.IPTC-G2-Standards_41.xml')
+        with tempfile.TemporaryDirectory() as dirname:
+            copied_filename = shutil.copy2(filename, dirname)
+            NewsMLG2.write_catalog_index(copied_filename)
+            catalog = NewsMLG2.load_catalog_index(copied_filename)
+        assert catalog._xmlelement is None
+        parsed = NewsMLG2.Catalog(xmlelement=etree.parse(filename).getroot())
+        expected = parsed.to_xml_string()
+        assert catalog.to_xml_string() == expected
+        assert catalog.to_xml_bytes() == bytes(expected, 'utf-8')
+        assert etree.tostring(catalog.to_xml()) == etree.tostring(parsed.to_xml())
+
+    def test_catalog_index_validation(self):
+        import tempfile
+        from unittest import mock
+        with tempfile.TemporaryDirectory() as dirname:
+            filename = os.path.join(dirname, 'catalog.xml')
+            with open(filename, 'wb') as catalog_file:
+                catalog_file.write(
+                    b'<catalog xmlns="http://iptc.org/std/nar/2006-10-01/">'
+                    b'<scheme alias="ex" uri="http://example.com/a/"/></catalog>'
+                )
+            NewsMLG2.write_catalog_index(filename)
+            # while the size and modification time match, the catalog file
+            # isn't read
+            with mock.patch('zlib.crc32') as crc32:
+                assert NewsMLG2.load_catalog_index(filename) is not None
+                assert not crc32.called
+            # the catalog file is checked if only its modification time changed
+            stat = os.stat(filename)
+            os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            assert NewsMLG2.load_catalog_index(filename) is not None
+            with open(filename, 'wb') as catalog_file:
+                catalog_file.write(
+                    b'<catalog xmlns="http://iptc.org/std/nar/2006-10-01/">'
+                    b'<scheme alias="ex" uri="http://example.com/b/"/></catalog>'
+                )
+            os.utime(filename, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10**9))
+            assert NewsMLG2.load_catalog_index(filename) is None
+            # an index that isn't one is ignored
+            with open(NewsMLG2.get_catalog_index_filename(filename), 'wb') as index_file:
+                index_file.write(b'\x80\x04not an index')
+            assert NewsMLG2.load_catalog_index(filename) is None
+
+
+REMOTE_CATALOG = (
+    b'<catalog xmlns="http://iptc.org/std/nar/2006-10-01/">'
+    b'<scheme alias="rem" uri="http://example.com/remote/"/></catalog>'
+)
+
+
+def newsitem_with_catalog_ref(href):
+    """
+    Return a newsItem referring to a remote catalog at `href`.
+    """
+    return (
+        b'<newsItem xmlns="http://iptc.org/std/nar/2006-10-01/" guid="catalog-test">'
+        b'<catalogRef href="' + href.encode('utf-8') + b'"/>'
+        b'<itemMeta><itemClass qcode="rem:text"/></itemMeta>'
+        b'</newsItem>'
+    )
+
+
+class TestNewsMLG2NewsItemRemoteCatalogs(unittest.TestCase):
+
+    def setUp(self):
+        import http.server
+        import tempfile
+        import threading
+        test = self
+        self.catalog_body = REMOTE_CATALOG
+        self.requests = []
+
+        class CatalogHandler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                test.requests.append(dict(self.headers))
+                etag = '"' + str(hash(test.catalog_body)) + '"'
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', str(len(test.catalog_body)))
+                self.end_headers()
+                self.wfile.write(test.catalog_body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.HTTPServer(('127.0.0.1', 0), CatalogHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.href = 'http://127.0.0.1:{}/catalog.xml'.format(self.server.server_port)
+        self.cache_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        NewsMLG2.disable_remote_catalogs()
+        self.server.shutdown()
+        self.server.server_close()
+        self.cache_dir.cleanup()
+
+    def test_remote_catalog_fetched_once(self):
+        NewsMLG2.enable_remote_catalogs(cache_dir=self.cache_dir.name)
+        for _ in range(3):
+            item = NewsMLG2.NewsMLG2Document(newsitem_with_catalog_ref(self.href)).get_item()
+            assert NewsMLG2.qcode_to_uri('rem:text', item.get_catalogs()) == 'http://example.com/remote/text'
+        assert len(self.requests) == 1
+        # a new cache loads the catalog from the cache directory
+        NewsMLG2.enable_remote_catalogs(cache_dir=self.cache_dir.name)
+        item = NewsMLG2.NewsMLG2Document(newsitem_with_catalog_ref(self.href)).get_item()
+        assert NewsMLG2.qcode_to_uri('rem:text', item.get_catalogs()) == 'http://example.com/remote/text'
+        assert len(self.requests) == 1
+
+    def test_conditional_refresh(self):
+        remote_catalogs = NewsMLG2.enable_remote_catalogs(cache_dir=self.cache_dir.name)
+        catalog = remote_catalogs.get_catalog(self.href)
+        assert remote_catalogs.refresh(self.href) is catalog
+        assert 'If-None-Match' in self.requests[1]
+        self.catalog_body = REMOTE_CATALOG.replace(b'/remote/', b'/changed/')
+        changed_catalog = remote_catalogs.refresh(self.href)
+        assert changed_catalog is not catalog
+        assert changed_catalog.get_scheme_for_alias('rem').uri == 'http://example.com/changed/'
+        assert len(self.requests) == 3
+
+    def test_stale_catalog_refreshed_in_background(self):
+        remote_catalogs = NewsMLG2.enable_remote_catalogs(
+            cache_dir=self.cache_dir.name, max_age=0
+        )
+        catalog = remote_catalogs.get_catalog(self.href)
+        self.catalog_body = REMOTE_CATALOG.replace(b'/remote/', b'/changed/')
+        # the stale catalog is returned straight away
+        assert remote_catalogs.get_catalog(self.href) is catalog
+        for _ in range(100):
+            if remote_catalogs.get_catalog(self.href) is not catalog:
+                break
+            time.sleep(0.05)
+        changed_catalog = remote_catalogs.get_catalog(self.href)
+        assert changed_catalog.get_scheme_for_alias('rem').uri == 'http://example.com/changed/'
+
+    def test_slow_fetch_doesnt_block_other_catalogs(self):
+        import threading
+        release = threading.Event()
+
+        def fetcher(url, headers):
+            if url.endswith('slow.xml'):
+                release.wait(10)
+            return (200, {}, REMOTE_CATALOG)
+
+        remote_catalogs = NewsMLG2.enable_remote_catalogs(
+            cache_dir=self.cache_dir.name, fetcher=fetcher
+        )
+        slow_thread = threading.Thread(
+            target=remote_catalogs.get_catalog, args=('http://example.com/slow.xml',)
+        )
+        slow_thread.start()
+        try:
+            start = time.time()
+            assert remote_catalogs.get_catalog('http://example.com/fast.xml') is not None
+            assert time.time() - start < 5
+        finally:
+            release.set()
+            slow_thread.join()
+        assert remote_catalogs.get_catalog('http://example.com/slow.xml') is not None
+
+    def test_pluggable_fetcher(self):
+        fetched = []
+
+        def fetcher(url, headers):
+            fetched.append(url)
+            if url.endswith('missing.xml'):
+                return (404, {}, b'')
+            return (200, {'etag': '"1"'}, REMOTE_CATALOG)
+
+        remote_catalogs = NewsMLG2.enable_remote_catalogs(
+            cache_dir=self.cache_dir.name, fetcher=fetcher
+        )
+        catalog = remote_catalogs.get_catalog('http://example.com/catalog.xml')
+        assert catalog.get_scheme_for_alias('rem').uri == 'http://example.com/remote/'
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert remote_catalogs.get_catalog('http://example.com/missing.xml') is None
+        # a failed catalog isn't fetched again for every item
+        assert remote_catalogs.get_catalog('http://example.com/missing.xml') is None
+        assert fetched == ['http://example.com/catalog.xml', 'http://example.com/missing.xml']
+        assert not self.requests
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -188,3 +188,91 @@ class TestNewsMLG2NewsItemFiles(unittest.TestCase):
         itemset = newsmessage.itemset
         # itemset can't be tested right now as it's an xs:any construct which
         # we don't support yet.
+
+
+class TestNewsMLG2NewsMessageReader(unittest.TestCase):
+    test_newsmlg2_file = os.path.join('tests', 'test_files', '007_emptynewsmessage.xml')
+
+    def test_header_read_up_front(self):
+        reader = NewsMLG2.NewsMessageReader(self.test_newsmlg2_file)
+        header = reader.get_header()
+        assert str(header.sent) == '2018-10-19T11:17:00.150Z'
+        assert str(header.sender) == 'thomsonreuters.com'
+        assert str(header.channel[2]) == 'WWW'
+        assert header.signal.qcode == 'nmsig:atomic'
+
+    def test_items(self):
+        reader = NewsMLG2.NewsMessageReader(self.test_newsmlg2_file)
+        items = list(reader)
+        assert len(items) == 2
+        assert isinstance(items[0], NewsMLG2.PackageItem)
+        assert items[0].guid == 'news-message-example'
+        assert items[0].groupset.root == 'N1'
+        assert isinstance(items[1], NewsMLG2.NewsItem)
+        assert items[1].guid == 'N1'
+        assert items[1].itemmeta.pubstatus.qcode == 'stat:usable'
+
+        # items are the same as when parsed on their own
+        tree = etree.parse(self.test_newsmlg2_file)
+        itemset = tree.find(NewsMLG2.NEWSMLG2NSPREFIX + 'itemSet')
+        assert items[0].to_xml_string() == NewsMLG2.PackageItem(xmlelement=itemset[0]).to_xml_string()
+        assert items[1].to_xml_string() == NewsMLG2.NewsItem(xmlelement=itemset[1]).to_xml_string()
+
+    def test_items_detached_from_document(self):
+        with open(self.test_newsmlg2_file, 'rb') as xmlfile:
+            reader = NewsMLG2.NewsMessageReader(xmlfile.read(), lazy=True)
+            for item in reader:
+                assert item._xmlelement.getparent() is None
+                assert item.itemmeta.itemclass.qcode == 'ninat:text'
+
+    def test_not_a_newsmessage(self):
+        test_newsmlg2_file = os.path.join('tests', 'test_files', '001_simplest_file.xml')
+        with self.assertRaises(Exception):
+            NewsMLG2.NewsMessageReader(test_newsmlg2_file)
+
+
+class TestNewsMLG2PullEvents(unittest.TestCase):
+    test_newsmlg2_file = os.path.join('tests', 'test_files', '007_emptynewsmessage.xml')
+
+    def test_item_events(self):
+        events = list(NewsMLG2.iter_events(self.test_newsmlg2_file))
+        item_events = [
+            (type(event), event.item_class) for event in events
+            if isinstance(event, (NewsMLG2.StartItemEvent, NewsMLG2.EndItemEvent))
+        ]
+        assert item_events == [
+            (NewsMLG2.StartItemEvent, NewsMLG2.PackageItem),
+            (NewsMLG2.EndItemEvent, NewsMLG2.PackageItem),
+            (NewsMLG2.StartItemEvent, NewsMLG2.NewsItem),
+            (NewsMLG2.EndItemEvent, NewsMLG2.NewsItem),
+        ]
+
+    def test_attribute_and_text_events(self):
+        events = list(NewsMLG2.iter_events(self.test_newsmlg2_file))
+        texts = [
+            (event.element_class, event.element_id, event.text)
+            for event in events if isinstance(event, NewsMLG2.TextEvent)
+        ]
+        assert (NewsMLG2.Sender, 'sender', 'thomsonreuters.com') in texts
+        assert texts.count(
+            (NewsMLG2.VersionCreated, 'versioncreated', '2021-04-21T12:00:00+00:00')
+        ) == 2
+        attributes = [
+            (event.element_class, event.element_id, event.attribute_id, event.value)
+            for event in events if isinstance(event, NewsMLG2.AttributeEvent)
+        ]
+        assert (NewsMLG2.NewsItem, None, 'guid', 'N1') in attributes
+        assert (NewsMLG2.PackageItem, None, 'xml_lang', 'en-GB') in attributes
+        assert (NewsMLG2.Timestamp, 'timestamp', 'role', 'received') in attributes
+
+    def test_filter_element_classes(self):
+        with open(self.test_newsmlg2_file, 'rb') as xmlfile:
+            events = list(NewsMLG2.iter_events(
+                xmlfile.read(), element_classes=[NewsMLG2.PubStatus]
+            ))
+        qcodes = [
+            event.value for event in events
+            if isinstance(event, NewsMLG2.AttributeEvent)
+        ]
+        assert qcodes == ['stat:usable', 'stat:usable']
+        assert not any(isinstance(event, NewsMLG2.TextEvent) for event in events)
@@ -26,11 +26,16 @@
 NewsML-G2 Python library - unit tests
 """
 
+import io
+import json
+import pickle
 import unittest
 import os
 import sys
 sys.path.append(os.getcwd())
 
+from lxml import etree
+
 import NewsMLG2
 
 class TestNewsMLG2Roundtrip(unittest.TestCase):
@@ -64,3 +69,417 @@ class TestNewsMLG2Roundtrip(unittest.TestCase):
         g2doc = NewsMLG2.NewsMLG2Document(test_newsmlg2_file)
         roundtrip_version = bytes(g2doc.to_xml_string(), 'utf-8')
         assert test_newsml_g2_file_as_bytes == roundtrip_version
+
+    def test_roundtrip_xs_any_content(self):
+        test_newsmlg2_string = b"""<?xml version='1.0' encoding='utf-8'?>
+<newsItem xmlns="http://iptc.org/std/nar/2006-10-01/" xmlns:nitf="http://iptc.org/std/NITF/2006-10-18/" xml:lang="en-GB" standard="NewsML-G2" standardversion="2.34" conformance="power" guid="xs-any-test" version="1">
+  <catalogRef href="http://www.iptc.org/std/catalog/catalog.IPTC-G2-Standards_38.xml"/>
+  <itemMeta>
+    <itemClass qcode="ninat:text"/>
+    <provider qcode="nprov:IPTC"/>
+    <versionCreated>2020-06-22T12:00:00+03:00</versionCreated>
+  </itemMeta>
+  <contentSet>
+    <inlineXML contenttype="application/nitf+xml">
+      <nitf:nitf xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:schemaLocation="http://iptc.org/std/NITF/2006-10-18/ ./nitf-3-6.xsd">
+        <nitf:body>
+          <nitf:body.content>
+            <!-- a comment -->
+            <nitf:p>Some <nitf:em>emphasised</nitf:em> text &amp; an entity</nitf:p>
+            <x:extra xmlns:x="http://example.com/extra" x:attr="value"/>
+          </nitf:body.content>
+        </nitf:body>
+      </nitf:nitf>
+    </inlineXML>
+  </contentSet>
+</newsItem>
+"""
+        g2doc = NewsMLG2.NewsMLG2Document(test_newsmlg2_string)
+        roundtrip_version = bytes(g2doc.to_xml_string(), 'utf-8')
+        assert test_newsmlg2_string == roundtrip_version
+        # xs:any content is copied, not moved out of the source document
+        assert bytes(g2doc.to_xml_string(), 'utf-8') == roundtrip_version
+
+    def test_roundtrip_xs_any_inherited_namespaces(self):
+        # namespaces declared above xs:any content in the source document are
+        # declared on the copied content, as they would be if it was
+        # serialized on its own
+        test_newsmlg2_string = b"""<newsItem xmlns="http://iptc.org/std/nar/2006-10-01/" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xmlns:ext="http://example.com/ext" standard="NewsML-G2" standardversion="2.34" conformance="power" guid="xs-any-ns-test">
+  <itemMeta>
+    <itemClass qcode="ninat:text"/>
+    <provider qcode="nprov:IPTC"/>
+    <versionCreated>2020-06-22T12:00:00+03:00</versionCreated>
+  </itemMeta>
+  <contentSet>
+    <inlineXML contenttype="application/xml"><ext:doc xsi:type="ext:t">text</ext:doc>
+    </inlineXML>
+  </contentSet>
+</newsItem>
+"""
+        g2doc = NewsMLG2.NewsMLG2Document(test_newsmlg2_string)
+        assert (
+            '<ext:doc xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+            'xmlns:ext="http://example.com/ext" xsi:type="ext:t">text</ext:doc>'
+        ) in g2doc.to_xml_string()
+
+    def test_write_xml(self):
+        # streaming output matches the output of to_xml_string(), including
+        # for xs:any content and extension elements. Each output is made
+        # from a freshly parsed document, so that none of them relies on
+        # another having been made first.
+        test_newsmlg2_files = sorted(
+            os.path.join(directory, filename)
+            for directory in ('examples', os.path.join('tests', 'test_files'))
+            for filename in os.listdir(directory)
+            # LISTING_25 is not namespace-well-formed and can't be parsed
+            if filename.endswith('.xml') and not filename.startswith('LISTING_25_')
+        )
+        for test_newsmlg2_file in test_newsmlg2_files:
+            if etree.parse(test_newsmlg2_file).getroot().tag not in NewsMLG2.document.ROOT_CLASSES:
+                # a fragment rather than a document
+                continue
+            expected = NewsMLG2.NewsMLG2Document(test_newsmlg2_file).to_xml_string()
+            output = io.BytesIO()
+            NewsMLG2.NewsMLG2Document(test_newsmlg2_file).write_xml(output)
+            assert output.getvalue() == bytes(expected, 'utf-8'), test_newsmlg2_file
+            g2doc = NewsMLG2.NewsMLG2Document(test_newsmlg2_file)
+            assert g2doc.to_xml_bytes() == bytes(expected, 'utf-8'), test_newsmlg2_file
+            # outputting a document doesn't change it
+            assert g2doc.to_xml_string() == expected, test_newsmlg2_file
+            assert g2doc.to_xml_bytes() == bytes(expected, 'utf-8'), test_newsmlg2_file
+            item = NewsMLG2.NewsMLG2Document(test_newsmlg2_file).get_item()
+            assert item.to_xml_bytes(pretty_print=False) == etree.tostring(
+                NewsMLG2.NewsMLG2Document(test_newsmlg2_file).get_item().to_xml(),
+                encoding='utf-8'
+            ), test_newsmlg2_file
+
+    def test_write_xml_lazy_without_copies(self):
+        # the unbuilt parts of lazily parsed documents are written straight
+        # from the source document, without copying it
+        from unittest import mock
+        for test_newsmlg2_file in (
+                os.path.join('examples', 'LISTING_1_A_NewsML-G2_News_Item.xml'),
+                os.path.join('examples', 'LISTING_22_Sports_story_in_NewsML-G2NITF.xml'),
+                os.path.join('examples', 'LISTING_27_Company_Financial_Information.xml'),
+                os.path.join('tests', 'test_files', '008_roundtrip_test.xml')):
+            expected = NewsMLG2.NewsMLG2Document(test_newsmlg2_file).to_xml_string()
+            g2doc = NewsMLG2.NewsMLG2Document(test_newsmlg2_file, lazy=True)
+            with mock.patch('NewsMLG2.core._copy_source_element') as copy_source_element, \
+                    mock.patch('NewsMLG2.core._copy_xs_any_element') as copy_xs_any_element:
+                output = io.BytesIO()
+                g2doc.write_xml(output)
+            assert not copy_source_element.called and not copy_xs_any_element.called
+            assert output.getvalue() == bytes(expected, 'utf-8'), test_newsmlg2_file
+
+    def test_to_xml_after_modification(self):
+        # unmodified parts of a parsed document are copied from the source
+        # document, modified parts are built from their objects, and the
+        # output is the same as for a document parsed with the modification
+        test_newsmlg2_file = os.path.join('tests', 'test_files', '008_roundtrip_test.xml')
+        with open(test_newsmlg2_file, 'rb') as xmlfile:
+            modified_string = xmlfile.read().replace(
+                b'<pubStatus qcode="stat:usable"/>',
+                b'<pubStatus qcode="stat:canceled"/>'
+            )
+        expected = NewsMLG2.NewsMLG2Document(modified_string).to_xml_string()
+        for lazy in (False, True):
+            g2doc = NewsMLG2.NewsMLG2Document(test_newsmlg2_file, lazy=lazy)
+            item = g2doc.get_item()
+            item.itemmeta.pubstatus.qcode = 'stat:canceled'
+            assert g2doc.to_xml_string() == expected
+            output = io.BytesIO()
+            g2doc.write_xml(output)
+            assert output.getvalue() == bytes(expected, 'utf-8')
+            if lazy:
+                # untouched children of a lazy object are not built
+                assert NewsMLG2.core._PENDING in item._element_values.values()
+
+    def test_passthrough(self):
+        # with passthrough, an unmodified document is output exactly as it
+        # was read, and a modified one as without passthrough
+        test_newsmlg2_string = b"""<?xml version="1.0" encoding="UTF-8"?>
+<!-- not normalized: comments, spacing and attribute order are kept -->
+<newsItem guid="passthrough-test" xmlns="http://iptc.org/std/nar/2006-10-01/"
+    standard="NewsML-G2" standardversion="2.34" conformance="power">
+  <itemMeta>
+    <itemClass   qcode="ninat:text"/>
+    <provider qcode="nprov:IPTC"/>
+    <versionCreated>2020-06-22T12:00:00+03:00</versionCreated>
+    <pubStatus qcode="stat:usable"/>
+  </itemMeta>
+</newsItem>
+"""
+        for lazy in (False, True):
+            g2doc = NewsMLG2.NewsMLG2Document(
+                test_newsmlg2_string, lazy=lazy, passthrough=True
+            )
+            # reading properties doesn't modify the document
+            item = g2doc.get_item()
+            assert str(item.itemmeta.pubstatus.qcode) == 'stat:usable'
+            assert not item.itemmeta.title
+            assert g2doc.to_xml_bytes() == test_newsmlg2_string
+            assert g2doc.to_xml_string() == test_newsmlg2_string.decode('utf-8')
+            output = io.BytesIO()
+            g2doc.write_xml(output)
+            assert output.getvalue() == test_newsmlg2_string
+
+            item.itemmeta.pubstatus.qcode = 'stat:canceled'
+            expected = NewsMLG2.NewsMLG2Document(
+                test_newsmlg2_string.replace(b'stat:usable', b'stat:canceled')
+            ).to_xml_string()
+            assert g2doc.to_xml_string() == expected
+            assert g2doc.to_xml_bytes() == bytes(expected, 'utf-8')
+
+        test_newsmlg2_file = os.path.join('tests', 'test_files', '008_roundtrip_test.xml')
+        g2doc = NewsMLG2.NewsMLG2Document(test_newsmlg2_file, passthrough=True)
+        with open(test_newsmlg2_file, 'rb') as xmlfile:
+            assert g2doc.to_xml_bytes() == xmlfile.read()
+
+        # reordering or repeating children is a modification
+        def swap_subjects(subjects):
+            subjects[0], subjects[1] = subjects[1], subjects[0]
+
+        def repeat_subject(subjects):
+            subjects[0] = subjects[1]
+
+        for modify in (swap_subjects, repeat_subject):
+            for lazy in (False, True):
+                expected = NewsMLG2.NewsMLG2Document(test_newsmlg2_file, lazy=lazy)
+                modify(expected.get_item().contentmeta.subject)
+                expected = expected.to_xml_string()
+                g2doc = NewsMLG2.NewsMLG2Document(
+                    test_newsmlg2_file, lazy=lazy, passthrough=True
+                )
+                modify(g2doc.get_item().contentmeta.subject)
+                assert g2doc.to_xml_string() == expected
+                assert g2doc.to_xml_bytes() == bytes(expected, 'utf-8')
+
+    def test_write_through(self):
+        # in write-through mode, changes are made to the parsed XML tree,
+        # which is output as it is
+        test_newsmlg2_string = b"""<?xml version="1.0" encoding="UTF-8"?>
+<!-- comments and formatting are kept -->
+<newsItem xmlns="http://iptc.org/std/nar/2006-10-01/" guid="write-through-test"
+    standard="NewsML-G2" standardversion="2.34" conformance="power">
+  <itemMeta>
+    <itemClass qcode="ninat:text"/>
+    <provider qcode="nprov:IPTC"/>
+    <versionCreated>2020-06-22T12:00:00+03:00</versionCreated>
+    <pubStatus qcode="stat:usable"/>
+    <signal qcode="sig:update"/>
+    <signal qcode="sig:correction"/>
+  </itemMeta>
+</newsItem>
+"""
+        g2doc = NewsMLG2.NewsMLG2Document(test_newsmlg2_string, write_through=True)
+        item = g2doc.get_item()
+        item.itemmeta.pubstatus.qcode = 'stat:canceled'
+        item.itemmeta.versioncreated = '2020-06-23T12:00:00+03:00'
+        del item.itemmeta.signal[0]
+        # missing elements are added when they are modified
+        item.contentmeta.urgency = '1'
+        assert g2doc.to_xml_bytes() == b"""<?xml version='1.0' encoding='utf-8'?>
+<!-- comments and formatting are kept -->
+<newsItem xmlns="http://iptc.org/std/nar/2006-10-01/" guid="write-through-test" standard="NewsML-G2" standardversion="2.34" conformance="power">
+  <itemMeta>
+    <itemClass qcode="ninat:text"/>
+    <provider qcode="nprov:IPTC"/>
+    <versionCreated>2020-06-23T12:00:00+03:00</versionCreated>
+    <pubStatus qcode="stat:canceled"/>
+    <signal qcode="sig:correction"/>
+  </itemMeta>
+  <contentMeta>
+    <urgency>1</urgency>
+  </contentMeta>
+</newsItem>
+"""
+        # the objects are the same as in the default mode
+        expected = NewsMLG2.NewsMLG2Document(test_newsmlg2_string)
+        expected_item = expected.get_item()
+        expected_item.itemmeta.pubstatus.qcode = 'stat:canceled'
+        expected_item.itemmeta.versioncreated = '2020-06-23T12:00:00+03:00'
+        del expected_item.itemmeta.signal[0]
+        expected_item.contentmeta.urgency = '1'
+        assert item.to_xml_string() == expected_item.to_xml_string()
+        # objects assigned to the document are written through too
+        pubstatus = NewsMLG2.PubStatus()
+        item.itemmeta.pubstatus = pubstatus
+        pubstatus.qcode = 'stat:withheld'
+        assert b'<pubStatus qcode="stat:withheld"/>' in g2doc.to_xml_bytes()
+
+    def assert_written_through(self, g2doc, item):
+        # the document parsed again from the write-through tree matches the
+        # modified objects (apart from namespace declarations and layout)
+        def canonical(xml_bytes):
+            reparsed = NewsMLG2.NewsMLG2Document(xml_bytes).get_item()
+            parser = etree.XMLParser(remove_blank_text=True)
+            return etree.tostring(
+                etree.fromstring(reparsed.to_xml_string().encode(), parser),
+                method='c14n', exclusive=True
+            )
+        assert canonical(g2doc.to_xml_bytes()) == canonical(
+            item.to_xml_string().encode()
+        )
+
+    def test_write_through_array_moves(self):
+        # objects already written through keep their elements when they
+        # are moved
+        test_newsmlg2_file = os.path.join('tests', 'test_files', 'LISTING_6_Simple_NewsML-G2_Package.xml')
+        g2doc = NewsMLG2.NewsMLG2Document(test_newsmlg2_file, write_through=True)
+        item = g2doc.get_item()
+        itemrefs = item.groupset.group[0].itemref
+        (itemref_a, itemref_b) = itemrefs
+        itemrefs[0], itemrefs[1] = itemrefs[1], itemrefs[0]
+        self.assert_written_through(g2doc, item)
+        itemref_a.residref = 'urn:example:a'
+        itemref_b.residref = 'urn:example:b'
+        self.assert_written_through(g2doc, item)
+        source = g2doc.to_xml_bytes()
+        assert source.index(b'urn:example:b') < source.index(b'urn:example:a')
+        # an object at two positions follows its changes at the one it was
+        # last assigned to, and its other one once that is replaced
+        itemrefs[1] = itemref_b
+        itemrefs[0] = itemref_a
+        itemref_b.residref = 'urn:example:b2'
+        self.assert_written_through(g2doc, item)
+        del itemrefs[0]
+        self.assert_written_through(g2doc, item)
+        # assigning the whole array moves the elements too
+        item.groupset.group[0].itemref = NewsMLG2.GenericArray(
+            xmlarray=[itemref_a, itemref_b], element_class=NewsMLG2.ItemRef
+        )
+        itemref_a.residref = 'urn:example:a2'
+        self.assert_written_through(g2doc, item)
+        # objects can't be in two documents
+        other = NewsMLG2.NewsMLG2Document(test_newsmlg2_file, write_through=True)
+        with self.assertRaises(ValueError):
+            other.get_item().groupset.group[0].itemref[0] = itemref_a
+
+        test_newsmlg2_file = os.path.join('examples', 'LISTING_24_News_Message_conveying_a_complete_News_Package.xml')
+        g2doc = NewsMLG2.NewsMLG2Document(test_newsmlg2_file, write_through=True)
+        newsmessage = g2doc.get_item()
+        timestamps = newsmessage.header.timestamp
+        timestamps[0], timestamps[1] = timestamps[1], timestamps[0]
+        timestamps[0].role = 'transmitted-first'
+        self.assert_written_through(g2doc, newsmessage)
+
+    def test_write_through_catalog(self):
+        # the schemes of a catalog are written through
+        test_newsmlg2_file = os.path.join('tests', 'test_files', 'LISTING_13_Complete_Catalog_Item.xml')
+        g2doc = NewsMLG2.NewsMLG2Document(test_newsmlg2_file, write_through=True)
+        item = g2doc.get_item()
+        catalog = item.catalogcontainer.catalog
+        catalog.pubconstraint = 'test:constraint'
+        catalog.scheme[0].alias = 'application'
+        catalog.scheme[0].name[0].role = 'test:role'
+        source = g2doc.to_xml_bytes()
+        assert b'pubconstraint="test:constraint"' in source
+        assert b'alias="application"' in source
+        self.assert_written_through(g2doc, item)
+
+    def test_pickle(self):
+        # pickled items are unpickled without their XML elements, and
+        # output the same XML
+        test_newsmlg2_file = os.path.join('tests', 'test_files', '008_roundtrip_test.xml')
+        for lazy in (False, True):
+            g2doc = NewsMLG2.NewsMLG2Document(test_newsmlg2_file, lazy=lazy)
+            item = g2doc.get_item()
+            expected = item.to_xml_string()
+            data = pickle.dumps(item)
+            assert b'lxml' not in data
+            unpickled = pickle.loads(data)
+            assert isinstance(unpickled, NewsMLG2.NewsItem)
+            assert unpickled._xmlelement is None
+            assert unpickled.to_xml_string() == expected
+            assert unpickled.get_catalogs() is not NewsMLG2.CATALOG_STORE
+            # unpickled objects can be modified as usual
+            unpickled.itemmeta.pubstatus.qcode = 'stat:canceled'
+            assert 'stat:canceled' in unpickled.to_xml_string()
+            assert item.to_xml_string() == expected
+
+    def test_pickle_size(self):
+        # children that haven't been modified (or built) are pickled as
+        # their source XML, compressed: pickles are smaller than the XML,
+        # and pickling a lazy item doesn't build its children
+        for lazy in (False, True):
+            xml_size = 0
+            pickle_size = 0
+            for test_newsmlg2_file in sorted(os.listdir('examples')):
+                if not test_newsmlg2_file.startswith('LISTING_1'):
+                    continue
+                item = NewsMLG2.NewsMLG2Document(
+                    os.path.join('examples', test_newsmlg2_file), lazy=lazy
+                ).get_item()
+                data = pickle.dumps(item)
+                if lazy:
+                    assert NewsMLG2.core._PENDING in item._element_values.values()
+                xml_size += len(item.to_xml_bytes())
+                pickle_size += len(data)
+                assert pickle.loads(data).to_xml_bytes() == item.to_xml_bytes()
+            assert pickle_size < xml_size
+
+        # modified children are pickled as objects
+        test_newsmlg2_file = os.path.join('tests', 'test_files', '008_roundtrip_test.xml')
+        item = NewsMLG2.NewsMLG2Document(test_newsmlg2_file, lazy=True).get_item()
+        item.itemmeta.pubstatus.qcode = 'stat:canceled'
+        item.contentmeta.subject[0] = item.contentmeta.subject[1]
+        assert pickle.loads(pickle.dumps(item)).to_xml_string() == item.to_xml_string()
+
+    def test_dict(self):
+        # to_dict() only holds attributes and elements that are present, and
+        # from_dict() builds the same objects again without going through XML
+        test_newsmlg2_file = os.path.join('tests', 'test_files', '008_roundtrip_test.xml')
+        expected = None
+        for lazy in (False, True):
+            item = NewsMLG2.NewsMLG2Document(test_newsmlg2_file, lazy=lazy).get_item()
+            data = item.to_dict()
+            if expected is None:
+                expected = data
+            # in lazy mode, the same dict is read without building objects
+            assert data == expected
+            if lazy:
+                assert NewsMLG2.core._PENDING in item._element_values.values()
+            assert data['itemmeta']['pubstatus'] == {'@qcode': 'stat:usable'}
+            assert '@version' in data
+            assert 'hophistory' not in data
+            assert '@xml_lang' not in data['itemmeta']['pubstatus']
+            xml = item.to_xml_string()
+            from_dict_item = NewsMLG2.NewsItem.from_dict(json.loads(json.dumps(data)))
+            assert from_dict_item.to_dict() == data
+            assert from_dict_item.to_xml_string() == xml
+
+        # including extension elements followed by text, for every document
+        for test_newsmlg2_file in (
+                os.path.join('examples', 'LISTING_22_Sports_story_in_NewsML-G2NITF.xml'),
+                os.path.join('examples', 'LISTING_23_SportsML-G2_Package.xml'),
+                os.path.join('examples', 'LISTING_26_Embedded_photo_metadata_fields_mapped_to_NewsML-G2.xml'),
+                os.path.join('examples', 'LISTING_27_Company_Financial_Information.xml'),
+                os.path.join('tests', 'test_files', '002_knowledgeitem.xml')):
+            for lazy in (False, True):
+                item = NewsMLG2.NewsMLG2Document(test_newsmlg2_file, lazy=lazy).get_item()
+                data = json.loads(json.dumps(item.to_dict()))
+                from_dict_item = item.__class__.from_dict(data)
+                assert from_dict_item.to_xml_string() == item.to_xml_string(), test_newsmlg2_file
+
+        # catalogs loaded from an index have no source element
+        import shutil
+        import tempfile
+        filename = os.path.join('NewsMLG2', 'catalogs', 'catalog.IPTC-G2-Standards_41.xml')
+        with tempfile.TemporaryDirectory() as dirname:
+            copied_filename = shutil.copy2(filename, dirname)
+            NewsMLG2.write_catalog_index(copied_filename)
+            catalog = NewsMLG2.load_catalog_index(copied_filename)
+        assert catalog._xmlelement is None
+        parsed = NewsMLG2.Catalog(xmlelement=etree.parse(filename).getroot())
+        assert catalog.to_dict() == parsed.to_dict()
+
+        item = NewsMLG2.NewsItem()
+        item.guid = 'dict-test'
+        item.contentmeta.urgency = '1'
+        assert item.to_dict() == {
+            '@guid': 'dict-test', 'contentmeta': {'urgency': {'#text': '1'}}
+        }
+        with self.assertRaises(AttributeError):
+            NewsMLG2.NewsItem.from_dict({'nonexistent': {}})
+        with self.assertRaises(AttributeError):
+            NewsMLG2.NewsItem.from_dict({'': {}})
@@ -0,0 +1,440 @@
+#!/usr/bin/env python
+
+"""
+Simple benchmarks for the NewsML-G2 library, run against the example
+listings in the `examples` folder.
+
+Usage:
+    python tools/benchmark.py codes
+    python tools/benchmark.py dict
+    python tools/benchmark.py memory
+    python tools/benchmark.py modify
+    python tools/benchmark.py parse
+    python tools/benchmark.py passthrough
+    python tools/benchmark.py pickle
+    python tools/benchmark.py pull
+    python tools/benchmark.py view
+    python tools/benchmark.py write
+"""
+
+import argparse
+import contextlib
+import gc
+import glob
+import io
+import os
+import pickle
+import sys
+import time
+import tracemalloc
+
+from lxml import etree
+
+# because we want to reference a module that hasn't been installed yet
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)),'..'))
+
+import NewsMLG2
+
+EXAMPLES_DIR = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), '..', 'examples'
+)
+
+
+def load_examples():
+    """
+    Return (filename, bytes) for every example listing that we can parse.
+    """
+    examples = []
+    for filename in sorted(glob.glob(os.path.join(EXAMPLES_DIR, '*.xml'))):
+        with open(filename, 'rb') as xmlfile:
+            data = xmlfile.read()
+        try:
+            parse(data)
+        except Exception:  # pylint: disable=broad-except
+            continue
+        examples.append((os.path.basename(filename), data))
+    return examples
+
+
+def parse(data, **kwargs):
+    """
+    Parse a document, hiding the warnings printed for remote catalogs.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        return NewsMLG2.NewsMLG2Document(data, **kwargs)
+
+
+def benchmark_memory(examples):
+    """
+    Measure the Python heap used by the parsed object graph of each example.
+    Memory allocated by libxml2 for the XML tree itself is not counted.
+    """
+    total = 0
+    for name, data in examples:
+        # warm up: compile class descriptors, load catalogs
+        parse(data)
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        document = parse(data)
+        # drop catalogs held by the global catalog store
+        NewsMLG2.CATALOG_STORE.__init__([])
+        gc.collect()
+        used = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        del document
+        total += used
+        print('{:>10,} bytes  {}'.format(used, name))
+    print('{:>10,} bytes  average per item ({} items)'.format(
+        total // len(examples), len(examples)
+    ))
+
+
+def build_object_graphs(roots):
+    """
+    Build the objects for every child element of each document root.
+    The root item itself is not built, so that loading its catalogs doesn't
+    dominate the timings.
+    """
+    for root in roots:
+        descriptor = NewsMLG2.document.ROOT_CLASSES[root.tag].get_descriptor()
+        for child in root:
+            for element_id in descriptor.element_ids_by_tag.get(child.tag, ()):
+                descriptor.element_classes[element_id](xmlelement=child)
+
+
+def benchmark_parse(examples, repeat=20):
+    """
+    Compare the time taken to build object graphs with the generic parser
+    and with the generated, class-specialized parsers.
+    """
+    roots = [etree.fromstring(data) for name, data in examples]
+    timings = {}
+    for label, enable in (('generic', NewsMLG2.disable_specialized_parsers),
+                          ('specialized', NewsMLG2.enable_specialized_parsers)):
+        enable()
+        # warm up: compile class descriptors and generate parsers
+        build_object_graphs(roots)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            build_object_graphs(roots)
+        timings[label] = time.perf_counter() - start
+        print('{:>8.3f} s  {} parser ({} items x {})'.format(
+            timings[label], label, len(roots), repeat
+        ))
+    NewsMLG2.disable_specialized_parsers()
+    print('{:>8.2f} x  speedup'.format(timings['generic'] / timings['specialized']))
+
+
+def build_news_message(examples, repeat):
+    """
+    Return a newsMessage containing every example item `repeat` times.
+    """
+    items = []
+    for name, data in examples:
+        root = etree.fromstring(data)
+        if root.tag != NewsMLG2.NEWSMLG2NSPREFIX + 'newsMessage':
+            items.append(etree.tostring(root))
+    return (
+        b'<newsMessage xmlns="http://iptc.org/std/nar/2006-10-01/">'
+        b'<header><sent>2021-04-21T12:00:00Z</sent></header><itemSet>'
+        + b''.join(items) * repeat +
+        b'</itemSet></newsMessage>'
+    )
+
+
+def benchmark_pull(examples, repeat=50):
+    """
+    Compare reading a large newsMessage with NewsMLG2.iter_events() against
+    a bare lxml iterparse loop and against building the item objects.
+    """
+    data = build_news_message(examples, repeat)
+
+    def raw_iterparse():
+        for event, element in etree.iterparse(io.BytesIO(data), events=('start', 'end')):
+            if event == 'end':
+                element.clear(keep_tail=True)
+
+    def pull_events():
+        for event in NewsMLG2.iter_events(data):
+            pass
+
+    def read_items():
+        with contextlib.redirect_stdout(io.StringIO()):
+            for item in NewsMLG2.NewsMessageReader(data):
+                pass
+
+    print('{:,} bytes'.format(len(data)))
+    for label, function in (('lxml iterparse', raw_iterparse),
+                            ('iter_events', pull_events),
+                            ('NewsMessageReader', read_items)):
+        start = time.perf_counter()
+        function()
+        print('{:>8.3f} s  {}'.format(time.perf_counter() - start, label))
+
+
+def benchmark_view(examples, repeat=20):
+    """
+    Compare reading a few properties of each example with NewsML-G2 objects
+    and with read-only views.
+    """
+    examples = [
+        (name, data) for (name, data) in examples
+        if etree.fromstring(data).tag in NewsMLG2.document.ITEM_CLASSES
+    ]
+
+    def read_properties(item):
+        itemmeta = item.itemmeta
+        return (item.guid, itemmeta.itemclass.qcode, str(itemmeta.versioncreated))
+
+    def read_objects():
+        for name, data in examples:
+            read_properties(parse(data).get_item())
+
+    def read_views():
+        for name, data in examples:
+            read_properties(NewsMLG2.NewsMLG2DocumentView(data).get_item())
+
+    def read_lxml():
+        for name, data in examples:
+            etree.fromstring(data)
+
+    for label, function in (('lxml parse only', read_lxml),
+                            ('NewsMLG2Document', read_objects),
+                            ('NewsMLG2DocumentView', read_views)):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            function()
+        print('{:>8.3f} s  {} ({} items x {})'.format(
+            time.perf_counter() - start, label, len(examples), repeat
+        ))
+
+
+def benchmark_codes(examples, repeat=200):
+    """
+    Compare resolving the qcodes and URIs used by the examples one at a time
+    with qcode_to_uri() / uri_to_qcode() and in batches with
+    qcodes_to_uris() / uris_to_qcodes().
+    """
+    batches = []
+    for name, data in examples:
+        item = parse(data).get_item()
+        if not hasattr(item, 'get_catalogs'):
+            continue
+        catalogs = item.get_catalogs()
+        qcodes = []
+        for element in etree.fromstring(data).iter():
+            qcode = element.get('qcode')
+            if qcode is not None:
+                try:
+                    NewsMLG2.qcode_to_uri(qcode, catalogs)
+                except Exception:  # pylint: disable=broad-except
+                    continue
+                qcodes.append(qcode)
+        uris = [NewsMLG2.qcode_to_uri(qcode, catalogs) for qcode in qcodes]
+        batches.append((catalogs, qcodes, uris))
+
+    def per_call():
+        for catalogs, qcodes, uris in batches:
+            [NewsMLG2.qcode_to_uri(qcode, catalogs) for qcode in qcodes]
+            [NewsMLG2.uri_to_qcode(uri, catalogs) for uri in uris]
+
+    def batch():
+        for catalogs, qcodes, uris in batches:
+            NewsMLG2.qcodes_to_uris(qcodes, catalogs)
+            NewsMLG2.uris_to_qcodes(uris, catalogs)
+
+    count = sum(len(qcodes) * 2 for (catalogs, qcodes, uris) in batches)
+    for label, function in (('qcode_to_uri / uri_to_qcode', per_call),
+                            ('qcodes_to_uris / uris_to_qcodes', batch)):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            function()
+        print('{:>8.3f} s  {} ({:,} codes x {})'.format(
+            time.perf_counter() - start, label, count, repeat
+        ))
+
+
+def benchmark_write(examples, repeat=20):
+    """
+    Compare writing the examples to a file with to_xml_string() and with
+    write_xml(). Peak memory counts Python allocations only (not the memory
+    of lxml trees), so it shows the cost of the string copies.
+    """
+    items = [parse(data).get_item() for (name, data) in examples]
+
+    def xml_string(output):
+        for item in items:
+            output.write(item.to_xml_string().encode('utf-8'))
+
+    def write_xml(output):
+        for item in items:
+            item.write_xml(output)
+
+    for label, function in (('to_xml_string', xml_string),
+                            ('write_xml', write_xml)):
+        with open(os.devnull, 'wb') as output:
+            gc.collect()
+            tracemalloc.start()
+            start = time.perf_counter()
+            for _ in range(repeat):
+                function(output)
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        print('{:>8.3f} s  {:>10,} bytes peak  {} ({} items x {})'.format(
+            elapsed, peak, label, len(items), repeat
+        ))
+
+
+def benchmark_modify(examples, repeat=20):
+    """
+    Compare parsing each example, changing its pubStatus and writing it out
+    again, with lazy parsing and in write-through mode.
+    """
+    examples = [
+        (name, data) for (name, data) in examples
+        if etree.fromstring(data).tag in NewsMLG2.document.ITEM_CLASSES
+    ]
+
+    def modify(**kwargs):
+        for name, data in examples:
+            document = parse(data, **kwargs)
+            document.get_item().itemmeta.pubstatus.qcode = 'stat:canceled'
+            document.to_xml_bytes()
+
+    for label, kwargs in (('default', {}),
+                          ('lazy', {'lazy': True}),
+                          ('write-through', {'write_through': True})):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            modify(**kwargs)
+        print('{:>8.3f} s  {} ({} items x {})'.format(
+            time.perf_counter() - start, label, len(examples), repeat
+        ))
+
+
+def benchmark_passthrough(examples, repeat=20):
+    """
+    Compare parsing each example and writing it out again unmodified, as a
+    relay would, with and without `passthrough=True`.
+    """
+    def relay(**kwargs):
+        for name, data in examples:
+            parse(data, **kwargs).to_xml_bytes()
+
+    for label, kwargs in (('to_xml_bytes', {}),
+                          ('to_xml_bytes, passthrough', {'passthrough': True}),
+                          ('to_xml_bytes, lazy', {'lazy': True}),
+                          ('to_xml_bytes, lazy, passthrough',
+                           {'lazy': True, 'passthrough': True})):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            relay(**kwargs)
+        print('{:>8.3f} s  {} ({} items x {})'.format(
+            time.perf_counter() - start, label, len(examples), repeat
+        ))
+
+
+def benchmark_dict(examples, repeat=20):
+    """
+    Compare converting the parsed examples to plain dicts with to_dict() and
+    building them again with from_dict(), against writing them to XML with
+    to_xml_string() and parsing them again, with eager and lazy parsing.
+    """
+    item_classes = [
+        type(parse(data).get_item()) for (name, data) in examples
+    ]
+
+    for lazy in (False, True):
+        items = [parse(data, lazy=lazy).get_item() for (name, data) in examples]
+
+        def xml_dumps():
+            return [item.to_xml_string() for item in items]
+
+        def xml_loads(dumps):
+            for data in dumps:
+                parse(data.encode('utf-8'))
+
+        def dict_dumps():
+            return [item.to_dict() for item in items]
+
+        def dict_loads(dumps):
+            with contextlib.redirect_stdout(io.StringIO()):
+                for (item_class, data) in zip(item_classes, dumps):
+                    item_class.from_dict(data)
+
+        for label, dump, load in (('to_xml_string / parse', xml_dumps, xml_loads),
+                                  ('to_dict / from_dict', dict_dumps, dict_loads)):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                dumps = dump()
+            dump_time = time.perf_counter() - start
+            start = time.perf_counter()
+            for _ in range(repeat):
+                load(dumps)
+            load_time = time.perf_counter() - start
+            print('{:>8.3f} s dump  {:>8.3f} s load  {}{} ({} items x {})'.format(
+                dump_time, load_time, label, ', lazy' if lazy else '',
+                len(items), repeat
+            ))
+
+
+def benchmark_pickle(examples, repeat=20):
+    """
+    Compare sending the parsed examples to another process with pickle
+    against serializing them to XML and parsing them again.
+    """
+    items = [parse(data).get_item() for (name, data) in examples]
+
+    def xml_dumps():
+        return [item.to_xml_bytes() for item in items]
+
+    def xml_loads(dumps):
+        for data in dumps:
+            parse(data)
+
+    def pickle_dumps():
+        return [pickle.dumps(item, pickle.HIGHEST_PROTOCOL) for item in items]
+
+    def pickle_loads(dumps):
+        with contextlib.redirect_stdout(io.StringIO()):
+            for data in dumps:
+                pickle.loads(data)
+
+    for label, dump, load in (('to_xml_bytes / parse', xml_dumps, xml_loads),
+                              ('pickle', pickle_dumps, pickle_loads)):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            dumps = dump()
+        dump_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(repeat):
+            load(dumps)
+        load_time = time.perf_counter() - start
+        print('{:>8.3f} s dump  {:>8.3f} s load  {:>10,} bytes  {} ({} items x {})'.format(
+            dump_time, load_time, sum(len(data) for data in dumps),
+            label, len(items), repeat
+        ))
+
+
+BENCHMARKS = {
+    'codes': benchmark_codes,
+    'dict': benchmark_dict,
+    'memory': benchmark_memory,
+    'modify': benchmark_modify,
+    'parse': benchmark_parse,
+    'passthrough': benchmark_passthrough,
+    'pickle': benchmark_pickle,
+    'pull': benchmark_pull,
+    'view': benchmark_view,
+    'write': benchmark_write,
+}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run NewsML-G2 benchmarks')
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS),
+                        help='benchmark to run')
+    args = parser.parse_args()
+
+    BENCHMARKS[args.benchmark](load_examples())
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+
+"""
+Precompile the index of each catalog bundled in NewsMLG2/catalogs, so that
+catalogs can be loaded without parsing their XML.
+
+Indexes are generated when the package is built (see setup.py) and aren't
+kept in the source tree. To use them when running from a checkout, run:
+
+    python tools/build_catalog_index.py
+
+Catalogs whose index is missing or out of date are still loaded (more slowly)
+from their XML.
+"""
+
+import glob
+import os
+import sys
+
+# because we want to reference a module that hasn't been installed yet
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)),'..'))
+
+import NewsMLG2
+
+
+def main():
+    """
+    Write the index of every bundled catalog.
+    """
+    catalogs_dirname = os.path.join(
+        os.path.dirname(os.path.abspath(NewsMLG2.__file__)), 'catalogs'
+    )
+    for filename in sorted(glob.glob(os.path.join(catalogs_dirname, '*.xml'))):
+        index_filename = NewsMLG2.write_catalog_index(filename)
+        print('{:>10,} bytes  {}'.format(
+            os.path.getsize(index_filename), os.path.basename(index_filename)
+        ))
+
+
+if __name__ == '__main__':
+    main()